@@ -0,0 +1,286 @@
+"""
+Benchmarks for the task manager hot paths.
+
+Generates synthetic workloads (see workload.py), runs the menu actions against
+them with stdin and stdout stubbed out and records wall time, peak traced
+memory and the net number of memory blocks each action leaves allocated. The
+cli_* operations time whole "python -m taskmanager" invocations, startup
+included (their memory columns only cover the parent process):
+
+    python benchmark.py --sizes 1000x10 100000x1000 --output results.json
+    python benchmark.py --sizes 100000x1000 --baseline results.json
+
+With --baseline the run is compared against an earlier results file and the
+script exits with status 1 if any action got slower or bigger than the
+allowed threshold.
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import taskmanager
+from workload import ensure_workload
+
+# Files the actions leave behind that would turn later repetitions into cache hits
+GENERATED_FILES = taskmanager.derived_paths_for(taskmanager.TASKS_FILE) + (
+    taskmanager.TASK_OVERVIEW_FILE, taskmanager.USER_OVERVIEW_FILE)
+NOISE_FLOOR = 0.01  # Seconds; slowdowns of actions faster than this are timer noise
+
+
+@contextlib.contextmanager
+def stub_io(stdin_text=""):
+    """
+    Feed stdin_text to input() and discard everything printed.
+    """
+    old_stdin, old_stdout = sys.stdin, sys.stdout
+    sys.stdin = io.StringIO(stdin_text)
+    with open(os.devnull, "w") as devnull:
+        sys.stdout = devnull
+        try:
+            yield
+        finally:
+            sys.stdin, sys.stdout = old_stdin, old_stdout
+
+
+def remove_generated_files():
+    for path in GENERATED_FILES:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def bench_load_tasks(session):
+    taskmanager.load_tasks(session["backend"])
+
+
+def bench_open_store(session):
+    taskmanager.TaskStore(session["backend"])  # What a new session does before the login prompt
+
+
+def bench_open_store_warm(session):
+    taskmanager.TaskStore(session["backend"])  # With the snapshot built by SETUP, see measure()
+
+
+def bench_view_all(session):
+    taskmanager.view_all(session["store"], paged=False)
+
+
+def bench_view_mine(session):
+    with stub_io("-1\n"):
+        taskmanager.view_mine(session["top_user"], session["store"])
+
+
+def bench_generate_task_overview(session):
+    taskmanager.generate_task_overview("admin", session["store"])
+
+
+def bench_generate_user_overview(session):
+    taskmanager.generate_user_overview("admin", session["store"])
+
+
+def bench_trends(session):
+    taskmanager.print_trends(session["store"].trends(period="month"))
+
+
+def bench_reg_user(session):
+    session["registered"] += 1
+    with stub_io(f"bench{session['registered']}\npw\n"):
+        taskmanager.reg_user("admin", session["store"].users)
+
+
+def run_command(*args):
+    """
+    Run "python -m taskmanager" in a new process, as a cron job or script would.
+    """
+    package_dir = os.path.dirname(os.path.abspath(taskmanager.__file__))
+    env = dict(os.environ, PYTHONPATH=package_dir, TASKMANAGER_STORAGE="text")
+    subprocess.run([sys.executable, "-m", "taskmanager", *args], env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def bench_cli_startup(session):
+    run_command("--help")
+
+
+def bench_cli_list(session):
+    run_command("list", "--assignee", session["top_user"])
+
+
+OPERATIONS = {
+    "load_tasks": bench_load_tasks,
+    "open_store": bench_open_store,
+    "open_store_warm": bench_open_store_warm,
+    "view_all": bench_view_all,
+    "view_mine": bench_view_mine,
+    "generate_task_overview": bench_generate_task_overview,
+    "generate_user_overview": bench_generate_user_overview,
+    "trends": bench_trends,
+    "reg_user": bench_reg_user,
+    "cli_startup": bench_cli_startup,
+    "cli_list": bench_cli_list,
+}
+# Untimed steps run before each repetition of an operation, after the
+# GENERATED_FILES are removed; open_store without one measures a cold start
+SETUP = {
+    "open_store_warm": bench_open_store,
+}
+
+
+def measure(operation, session, repeat, setup=None):
+    """
+    Run one operation repeat times for timing, then once more under tracemalloc.
+
+    Timing and memory are measured in separate runs because tracing every
+    allocation slows the code down several times.
+    param setup: Run untimed before each run, see SETUP.
+
+    Returns:
+        dict: seconds (median), min_seconds, peak_bytes and net_blocks.
+    """
+    timings = []
+    for _ in range(repeat):
+        remove_generated_files()
+        with stub_io():
+            if setup is not None:
+                setup(session)
+            start = time.perf_counter()
+            operation(session)
+            timings.append(time.perf_counter() - start)
+
+    remove_generated_files()
+    if setup is not None:
+        with stub_io():
+            setup(session)
+    blocks_before = sys.getallocatedblocks()
+    tracemalloc.start()
+    try:
+        with stub_io():
+            operation(session)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "seconds": statistics.median(timings),
+        "min_seconds": min(timings),
+        "peak_bytes": peak,
+        "net_blocks": sys.getallocatedblocks() - blocks_before,
+    }
+
+
+def run_benchmarks(sizes, operations, data_dir, repeat=3, skew=1.1):
+    """
+    Benchmark operations on each (tasks, users) size.
+
+    Each workload is generated once into data_dir and reused by later runs.
+    The actions run inside the workload directory against the text backend;
+    user.txt is restored afterwards so reg_user does not grow it between runs.
+
+    Returns:
+        list: One result dict per size and operation.
+    """
+    results = []
+    original_dir = os.getcwd()
+    for tasks, users in sizes:
+        directory = ensure_workload(os.path.join(data_dir, f"{tasks}x{users}"), tasks, users, skew)
+        os.chdir(directory)
+        users_size = os.path.getsize(taskmanager.USERS_FILE)
+        try:
+            backend = taskmanager.open_backend("text")
+            session = {
+                "backend": backend,
+                "store": taskmanager.TaskStore(backend),
+                "top_user": "user0",  # The most heavily assigned user of the Zipf distribution
+                "registered": 0,
+            }
+            for name in operations:
+                result = measure(OPERATIONS[name], session, repeat, SETUP.get(name))
+                result.update(operation=name, tasks=tasks, users=users)
+                results.append(result)
+                print(f"{name:<24} {tasks:>9} tasks {users:>7} users  {result['seconds']:8.3f}s  "
+                      f"{result['peak_bytes'] / 1e6:9.1f} MB peak  {result['net_blocks']:>9} blocks")
+            backend.close()
+        finally:
+            with open(taskmanager.USERS_FILE, "r+") as file:
+                file.truncate(users_size)
+            remove_generated_files()
+            os.chdir(original_dir)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Print each result next to its baseline and return the regressions.
+
+    A result regresses when its median time or peak memory exceeds the
+    baseline's by more than threshold (0.1 = 10%). Timings that stay under
+    NOISE_FLOOR are never counted as regressions.
+    """
+    previous = {(r["operation"], r["tasks"], r["users"]): r for r in baseline["results"]}
+    regressions = []
+    print(f"\n{'operation':<24} {'size':>16} {'time':>8} {'memory':>8}")
+    for result in results:
+        key = (result["operation"], result["tasks"], result["users"])
+        if key not in previous:
+            continue
+        old = previous[key]
+        time_ratio = result["seconds"] / old["seconds"] if old["seconds"] else 1.0
+        memory_ratio = result["peak_bytes"] / old["peak_bytes"] if old["peak_bytes"] else 1.0
+        flag = ""
+        slower = time_ratio > 1 + threshold and result["seconds"] > NOISE_FLOOR
+        if slower or memory_ratio > 1 + threshold:
+            flag = "  REGRESSION"
+            regressions.append(key)
+        print(f"{key[0]:<24} {f'{key[1]}x{key[2]}':>16} {time_ratio:7.2f}x {memory_ratio:7.2f}x{flag}")
+    return regressions
+
+
+def parse_size(text):
+    """
+    Parse a TASKSxUSERS size such as 100000x1000.
+    """
+    tasks, _, users = text.lower().partition("x")
+    return int(tasks), int(users or 100)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the task manager hot paths")
+    parser.add_argument("--sizes", nargs="+", type=parse_size, default=[(1000, 10), (100000, 1000)],
+                        help="workload sizes as TASKSxUSERS, e.g. 1000000x10000")
+    parser.add_argument("--operations", nargs="+", choices=list(OPERATIONS), default=list(OPERATIONS))
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per operation")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of the assignee distribution")
+    parser.add_argument("--data-dir", default="bench_data", help="where generated workloads are kept")
+    parser.add_argument("--output", help="save the results as JSON")
+    parser.add_argument("--baseline", help="compare against an earlier results file")
+    parser.add_argument("--threshold", type=float, default=0.1, help="allowed slowdown before failing")
+    args = parser.parse_args(argv)
+
+    data_dir = os.path.abspath(args.data_dir)
+    results = run_benchmarks(args.sizes, args.operations, data_dir, args.repeat, args.skew)
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    if args.baseline:
+        with open(args.baseline, "r") as file:
+            baseline = json.load(file)
+        if compare(results, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
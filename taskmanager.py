@@ -1,39 +1,3733 @@
 import os 
+import bisect
 import datetime
+import heapq
+import io
+import json
 import logging
+import mmap
+import re
+import struct
+import sys
+import threading
+import time
+import zlib
+from array import array
+from collections import Counter
+from contextlib import contextmanager
+from functools import lru_cache, wraps
+from itertools import islice
 
-def load_tasks():
+try:
+    import fcntl
+except ImportError:  # Windows has no fcntl; file locking is skipped there
+    fcntl = None
+
+TASKS_FILE = "tasks.txt"
+USERS_FILE = "user.txt"
+BINARY_TASKS_FILE = "tasks.bin"
+SQLITE_FILE = "tasks.db"
+TASK_OVERVIEW_FILE = "task_overview.txt"
+USER_OVERVIEW_FILE = "user_overview.txt"
+SHARD_DIR = "tasks_shards"  # Directory of the sharded storage, see ShardedBackend
+SHARD_BUCKETS = 64  # Shards the assignees of a new sharded storage are hashed into
+STORAGE_FORMAT = os.environ.get("TASKMANAGER_STORAGE", "text")  # "text", "binary", "sqlite" or "sharded"
+COMPACT_AFTER_EVENTS = 1000  # Fold the event log into tasks.txt once it holds this many events
+KEYWORD_LOG_LIMIT = 10000  # Tasks in the keyword index log before it is folded into the index file
+SNAPSHOT_TAIL_ROWS = 1000  # Tasks parsed after a table snapshot before it is saved again
+SNAPSHOT_CHECK_BYTES = 65536  # Bytes at each end of the snapshotted part of tasks.txt that are checksummed
+DATE_CACHE_SIZE = 16384  # Distinct date strings remembered by parse_date()
+VIEW_PAGE_SIZE = 100  # Tasks shown per page by view_all()
+SORT_RUN_SIZE = 100000  # Tasks sorted in memory at once before spilling to a temp file
+IMPORT_BATCH_SIZE = 10000  # Rows validated together by import_tasks()
+SERVER_SOCKET = "taskmanager.sock"  # Unix socket used by "serve" and "connect"
+REPORT_CHUNK_SIZE = 4 * 1024 * 1024  # Bytes of tasks.txt counted per job by parallel_task_stats()
+METRICS_FILE = os.environ.get("TASKMANAGER_METRICS")  # JSONL file for timings; metrics are off when unset
+
+
+class Metrics:
+    """
+    Timings and counters of menu actions and storage calls.
+
+    Work is measured in spans: a menu action is one span and the storage calls
+    made while it runs are nested spans inside it. Each span records its wall
+    time and the rows scanned and bytes read and written during it (a span's
+    counters include those of its nested spans). Finished spans are appended
+    to a JSONL file, one object per line, and added to an in-process summary
+    that the admin menu can print.
+
+    When metrics are off, span() hands out a shared do-nothing span and the
+    counting call sites are skipped by a single "if METRICS.enabled" check.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.summary = {}  # Span name -> [calls, seconds, max seconds, rows, bytes read, bytes written]
+        self._stack = []
+        self._file = None
+
+    def enable(self, path=None):
+        """
+        Start recording, appending finished spans to path if one is given.
+        """
+        if path and self._file is None:
+            self._file = open(path, "a", buffering=1)
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def span(self, name):
+        """
+        Return a context manager that measures the block as the span name.
+        """
+        if not self.enabled:
+            return NULL_SPAN
+        return MetricsSpan(self, name)
+
+    def count(self, rows=0, bytes_read=0, bytes_written=0):
+        """
+        Add to the counters of the innermost running span.
+        """
+        if self._stack:
+            span = self._stack[-1]
+            span.rows += rows
+            span.bytes_read += bytes_read
+            span.bytes_written += bytes_written
+
+    def _finish(self, span, seconds, error):
+        self._stack.pop()
+        if self._stack:
+            parent = self._stack[-1]
+            parent.rows += span.rows
+            parent.bytes_read += span.bytes_read
+            parent.bytes_written += span.bytes_written
+        totals = self.summary.setdefault(span.name, [0, 0.0, 0.0, 0, 0, 0])
+        totals[0] += 1
+        totals[1] += seconds
+        totals[2] = max(totals[2], seconds)
+        totals[3] += span.rows
+        totals[4] += span.bytes_read
+        totals[5] += span.bytes_written
+        if self._file is not None:
+            record = {
+                "time": round(time.time(), 3),
+                "op": span.name,
+                "seconds": round(seconds, 6),
+                "rows": span.rows,
+                "bytes_read": span.bytes_read,
+                "bytes_written": span.bytes_written,
+                "parent": self._stack[-1].name if self._stack else None,
+            }
+            if error is not None:
+                record["error"] = error.__name__
+            self._file.write(json.dumps(record) + "\n")
+
+
+class MetricsSpan:
+    """
+    One running measurement, see Metrics.span().
+    """
+
+    __slots__ = ("metrics", "name", "start", "rows", "bytes_read", "bytes_written")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self.rows = self.bytes_read = self.bytes_written = 0
+
+    def __enter__(self):
+        self.metrics._stack.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, error, value, traceback):
+        self.metrics._finish(self, time.perf_counter() - self.start, error)
+
+
+class NullSpan:
+    """
+    The span handed out while metrics are off; it does nothing.
+    """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, error, value, traceback):
+        pass
+
+
+NULL_SPAN = NullSpan()
+METRICS = Metrics()
+if METRICS_FILE:
+    METRICS.enable(METRICS_FILE)
+
+
+def instrumented(name):
+    """
+    Decorator that measures every call of the function as the span name.
+
+    While metrics are off the wrapper only checks METRICS.enabled and calls
+    straight through.
+    """
+    def decorate(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not METRICS.enabled:
+                return func(*args, **kwargs)
+            with METRICS.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def parse_date(text):
+    """
+    Decode a YYYY-MM-DD string into a datetime at midnight.
+
+    This does the same as datetime.datetime.strptime(text, "%Y-%m-%d") for the
+    fixed format used in the tasks file, but slices the digits directly instead
+    of going through strptime's generic parser. The same few thousand dates
+    repeat across all tasks, so decoded values are memoized.
+
+    Raises:
+        ValueError: If the text is not a valid YYYY-MM-DD date.
+    """
+    if (len(text) != 10 or text[4] != "-" or text[7] != "-"
+            or not (text[:4] + text[5:7] + text[8:]).isdigit() or not text.isascii()):
+        raise ValueError(f"time data {text!r} does not match format '%Y-%m-%d'")
+    return datetime.datetime(int(text[:4]), int(text[5:7]), int(text[8:]))
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def format_date(value):
+    """
+    Format a datetime as YYYY-MM-DD, memoized like parse_date().
+    """
+    return value.strftime("%Y-%m-%d")
+
+
+class TaskRecord:
+    """
+    The dictionary-style access shared by Task and TaskRow:
+    task["due_date"], task["completed"] = "Yes", task.get(...), task.to_dict().
+    """
+
+    __slots__ = ()
+
+    FIELDS = ("username", "task_name", "assigned_to", "start_date", "due_date", "completed", "task_id")
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key, value):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.FIELDS else default
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class Task(TaskRecord):
+    """
+    A single task read from the tasks file.
+
+    Tasks are looked up like the dictionaries load_tasks() used to return
+    (task["due_date"], task["completed"] = "Yes", ...). The start and due dates
+    are kept as the text read from the file and only decoded with parse_date()
+    the first time they are looked up, so loading does no date parsing at all.
+    """
+
+    __slots__ = ("username", "task_name", "assigned_to", "_start_date", "_due_date", "completed", "task_id")
+
+    def __init__(self, username, task_name, assigned_to, start_date, due_date, completed, task_id=None):
+        self.username = username
+        self.task_name = task_name
+        self.assigned_to = assigned_to
+        self._start_date = start_date  # str until first decoded, then datetime
+        self._due_date = due_date
+        self.completed = completed
+        self.task_id = task_id
+
+    @classmethod
+    def from_dict(cls, task):
+        """
+        Build a Task from a dictionary with the keys load_tasks() uses.
+        """
+        return cls(*(task.get(field) for field in cls.FIELDS))
+
+    @property
+    def start_date(self):
+        if isinstance(self._start_date, str):
+            self._start_date = parse_date(self._start_date)
+        return self._start_date
+
+    @start_date.setter
+    def start_date(self, value):
+        self._start_date = value
+
+    @property
+    def due_date(self):
+        if isinstance(self._due_date, str):
+            self._due_date = parse_date(self._due_date)
+        return self._due_date
+
+    @due_date.setter
+    def due_date(self, value):
+        self._due_date = value
+
+    def date_text(self, key):
+        """
+        Return "start_date" or "due_date" as YYYY-MM-DD text without decoding it.
+        """
+        value = self._start_date if key == "start_date" else self._due_date
+        if isinstance(value, str):
+            return value
+        return format_date(value)
+
+
+class TaskTable:
+    """
+    Tasks stored column by column, for sessions that keep every task in memory.
+
+    Instead of one object per task with its own strings and dates, each field
+    is a column in a compact array:
+
+        creators, assignees   user ids into users (each name is stored once)
+        starts, dues          day numbers (date.toordinal()), 0 for text that
+                              is not a valid date, which is kept in bad_dates
+        flags                 completion codes into flag_values: 0 "No", 1 "Yes"
+        names, name_ends      every task name, UTF-8 encoded back to back
+
+    That takes around 50 bytes per task instead of roughly 500 for Task
+    objects. Indexing or iterating gives TaskRow views which behave like Task
+    (attributes, task["field"], date_text()) and write changes back to the
+    columns. Task ids are row positions starting at 1, as in the tasks file.
+    """
+
+    def __init__(self, tasks=()):
+        self.users = []
+        self.user_ids = {}
+        self.creators = array("I")
+        self.assignees = array("I")
+        self.starts = array("i")
+        self.dues = array("i")
+        self.flag_values = ["No", "Yes"]
+        self.flags = bytearray()
+        self.names = bytearray()
+        self.name_ends = array("Q")
+        self.renamed = {}  # Row -> task name changed after it was stored
+        self.bad_dates = {}  # (row, "start_date" or "due_date") -> text
+        self._days = {}  # YYYY-MM-DD text -> day number, the same dates repeat a lot
+        for task in tasks:
+            self.append_task(task)
+
+    def __len__(self):
+        return len(self.flags)
+
+    def __getitem__(self, row):
+        if not 0 <= row < len(self.flags):
+            raise IndexError(row)
+        return TaskRow(self, row)
+
+    def __iter__(self):
+        for row in range(len(self.flags)):
+            yield TaskRow(self, row)
+
+    def rows(self, task_ids):
+        """
+        Return TaskRow views for a list of task ids.
+        """
+        return [TaskRow(self, task_id - 1) for task_id in task_ids]
+
+    def tasks(self, task_ids=None):
+        """
+        Yield copies of the tasks (all, or the given ids) as Task objects.
+
+        Every row is decoded once, which makes read-only passes such as views
+        much faster than going through TaskRow's properties. Changes to the
+        copies are not written back.
+        """
+        users, creators, assignees, flag_values = self.users, self.creators, self.assignees, self.flag_values
+        starts, dues, flags, names, name_ends = self.starts, self.dues, self.flags, self.names, self.name_ends
+        texts = {}  # Day number -> YYYY-MM-DD, local so the lookups stay cheap
+        rows = range(len(flags)) if task_ids is None else (task_id - 1 for task_id in task_ids)
+        for row in rows:
+            start, due = starts[row], dues[row]
+            start_text = texts.get(start)
+            if start_text is None:
+                start_text = texts[start] = day_to_text(start) if start else None
+            due_text = texts.get(due)
+            if due_text is None:
+                due_text = texts[due] = day_to_text(due) if due else None
+            if row in self.renamed:
+                task_name = self.renamed[row]
+            else:
+                task_name = names[name_ends[row - 1] if row else 0:name_ends[row]].decode()
+            yield Task(users[creators[row]], task_name, users[assignees[row]],
+                       start_text or self.bad_dates[(row, "start_date")],
+                       due_text or self.bad_dates[(row, "due_date")],
+                       flag_values[flags[row]], row + 1)
+
+    def matching_ids(self, filters, task_ids=None):
+        """
+        Return the ids of the tasks (all, or the given ids) matching view
+        filters, see row_matches(), checked on the columns without decoding
+        the tasks.
+        """
+        users, assignees, flag_values, flags = self.users, self.assignees, self.flag_values, self.flags
+        date_text = self.date_text
+        rows = range(len(flags)) if task_ids is None else (task_id - 1 for task_id in task_ids)
+        return [row + 1 for row in rows
+                if row_matches(users[assignees[row]], flag_values[flags[row]], date_text(row, "due_date"), filters)]
+
+    def sort_key(self, sort_by):
+        """
+        Return a function from a task id to its SORT_KEYS value, read from the columns.
+        """
+        if sort_by == "due_date":
+            return lambda task_id: self.date_text(task_id - 1, "due_date")
+        if sort_by == "assigned_to":
+            return lambda task_id: self.users[self.assignees[task_id - 1]]
+        if sort_by == "completed":
+            return lambda task_id: self.flag_values[self.flags[task_id - 1]]
+        raise KeyError(sort_by)
+
+    def user_id(self, username):
+        user_id = self.user_ids.get(username)
+        if user_id is None:
+            user_id = self.user_ids[username] = len(self.users)
+            self.users.append(username)
+        return user_id
+
+    def flag(self, completed):
+        try:
+            return self.flag_values.index(completed)
+        except ValueError:
+            self.flag_values.append(completed)
+            return len(self.flag_values) - 1
+
+    def day(self, value, row, field):
+        """
+        Turn a date (YYYY-MM-DD text or datetime) into the day number stored
+        for a row, remembering text that is not a valid date.
+        """
+        self.bad_dates.pop((row, field), None)
+        if not isinstance(value, str):
+            return value.toordinal()
+        day = self._days.get(value)
+        if day is None:
+            try:
+                day = parse_date(value).toordinal()
+            except ValueError:
+                self.bad_dates[(row, field)] = value
+                return 0
+            self._days[value] = day
+        return day
+
+    def append(self, username, task_name, assigned_to, start_date, due_date, completed):
+        """
+        Add one task from its fields (dates as YYYY-MM-DD text or datetime).
+
+        Returns:
+            int: The new task's id.
+        """
+        row = len(self.flags)
+        # Work out every column before touching any, so a bad value cannot
+        # leave the columns with different lengths
+        values = (self.user_id(username), self.user_id(assigned_to), self.day(start_date, row, "start_date"),
+                  self.day(due_date, row, "due_date"), self.flag(completed), task_name.encode())
+        creator, assignee, start, due, flag, name = values
+        self.creators.append(creator)
+        self.assignees.append(assignee)
+        self.starts.append(start)
+        self.dues.append(due)
+        self.names += name
+        self.name_ends.append(len(self.names))
+        self.flags.append(flag)
+        return row + 1
+
+    def append_task(self, task):
+        return self.append(task.username, task.task_name, task.assigned_to, task.date_text("start_date"),
+                           task.date_text("due_date"), task.completed)
+
+    def task_name(self, row):
+        if row in self.renamed:
+            return self.renamed[row]
+        start = self.name_ends[row - 1] if row else 0
+        return self.names[start:self.name_ends[row]].decode()
+
+    def date_text(self, row, field):
+        day = (self.starts if field == "start_date" else self.dues)[row]
+        return day_to_text(day) if day else self.bad_dates[(row, field)]
+
+    def incomplete(self):
+        """
+        Yield (due date text, task id, assignee) for every task not completed.
+        """
+        users, assignees, dues = self.users, self.assignees, self.dues
+        for row, flag in enumerate(self.flags):
+            if flag != 1:  # flag_values[1] == "Yes"
+                due = dues[row]
+                yield (day_to_text(due) if due else self.bad_dates[(row, "due_date")]), row + 1, users[assignees[row]]
+
+    def stats(self, today=None, task_ids=None):
+        """
+        Compute TaskStats straight from the columns, like compute_task_stats().
+        param task_ids: Only count these tasks.
+        """
+        stats = TaskStats(today)
+        today_day = stats.today.toordinal()
+        today_text = format_date(stats.today)
+        yes = 1  # flag_values[1] == "Yes"
+        assignees, dues, flags = self.assignees, self.dues, self.flags
+        counts = {}  # assignee id -> [total, completed, overdue]
+        rows = range(len(flags)) if task_ids is None else (task_id - 1 for task_id in task_ids)
+        for row in rows:
+            user_counts = counts.get(assignees[row])
+            if user_counts is None:
+                user_counts = counts[assignees[row]] = [0, 0, 0]
+            user_counts[0] += 1
+            if flags[row] == yes:
+                user_counts[1] += 1
+            elif dues[row] < today_day and (dues[row] or self.date_text(row, "due_date") < today_text):
+                user_counts[2] += 1
+        for user_id, (total, completed, overdue) in counts.items():
+            stats.add_counts(self.users[user_id], total, completed, overdue)
+        if METRICS.enabled:
+            METRICS.count(rows=stats.total)
+        return stats
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def day_to_text(day):
+    """
+    Format a day number as YYYY-MM-DD.
+    """
+    return datetime.date.fromordinal(day).strftime("%Y-%m-%d")
+
+
+class TaskRow(TaskRecord):
+    """
+    One task of a TaskTable, used like a Task. Setting a field writes it to the table.
+    """
+
+    __slots__ = ("table", "row")
+
+    def __init__(self, table, row):
+        self.table = table
+        self.row = row
+
+    def __eq__(self, other):
+        return isinstance(other, TaskRow) and other.table is self.table and other.row == self.row
+
+    def __hash__(self):
+        return hash((id(self.table), self.row))
+
+    @property
+    def task_id(self):
+        return self.row + 1
+
+    @property
+    def username(self):
+        return self.table.users[self.table.creators[self.row]]
+
+    @username.setter
+    def username(self, value):
+        self.table.creators[self.row] = self.table.user_id(value)
+
+    @property
+    def assigned_to(self):
+        return self.table.users[self.table.assignees[self.row]]
+
+    @assigned_to.setter
+    def assigned_to(self, value):
+        self.table.assignees[self.row] = self.table.user_id(value)
+
+    @property
+    def task_name(self):
+        return self.table.task_name(self.row)
+
+    @task_name.setter
+    def task_name(self, value):
+        self.table.renamed[self.row] = value
+
+    @property
+    def completed(self):
+        return self.table.flag_values[self.table.flags[self.row]]
+
+    @completed.setter
+    def completed(self, value):
+        self.table.flags[self.row] = self.table.flag(value)
+
+    @property
+    def start_date(self):
+        day = self.table.starts[self.row]
+        return day_to_datetime(day) if day else parse_date(self.table.bad_dates[(self.row, "start_date")])
+
+    @start_date.setter
+    def start_date(self, value):
+        self.table.starts[self.row] = self.table.day(value, self.row, "start_date")
+
+    @property
+    def due_date(self):
+        day = self.table.dues[self.row]
+        return day_to_datetime(day) if day else parse_date(self.table.bad_dates[(self.row, "due_date")])
+
+    @due_date.setter
+    def due_date(self, value):
+        self.table.dues[self.row] = self.table.day(value, self.row, "due_date")
+
+    def date_text(self, key):
+        """
+        Return "start_date" or "due_date" as YYYY-MM-DD text.
+        """
+        return self.table.date_text(self.row, key)
+
+
+def parse_task_line(line):
+    """
+    Parse one semicolon-delimited line of the tasks file into a Task.
+
+    Args:
+        line (str): A non-empty line from the tasks file.
+
+    Returns:
+        Task: The task, with its dates still undecoded.
+
+    Raises:
+        ValueError: If the line has fewer than six fields.
+    """
+    task_data = line.strip().split(";")
+    if len(task_data) < 6:
+        raise ValueError(f"expected 6 fields, found {len(task_data)}")
+    return Task(task_data[0], task_data[1], task_data[2], task_data[3], task_data[4], task_data[5])
+
+
+def format_task_line(task):
+    """
+    Turn a task back into a line of the tasks file.
+
+    The column order is the one load_tasks() reads, so a task written with this
+    function comes back unchanged on the next load.
+    """
+    if isinstance(task, TaskRecord):
+        start_date = task.date_text("start_date")
+        due_date = task.date_text("due_date")
+    else:
+        start_date = task["start_date"].strftime("%Y-%m-%d")
+        due_date = task["due_date"].strftime("%Y-%m-%d")
+    return ";".join([
+        task["username"],
+        task["task_name"],
+        task["assigned_to"],
+        start_date,
+        due_date,
+        task["completed"],
+    ]) + "\n"
+
+
+@instrumented("storage.read_tasks")
+def read_tasks_file(path=TASKS_FILE, strict=False):
+    """
+    Read a text tasks file and return its tasks as a list of Task records.
+
+    Each task gets a "task_id" which is its 1-based position in the file.
+    Dates are decoded lazily, see Task.
+
+    param strict: Raise ValueError on a line that cannot be parsed instead of
+        logging it and returning the tasks read before it. Anything that
+        rewrites the file from what it read must be strict.
+
+    Returns:
+        list: A list of Task records containing task information.
+    """
+    tasks = []
+
+    try:
+        with open(path, "r") as file:
+            for number, line in enumerate(file, start=1):
+                if line.strip():  # Checks if the line is not empty
+                    try:
+                        task = parse_task_line(line)
+                    except ValueError as e:
+                        if strict:
+                            raise ValueError(f"{path} line {number}: {e}") from None
+                        raise
+                    task["task_id"] = len(tasks) + 1
+                    tasks.append(task)
+            if METRICS.enabled:
+                METRICS.count(rows=len(tasks), bytes_read=os.fstat(file.fileno()).st_size)
+    except FileNotFoundError:
+        logging.error("Tasks file not found.")
+    except Exception as e:
+        if strict:
+            raise
+        logging.error("Error loading tasks: %s", e)
+
+    return tasks
+
+
+@instrumented("storage.read_tasks")
+def read_tasks_table(path=TASKS_FILE, snapshot_path=None):
+    """
+    Read a text tasks file straight into a TaskTable, see read_tasks_file().
+
+    With a snapshot_path the table is loaded from that snapshot when it still
+    matches the file (see load_table_snapshot()), and only the lines appended
+    since are parsed. The snapshot is written again after a full parse or
+    once SNAPSHOT_TAIL_ROWS new lines had to be parsed.
+    """
+    table, start = None, 0
+    if snapshot_path is not None:
+        table, start = load_table_snapshot(snapshot_path, path)
+    rebuilt = table is None
+    if rebuilt:
+        table, start = TaskTable(), 0
+    append = table.append
+    parsed = 0
+    end = start  # End of the last complete line
+
+    try:
+        with open(path, "rb") as file:
+            file.seek(start)
+            unfinished = b""
+            for line in file:
+                if not line.endswith(b"\n"):
+                    unfinished = line  # Parsed below, but left out of the snapshot
+                    break
+                end += len(line)
+                line = line.decode().strip()
+                if line:  # Checks if the line is not empty
+                    task_data = line.split(";")
+                    append(task_data[0], task_data[1], task_data[2], task_data[3], task_data[4], task_data[5])
+                    parsed += 1
+            if snapshot_path is not None and (rebuilt or parsed >= SNAPSHOT_TAIL_ROWS):
+                try:
+                    save_table_snapshot(snapshot_path, path, table, end)
+                except OSError as e:
+                    logging.error("Could not save the task snapshot: %s", e)
+            line = unfinished.decode().strip()
+            if line:
+                task_data = line.split(";")
+                append(task_data[0], task_data[1], task_data[2], task_data[3], task_data[4], task_data[5])
+                parsed += 1
+            if METRICS.enabled:
+                METRICS.count(rows=parsed, bytes_read=file.tell() - start)
+    except FileNotFoundError:
+        logging.error("Tasks file not found.")
+    except Exception as e:
+        logging.error("Error loading tasks: %s", e)
+
+    return table
+
+
+def snapshot_path_for(path):
+    """
+    Return the name of the table snapshot that belongs to a tasks file,
+    e.g. "tasks.txt.snapshot" for "tasks.txt".
+    """
+    return path + ".snapshot"
+
+
+def file_checksums(path, size):
+    """
+    Return CRC-32 checksums of the first and the last SNAPSHOT_CHECK_BYTES
+    of the first size bytes of a file.
+    """
+    with open(path, "rb") as file:
+        head = zlib.crc32(file.read(min(size, SNAPSHOT_CHECK_BYTES)))
+        file.seek(max(0, size - SNAPSHOT_CHECK_BYTES))
+        tail = zlib.crc32(file.read(min(size, SNAPSHOT_CHECK_BYTES)))
+    return [head, tail]
+
+
+TABLE_ARRAYS = ("creators", "assignees", "starts", "dues", "name_ends")  # Columns saved as raw arrays
+
+
+@instrumented("storage.write_snapshot")
+def save_table_snapshot(snapshot_path, path, table, size):
+    """
+    Save a TaskTable parsed from the first size bytes of a tasks file.
+
+    The snapshot is a JSON header line followed by the columns as raw bytes.
+    Besides the column lengths the header records what the table was parsed
+    from: the byte count, the file's inode and mtime and file_checksums().
+    """
+    stat = os.stat(path)
+    blocks = ["\n".join(table.users).encode()]
+    blocks.extend(getattr(table, name).tobytes() for name in TABLE_ARRAYS)
+    blocks.extend((bytes(table.flags), bytes(table.names)))
+    header = {
+        "version": 1,
+        "byteorder": sys.byteorder,
+        "size": size,
+        "inode": stat.st_ino,
+        "mtime_ns": stat.st_mtime_ns,
+        "checksums": file_checksums(path, size),
+        "users": len(table.users),
+        "blocks": [len(block) for block in blocks],
+        "flag_values": table.flag_values,
+        "renamed": sorted(table.renamed.items()),
+        "bad_dates": [[row, field, text] for (row, field), text in table.bad_dates.items()],
+    }
+    atomic_write(snapshot_path, [json.dumps(header).encode() + b"\n"] + blocks, mode="wb")
+
+
+@instrumented("storage.read_snapshot")
+def load_table_snapshot(snapshot_path, path):
+    """
+    Load the TaskTable saved by save_table_snapshot() if the tasks file
+    still starts with the bytes it was parsed from.
+
+    A snapshot whose size, inode and mtime all match the file is used as it
+    is. If the file grew (tasks were appended) the checksums of the
+    snapshotted part are compared as well. Any other change, such as an edit
+    that kept the size or the tasks file being replaced by a compaction,
+    discards the snapshot.
+
+    Returns:
+        tuple: The table (None if there is no usable snapshot) and the
+            offset in the tasks file where parsing has to continue.
+    """
+    try:
+        with open(snapshot_path, "rb") as file:
+            header = json.loads(file.readline())
+            if header.get("version") != 1 or header.get("byteorder") != sys.byteorder:
+                return None, 0
+            stat = os.stat(path)
+            size = header["size"]
+            if stat.st_ino != header["inode"] or stat.st_size < size:
+                return None, 0
+            if (stat.st_size, stat.st_mtime_ns) != (size, header["mtime_ns"]) \
+                    and (stat.st_size == size or file_checksums(path, size) != header["checksums"]):
+                return None, 0
+            blocks = [file.read(length) for length in header["blocks"]]
+    except (FileNotFoundError, ValueError, KeyError):
+        return None, 0
+    if [len(block) for block in blocks] != header["blocks"]:
+        return None, 0  # Cut short
+    table = TaskTable()
+    table.users = blocks[0].decode().split("\n") if header["users"] else []
+    table.user_ids = {username: user_id for user_id, username in enumerate(table.users)}
+    for name, block in zip(TABLE_ARRAYS, blocks[1:]):
+        getattr(table, name).frombytes(block)
+    table.flags = bytearray(blocks[-2])
+    table.names = bytearray(blocks[-1])
+    table.flag_values = header["flag_values"]
+    table.renamed = dict(header["renamed"])
+    table.bad_dates = {(row, field): text for row, field, text in header["bad_dates"]}
+    if METRICS.enabled:
+        METRICS.count(rows=len(table), bytes_read=sum(header["blocks"]))
+    return table, size
+
+
+def load_tasks(backend=None):
+    """
+    Load all tasks from the storage backend (the configured one by default).
+
+    Returns:
+        list: A list of Task records containing task information.
+    """
+    if backend is None:
+        backend = open_backend()
+    return backend.load_tasks()
+
+
+def events_path_for(path):
+    """
+    Return the name of the event log that belongs to a tasks file,
+    e.g. "tasks_events.txt" for "tasks.txt".
+    """
+    root, ext = os.path.splitext(path)
+    return f"{root}_events{ext or '.txt'}"
+
+
+def overview_path_for(path):
+    """
+    Return the name of the overview counters file that belongs to a tasks
+    file, e.g. "tasks_overview.json" for "tasks.txt".
+    """
+    return os.path.splitext(path)[0] + "_overview.json"
+
+
+def keyword_index_path_for(path):
+    """
+    Return the name of the keyword index that belongs to a tasks file (or
+    database, or shard directory), e.g. "tasks.txt.keywords" for "tasks.txt".
+    The whole name is kept because the ids only fit that storage's tasks.
+    """
+    return path + ".keywords"
+
+
+def rollups_path_for(path):
+    """
+    Return the name of the daily rollups file that belongs to a tasks file
+    (or database, or shard directory), e.g. "tasks.txt.rollups" for "tasks.txt".
+    """
+    return path + ".rollups"
+
+
+def derived_paths_for(path):
+    """
+    Return the names of the files the program derives from a tasks file (or
+    database, or shard directory) and keeps next to it: its event log, table
+    snapshot, overview counters, keyword index and daily rollups. Deleting
+    them loses nothing but pending events, they are rebuilt on the next run.
+    """
+    keywords = keyword_index_path_for(path)
+    rollups = rollups_path_for(path)
+    return (events_path_for(path), snapshot_path_for(path), overview_path_for(path),
+            keywords, keywords + ".log", rollups, rollups + ".totals")
+
+
+_held_locks = threading.local()  # Lock files each thread holds, see locked()
+
+
+@contextmanager
+def locked(path):
+    """
+    Hold an exclusive lock on "<path>.lock" for the duration of the block.
+
+    Appends to the tasks file and its event log take the lock briefly so that
+    a compaction running in another session never drops them. The lock is
+    re-entrant: a block inside one that already holds it (such as the
+    backend's append inside TaskStore.add()) does not lock again.
+    """
+    lock_path = path + ".lock"
+    held = _held_locks.__dict__.setdefault("paths", set())
+    if fcntl is None or lock_path in held:
+        yield
+        return
+    with open(lock_path, "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        held.add(lock_path)
+        try:
+            yield
+        finally:
+            held.discard(lock_path)
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+@instrumented("storage.rewrite")
+def atomic_write(path, lines, mode="w"):
+    """
+    Replace a file with the given lines without ever leaving it half-written.
+
+    The lines go to a temporary file in the same directory which is flushed
+    to disk and then renamed over the target in one step. The new file gets
+    the permissions of the one it replaces, or those the umask gives a new
+    file (mkstemp would leave it readable by its owner only).
+    param mode: "wb" to write bytes instead of text.
+    """
+    import tempfile  # Imported on first use to keep command startup short
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=".txt")
+    try:
+        with os.fdopen(fd, mode) as temp_file:
+            temp_file.writelines(lines)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+            if METRICS.enabled:
+                METRICS.count(bytes_written=os.fstat(temp_file.fileno()).st_size)
+        try:
+            permissions = os.stat(path).st_mode & 0o7777
+        except FileNotFoundError:
+            umask = os.umask(0)
+            os.umask(umask)
+            permissions = 0o666 & ~umask
+        os.chmod(temp_path, permissions)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+@instrumented("storage.append")
+def append_line(path, line):
+    """
+    Append one line to a file and flush it to disk.
+    """
+    with open(path, "a") as file:
+        file.write(line)
+        file.flush()
+        os.fsync(file.fileno())
+    if METRICS.enabled:
+        METRICS.count(bytes_written=len(line.encode()))
+
+
+@instrumented("storage.append")
+def append_all(path, data):
+    """
+    Append a block of text or bytes to a file with one write and one fsync.
+
+    If anything goes wrong the file is truncated back to its old length, so
+    it is never left with half of the block appended.
+    """
+    with open(path, "ab") as file:
+        start = file.seek(0, os.SEEK_END)
+        try:
+            written = file.write(data.encode() if isinstance(data, str) else data)
+            file.flush()
+            os.fsync(file.fileno())
+        except BaseException:
+            file.truncate(start)
+            raise
+    if METRICS.enabled:
+        METRICS.count(bytes_written=written)
+
+
+def format_task_event(action, task_id, value=None):
+    """
+    Turn a task update into a line of the event log, e.g. "complete;12" or
+    "due;12;2024-05-01".
+    """
+    if value is None:
+        return f"{action};{task_id}\n"
+    return f"{action};{task_id};{value}\n"
+
+
+@instrumented("storage.read_events")
+def load_task_events(path):
+    """
+    Read the event log and return its events as (action, task_id, value) tuples.
+
+    A line without a trailing newline is the remains of an interrupted append
+    and is ignored, as are lines that cannot be parsed.
+    """
+    events = []
+    try:
+        with open(path, "r") as file:
+            for line in file:
+                if not line.endswith("\n") or not line.strip():
+                    continue
+                parts = line.strip().split(";")
+                try:
+                    events.append((parts[0], int(parts[1]), parts[2] if len(parts) > 2 else None))
+                except (IndexError, ValueError):
+                    logging.error("Ignoring malformed task event: %s", line.strip())
+            if METRICS.enabled:
+                METRICS.count(rows=len(events), bytes_read=os.fstat(file.fileno()).st_size)
+    except FileNotFoundError:
+        pass
+    return events
+
+
+def apply_task_events(tasks, events):
+    """
+    Fold events from the event log into the tasks loaded from the snapshot.
+    """
+    for action, task_id, value in events:
+        if not 1 <= task_id <= len(tasks):
+            logging.error("Ignoring event for unknown task %s", task_id)
+            continue
+        apply_task_event(tasks[task_id - 1], action, value)
+    return tasks
+
+
+def apply_task_event(task, action, value):
+    """
+    Apply a single event from the event log to a task.
+    """
+    if action == "complete":
+        task["completed"] = "Yes"
+    elif action == "due":
+        task["due_date"] = value  # Decoded lazily like the dates read from the file
+    else:
+        logging.error("Ignoring unknown task event: %s", action)
+
+
+def row_matches(assigned_to, completed, due_date, filters):
+    """
+    Check the assignee, completed flag and YYYY-MM-DD due date of a task
+    against view filters (assigned_to, completed, due_from, due_to; the date
+    bounds are inclusive). Works on raw text fields, so a scan can reject a
+    row before building a Task for it.
+    """
+    if filters.get("assigned_to") is not None and assigned_to != filters["assigned_to"]:
+        return False
+    if filters.get("completed") is not None and completed != filters["completed"]:
+        return False
+    if filters.get("due_from") is not None and due_date < filters["due_from"]:
+        return False
+    if filters.get("due_to") is not None and due_date > filters["due_to"]:
+        return False
+    return True
+
+
+def filter_tasks(tasks, **filters):
+    """
+    Lazily keep the tasks matching the view filters, see row_matches().
+    """
+    if all(value is None for value in filters.values()):
+        yield from tasks  # Nothing to check
+        return
+    for task in tasks:
+        if row_matches(task.assigned_to, task.completed, task.date_text("due_date"), filters):
+            yield task
+
+
+SORT_KEYS = {
+    "due_date": lambda task: task.date_text("due_date"),
+    "assigned_to": lambda task: task.assigned_to,
+    "completed": lambda task: task.completed,
+}
+
+
+def sort_tasks(tasks, sort_by=None, run_size=None):
+    """
+    Sort a stream of tasks by "due_date", "assigned_to" or "completed" (ties
+    keep id order) with bounded memory.
+
+    Up to run_size tasks are sorted in memory at a time. Larger inputs are
+    written to temporary files as sorted runs which are then merged lazily,
+    so memory use does not grow with the number of tasks.
+    """
+    if sort_by is None:
+        yield from tasks
+        return
+    key = SORT_KEYS[sort_by]
+    run_size = run_size or SORT_RUN_SIZE
+    runs = []
+    try:
+        while True:
+            run = list(islice(tasks, run_size))
+            if not run:
+                break
+            run.sort(key=key)
+            if not runs and len(run) < run_size:
+                yield from run  # Everything fitted into a single run
+                return
+            import tempfile
+            run_file = tempfile.TemporaryFile("w+")
+            run_file.writelines(f"{task.task_id};{format_task_line(task)}" for task in run)
+            run_file.seek(0)
+            runs.append(run_file)
+        yield from heapq.merge(*(_read_sort_run(run_file) for run_file in runs), key=key)
+    finally:
+        for run_file in runs:
+            run_file.close()
+
+
+def _read_sort_run(run_file):
+    for line in run_file:
+        task_id, rest = line.split(";", 1)
+        task = parse_task_line(rest)
+        task.task_id = int(task_id)
+        yield task
+
+
+@instrumented("storage.compact")
+def compact_tasks(path=TASKS_FILE):
+    """
+    Merge the event log into the tasks file and empty the log.
+
+    The tasks file is replaced atomically and the log is only cleared after
+    the new snapshot is on disk, so a crash at any point leaves either the old
+    snapshot plus its events or the new snapshot (replaying the old events on
+    top of it is harmless, they are idempotent).
+
+    Returns:
+        int: The number of events that were merged.
+
+    Raises:
+        ValueError: If a line of the tasks file cannot be parsed. Nothing is
+            rewritten then, as the file would lose every task after that line.
+    """
+    events_path = events_path_for(path)
+    with locked(path):
+        events = load_task_events(events_path)
+        if not events:
+            return 0
+        tasks = apply_task_events(read_tasks_file(path, strict=True), events)
+        atomic_write(path, (format_task_line(task) for task in tasks))
+        atomic_write(events_path, [])
+    return len(events)
+
+
+@lru_cache(maxsize=DATE_CACHE_SIZE)
+def day_to_datetime(day):
+    """
+    Turn a day number (proleptic Gregorian ordinal) into a datetime at midnight.
+    """
+    return datetime.datetime.fromordinal(day)
+
+
+class BinaryTaskFile:
+    """
+    Tasks stored as fixed-width binary records and read through mmap.
+
+    The file starts with a 16 byte header (magic and version) followed by one
+    24 byte record per task:
+
+        creator id, task name id, assignee id   uint32 each
+        start date, due date                    int32 day numbers
+        completed                               1 byte, 0 or 1
+
+    The ids point into a string table kept next to the file in
+    "<name>.strings" (one string per line, the id is the line number), so every
+    username is stored once however many tasks it has. Since all records have
+    the same size, task N lives at a known offset: reading it needs no scan and
+    marking it complete is a single byte written in place.
+    """
+
+    MAGIC = b"TASKBIN1"
+    VERSION = 1
+    HEADER = struct.Struct("<8sI4x")
+    RECORD = struct.Struct("<IIIiiB3x")
+    DUE_DATE_OFFSET = 16  # Offset of the due date inside a record
+    COMPLETED_OFFSET = 20  # Offset of the completed byte inside a record
+
+    def __init__(self, path=BINARY_TASKS_FILE):
+        self.path = path
+        self.strings_path = os.path.splitext(path)[0] + ".strings"
+        self._file = None
+        self._map = None
+        self._strings_file = None
+        self.open()
+
+    @classmethod
+    def create(cls, path=BINARY_TASKS_FILE):
+        """
+        Create an empty binary task file and its string table.
+        """
+        with open(path, "wb") as file:
+            file.write(cls.HEADER.pack(cls.MAGIC, cls.VERSION))
+        open(os.path.splitext(path)[0] + ".strings", "w").close()
+        return cls(path)
+
+    def open(self):
+        """
+        (Re)open the file and map it into memory, and read the strings added
+        to the string table since the last call.
+        """
+        self._unmap()
+        self._file = open(self.path, "r+b")
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        magic, version = self.HEADER.unpack_from(self._map, 0)
+        if magic != self.MAGIC or version != self.VERSION:
+            self.close()
+            raise ValueError(f"{self.path} is not a version {self.VERSION} binary task file")
+        self._refresh_strings()
+
+    def _refresh_strings(self):
+        """
+        Read the strings appended to the string table after the last one read.
+
+        The table stays open, so a refresh only reads what other writers have
+        added. If the table was replaced (see text_to_binary()) or shrank it is
+        read again from the start.
+        """
+        try:
+            stat = os.stat(self.strings_path)
+        except FileNotFoundError:
+            stat = None
+        if self._strings_file is not None:
+            current = os.fstat(self._strings_file.fileno())
+            if (stat is None or (current.st_dev, current.st_ino) != (stat.st_dev, stat.st_ino)
+                    or stat.st_size < self._strings_end):
+                self._close_strings()
+        if self._strings_file is None:
+            self.strings = []
+            self.string_ids = {}
+            self._strings_end = 0
+            if stat is None:
+                return
+            self._strings_file = open(self.strings_path, "rb")
+        self._strings_file.seek(self._strings_end)
+        data = self._strings_file.read()
+        data = data[:data.rfind(b"\n") + 1]  # A string still being written is read next time
+        for string in data.decode().split("\n")[:-1]:
+            self.string_ids[string] = len(self.strings)
+            self.strings.append(string)
+        self._strings_end += len(data)
+
+    def _close_strings(self):
+        if self._strings_file is not None:
+            self._strings_file.close()
+            self._strings_file = None
+
+    def _unmap(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def close(self):
+        self._unmap()
+        self._close_strings()
+
+    def __len__(self):
+        return (len(self._map) - self.HEADER.size) // self.RECORD.size
+
+    def _offset(self, task_id):
+        if not 1 <= task_id <= len(self):
+            raise IndexError(f"No task with id {task_id}")
+        return self.HEADER.size + (task_id - 1) * self.RECORD.size
+
+    def _task(self, task_id, record):
+        creator, name, assignee, start_day, due_day, completed = record
+        strings = self.strings
+        return Task(strings[creator], strings[name], strings[assignee], day_to_datetime(start_day),
+                    day_to_datetime(due_day), "Yes" if completed else "No", task_id)
+
+    def __iter__(self):
+        records = memoryview(self._map)[self.HEADER.size:self.HEADER.size + len(self) * self.RECORD.size]
+        try:
+            for task_id, record in enumerate(self.RECORD.iter_unpack(records), start=1):
+                yield self._task(task_id, record)
+        finally:
+            records.release()
+
+    def read(self, task_id):
+        """
+        Return one task, decoded straight from its record.
+        """
+        return self._task(task_id, self.RECORD.unpack_from(self._map, self._offset(task_id)))
+
+    def _intern(self, string, new_strings):
+        string_id = self.string_ids.get(string)
+        if string_id is None:
+            string_id = self.string_ids[string] = len(self.strings)
+            self.strings.append(string)
+            new_strings.append(string + "\n")
+        return string_id
+
+    def append(self, task):
+        """
+        Append a task record at the end of the file.
+
+        Returns:
+            int: The id of the new task.
+        """
+        return self.append_many([task])
+
+    def append_many(self, tasks):
+        """
+        Append task records with a single write to the string table and a
+        single write to the task file. The caller holds the file's lock.
+
+        Returns:
+            int: The id of the last task appended.
+        """
+        self._refresh_strings()  # Another writer may have added strings since they were read
+        new_strings = []
+        records = bytearray()
+        for task in tasks:
+            records += self.RECORD.pack(
+                self._intern(task["username"], new_strings),
+                self._intern(task["task_name"], new_strings),
+                self._intern(task["assigned_to"], new_strings),
+                task["start_date"].toordinal(),
+                task["due_date"].toordinal(),
+                1 if task["completed"] == "Yes" else 0
+            )
+        # Strings first: a record never points at an id missing from the table
+        if new_strings:
+            data = "".join(new_strings).encode()
+            try:
+                append_all(self.strings_path, data)
+            except BaseException:
+                self._close_strings()  # The new ids were never written, read the table again
+                raise
+            self._strings_end += len(data)
+        append_all(self.path, bytes(records))
+        self.open()  # The mapping has a fixed size, map the grown file again
+        return len(self)
+
+    def _flush(self, offset, size):
+        # mmap.flush() wants an offset aligned to the allocation granularity
+        start = offset - offset % mmap.ALLOCATIONGRANULARITY
+        self._map.flush(start, offset + size - start)
+
+    def set_completed(self, task_id, completed=True):
+        """
+        Mark a task complete by writing its completed byte in place.
+        """
+        offset = self._offset(task_id) + self.COMPLETED_OFFSET
+        self._map[offset] = 1 if completed else 0
+        self._flush(offset, 1)
+
+    def set_due_date(self, task_id, due_date):
+        """
+        Overwrite the due date of a task in place.
+        """
+        offset = self._offset(task_id) + self.DUE_DATE_OFFSET
+        struct.pack_into("<i", self._map, offset, due_date.toordinal())
+        self._flush(offset, 4)
+
+
+def text_to_binary(text_path=TASKS_FILE, binary_path=BINARY_TASKS_FILE):
+    """
+    Convert a text tasks file (with its pending events) into the binary format.
+
+    Returns:
+        int: The number of tasks converted.
+    """
+    tasks = apply_task_events(read_tasks_file(text_path), load_task_events(events_path_for(text_path)))
+    strings_path = os.path.splitext(binary_path)[0] + ".strings"
+    string_ids = {}
+
+    def intern(string):
+        if string not in string_ids:
+            string_ids[string] = len(string_ids)
+        return string_ids[string]
+
+    records = bytearray(BinaryTaskFile.HEADER.pack(BinaryTaskFile.MAGIC, BinaryTaskFile.VERSION))
+    for task in tasks:
+        records += BinaryTaskFile.RECORD.pack(
+            intern(task.username), intern(task.task_name), intern(task.assigned_to),
+            task.start_date.toordinal(), task.due_date.toordinal(), 1 if task.completed == "Yes" else 0
+        )
+    # Strings first: a binary file never points at ids missing from its table
+    atomic_write(strings_path, (string + "\n" for string in string_ids))
+    atomic_write(binary_path, [records], mode="wb")
+    return len(tasks)
+
+
+def binary_to_text(binary_path=BINARY_TASKS_FILE, text_path=TASKS_FILE):
+    """
+    Convert a binary task file back into the semicolon-delimited text format.
+
+    Returns:
+        int: The number of tasks converted.
+    """
+    binary = BinaryTaskFile(binary_path)
+    try:
+        atomic_write(text_path, (format_task_line(task) for task in binary))
+        return len(binary)
+    finally:
+        binary.close()
+
+
+class TextBackend:
+    """
+    Storage backend for the original text files.
+
+    Tasks live in tasks.txt, one semicolon-delimited line per task, with
+    updates appended to its event log (see compact_tasks()). Users live in
+    user.txt as "username;password" lines.
+
+    Every backend offers the same methods, so the rest of the program never
+    opens a storage file itself:
+
+        initialize()                      create empty storage if missing
+        signature()                       changes whenever the tasks change
+        load_tasks()                      all tasks in id order
+        get_task(task_id)                 one task, or None if there is no such task
+        append_task(task)                 store a new task, return its id
+        complete_task(task_id)            mark a task as complete
+        set_due_date(task_id, due_date)   change a task's due date
+        compact()                         fold pending updates into the main file
+        load_users() / add_user(...)      the users, see UserRegistry
+        add_users(users)                  store many (username, password) pairs at once
+        users_signature()                 changes whenever the users change
+        close()
+
+    Backends with indexed = True (SQLite, sharded) also answer queries
+    themselves, see SQLiteBackend.
+    """
+
+    name = "text"
+    indexed = False
+
+    def __init__(self, tasks_path=TASKS_FILE, users_path=USERS_FILE):
+        self.path = tasks_path
+        self.events_path = events_path_for(tasks_path)
+        self.users_path = users_path
+        self.pending_events = 0
+
+    def initialize(self):
+        for path in (self.path, self.users_path):
+            if not os.path.exists(path):
+                with open(path, "w"):
+                    # Write initial content if needed
+                    pass
+
+    def _watched_files(self):
+        return (self.path, self.events_path)
+
+    def signature(self):
+        signature = []
+        for path in self._watched_files():
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                signature.append(None)
+            else:
+                signature.append((stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def load_tasks(self):
+        events = load_task_events(self.events_path)
+        self.pending_events = len(events)
+        return apply_task_events(read_tasks_file(self.path), events)
+
+    def load_table(self):
+        """
+        Load all tasks into a TaskTable, for stores that keep them in memory.
+        The parsed table is kept in a snapshot next to the tasks file, so the
+        next load only parses the lines appended since (see read_tasks_table()).
+        """
+        events = load_task_events(self.events_path)
+        self.pending_events = len(events)
+        return apply_task_events(read_tasks_table(self.path, snapshot_path_for(self.path)), events)
+
+    def iter_tasks(self, sort_by=None, **filters):
+        """
+        Stream the tasks matching the view filters (see row_matches()) one line
+        at a time, without loading the whole file. Filters are checked on the
+        raw fields before a Task is built.
+        """
+        events = {}
+        for action, task_id, value in load_task_events(self.events_path):
+            events.setdefault(task_id, []).append((action, value))
+        return sort_tasks(self._scan(events, filters), sort_by)
+
+    def _scan(self, events, filters):
+        """
+        Yield the matching tasks of the file.
+
+        Raises:
+            ValueError: For a line without the six fields of a task, naming the
+                line, like parallel_task_stats() does.
+        """
+        task_id = 0
+        try:
+            with open(self.path, "r") as file:
+                for number, line in enumerate(file, start=1):
+                    if not line.strip():
+                        continue
+                    task_id += 1
+                    parts = line.strip().split(";")
+                    if len(parts) != 6:
+                        raise ValueError(f"{self.path} line {number}: expected 6 fields, found {len(parts)}")
+                    if task_id in events:
+                        task = parse_task_line(line)
+                        for action, value in events[task_id]:
+                            apply_task_event(task, action, value)
+                        if not row_matches(task.assigned_to, task.completed, task.date_text("due_date"), filters):
+                            continue
+                    else:
+                        if not row_matches(parts[2], parts[5], parts[4], filters):
+                            continue
+                        task = Task(parts[0], parts[1], parts[2], parts[3], parts[4], parts[5])
+                    task.task_id = task_id
+                    yield task
+        except FileNotFoundError:
+            logging.error("Tasks file not found.")
+        finally:
+            if METRICS.enabled:
+                METRICS.count(rows=task_id)
+
+    def get_task(self, task_id):
+        """
+        Return one task with its pending events applied, reading the file only
+        up to the task's line.
+        """
+        if task_id < 1:
+            return None
+        line_number = 0
+        try:
+            with open(self.path, "r") as file:
+                for line in file:
+                    if not line.strip():
+                        continue
+                    line_number += 1
+                    if line_number == task_id:
+                        task = parse_task_line(line)
+                        task.task_id = task_id
+                        for action, event_task_id, value in load_task_events(self.events_path):
+                            if event_task_id == task_id:
+                                apply_task_event(task, action, value)
+                        return task
+        except FileNotFoundError:
+            pass
+        return None
+
+    def append_task(self, task):
+        with locked(self.path):
+            append_line(self.path, format_task_line(task))
+
+    def append_tasks(self, tasks):
+        with locked(self.path):
+            append_all(self.path, "".join(format_task_line(task) for task in tasks))
+
+    def _append_event(self, task_id, action, value=None):
+        with locked(self.path):  # The same lock compact_tasks() holds
+            append_line(self.events_path, format_task_event(action, task_id, value))
+        self.pending_events += 1
+
+    def complete_task(self, task_id):
+        self._append_event(task_id, "complete")
+
+    def set_due_date(self, task_id, due_date):
+        self._append_event(task_id, "due", format_date(due_date))
+
+    def compact(self):
+        merged = compact_tasks(self.path)
+        self.pending_events = 0
+        return merged
+
+    def load_users(self):
+        return read_users_file(self.users_path)
+
+    def users_signature(self):
+        try:
+            stat = os.stat(self.users_path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def add_user(self, username, password):
+        append_line(self.users_path, f"{username};{password}\n")
+
+    def add_users(self, users):
+        append_all(self.users_path, "".join(f"{username};{password}\n" for username, password in users))
+
+    def close(self):
+        pass
+
+
+class BinaryBackend(TextBackend):
+    """
+    Storage backend for tasks in a BinaryTaskFile; users stay in user.txt.
+    """
+
+    name = "binary"
+
+    def __init__(self, tasks_path=BINARY_TASKS_FILE, users_path=USERS_FILE):
+        super().__init__(tasks_path, users_path)
+        self.binary = None
+
+    def initialize(self):
+        if not os.path.exists(self.path):
+            if os.path.exists(TASKS_FILE):
+                text_to_binary(TASKS_FILE, self.path)  # Carry existing tasks over
+            else:
+                BinaryTaskFile.create(self.path).close()
+        if not os.path.exists(self.users_path):
+            open(self.users_path, "w").close()
+
+    def _watched_files(self):
+        return (self.path, os.path.splitext(self.path)[0] + ".strings")
+
+    def _file(self):
+        if self.binary is None:
+            self.binary = BinaryTaskFile(self.path)
+        return self.binary
+
+    def load_table(self):
+        binary = self._file()
+        binary.open()
+        return TaskTable(iter(binary))  # Streamed, so no list of Task objects is built first
+
+    @instrumented("storage.read_binary")
+    def load_tasks(self):
+        binary = self._file()
+        binary.open()
+        tasks = list(binary)
+        if METRICS.enabled:
+            METRICS.count(rows=len(tasks), bytes_read=len(tasks) * BinaryTaskFile.RECORD.size)
+        return tasks
+
+    def iter_tasks(self, sort_by=None, **filters):
+        binary = self._file()
+        binary.open()
+        return sort_tasks(filter_tasks(iter(binary), **filters), sort_by)
+
+    def get_task(self, task_id):
+        binary = self._file()
+        binary.open()
+        try:
+            return binary.read(task_id)
+        except IndexError:
+            return None
+
+    def append_task(self, task):
+        with locked(self.path):
+            return self._file().append(task)
+
+    def append_tasks(self, tasks):
+        with locked(self.path):
+            return self._file().append_many(tasks)
+
+    def complete_task(self, task_id):
+        with locked(self.path):
+            self._file().set_completed(task_id)
+
+    def set_due_date(self, task_id, due_date):
+        with locked(self.path):
+            self._file().set_due_date(task_id, due_date)
+
+    def compact(self):
+        return 0  # Updates are written in place, there is nothing to merge
+
+    def close(self):
+        if self.binary is not None:
+            self.binary.close()
+            self.binary = None
+
+
+class SQLiteBackend:
+    """
+    Storage backend keeping tasks and users in a SQLite database.
+
+    The tasks table is indexed by assignee, creator, due date and completion
+    status, so the store can hand lookups and overview counters to SQLite as
+    indexed queries and aggregates instead of looping over every task in
+    Python. SQLite's own locking (in WAL mode) lets several sessions share
+    the database safely.
+    """
+
+    name = "sqlite"
+    indexed = True
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS tasks (
+            task_id INTEGER PRIMARY KEY,
+            username TEXT NOT NULL,
+            task_name TEXT NOT NULL,
+            assigned_to TEXT NOT NULL,
+            start_date TEXT NOT NULL,
+            due_date TEXT NOT NULL,
+            completed TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS tasks_assigned_to ON tasks (assigned_to, completed, due_date);
+        CREATE INDEX IF NOT EXISTS tasks_username ON tasks (username);
+        CREATE INDEX IF NOT EXISTS tasks_due_date ON tasks (due_date);
+        CREATE INDEX IF NOT EXISTS tasks_completed ON tasks (completed, due_date);
+        CREATE TABLE IF NOT EXISTS users (
+            username TEXT PRIMARY KEY,
+            password TEXT NOT NULL
+        );
+    """
+
+    TASK_COLUMNS = "username, task_name, assigned_to, start_date, due_date, completed, task_id"
+
+    def __init__(self, path=SQLITE_FILE):
+        self.path = path
+        self.pending_events = 0
+        self._connection = None
+
+    @property
+    def connection(self):
+        if self._connection is None:
+            import sqlite3
+            self._connection = sqlite3.connect(self.path, timeout=30)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript(self.SCHEMA)
+        return self._connection
+
+    def initialize(self):
+        self.connection  # Connecting creates the database and its schema
+
+    def signature(self):
+        return self.connection.execute("PRAGMA data_version").fetchone()
+
+    @instrumented("storage.query")
+    def _tasks(self, where="", params=(), order="task_id"):
+        rows = self.connection.execute(
+            f"SELECT {self.TASK_COLUMNS} FROM tasks {where} ORDER BY {order}", params)
+        tasks = [Task(*row) for row in rows]
+        if METRICS.enabled:
+            METRICS.count(rows=len(tasks))
+        return tasks
+
+    def load_tasks(self):
+        return self._tasks()
+
+    def iter_tasks(self, sort_by=None, **filters):
+        """
+        Stream the tasks matching the view filters, with filtering and sorting
+        done by SQLite using the indexes.
+        """
+        conditions, params = [], []
+        for name, condition in (("assigned_to", "assigned_to = ?"), ("completed", "completed = ?"),
+                                ("due_from", "due_date >= ?"), ("due_to", "due_date <= ?")):
+            if filters.get(name) is not None:
+                conditions.append(condition)
+                params.append(filters[name])
+        where = "WHERE " + " AND ".join(conditions) if conditions else ""
+        order = f"{sort_by}, task_id" if sort_by in SORT_KEYS else "task_id"
+        cursor = self.connection.execute(f"SELECT {self.TASK_COLUMNS} FROM tasks {where} ORDER BY {order}", params)
+        return (Task(*row) for row in cursor)
+
+    def query_tasks(self, assigned_to=None, username=None, completed=None):
+        """
+        Return the tasks matching all given filters, using the indexes.
+        """
+        conditions, params = [], []
+        for column, value in (("assigned_to", assigned_to), ("username", username), ("completed", completed)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        where = "WHERE " + " AND ".join(conditions) if conditions else ""
+        return self._tasks(where, params)
+
+    def _due_filter(self, start, end, assigned_to):
+        conditions, params = ["completed != 'Yes'"], []
+        for condition, value in (("due_date >= ?", start), ("due_date < ?", end), ("assigned_to = ?", assigned_to)):
+            if value is not None:
+                conditions.append(condition)
+                params.append(value)
+        return "WHERE " + " AND ".join(conditions), params
+
+    def query_due(self, start=None, end=None, assigned_to=None):
+        """
+        Return the incomplete tasks due in a range, see TaskStore.incomplete_due().
+        """
+        where, params = self._due_filter(start, end, assigned_to)
+        return self._tasks(where, params, order="due_date, task_id")
+
+    def count_due(self, start=None, end=None, assigned_to=None):
+        where, params = self._due_filter(start, end, assigned_to)
+        return self.connection.execute(f"SELECT COUNT(*) FROM tasks {where}", params).fetchone()[0]
+
+    def get_task(self, task_id):
+        tasks = self._tasks("WHERE task_id = ?", (task_id,))
+        return tasks[0] if tasks else None
+
+    def get_tasks(self, task_ids):
+        """
+        Return the tasks with the given ids in id order, skipping unknown ids.
+        """
+        task_ids = list(task_ids)
+        tasks = []
+        for start in range(0, len(task_ids), 500):  # Stay below SQLite's limit on query parameters
+            chunk = task_ids[start:start + 500]
+            tasks.extend(self._tasks(f"WHERE task_id IN ({', '.join('?' * len(chunk))})", chunk))
+        tasks.sort(key=lambda task: task.task_id)
+        return tasks
+
+    def count_tasks(self):
+        return self.connection.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+
+    @instrumented("storage.query_stats")
+    def stats(self, today=None, assigned_to=None):
+        """
+        Compute TaskStats with one GROUP BY query instead of a Python loop.
+        """
+        stats = TaskStats(today)
+        where, params = "", [stats.today.strftime("%Y-%m-%d")]
+        if assigned_to is not None:
+            where = "WHERE assigned_to = ?"
+            params.append(assigned_to)
+        rows = self.connection.execute(
+            "SELECT assigned_to, COUNT(*), SUM(completed = 'Yes'), "
+            "SUM(completed != 'Yes' AND due_date < ?) "
+            f"FROM tasks {where} GROUP BY assigned_to", params)
+        for username, total, completed, overdue in rows:
+            stats.add_counts(username, total, completed, overdue)
+        return stats
+
+    def append_task(self, task):
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO tasks (username, task_name, assigned_to, start_date, due_date, completed) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (task["username"], task["task_name"], task["assigned_to"],
+                 format_date(task["start_date"]), format_date(task["due_date"]), task["completed"]))
+        return cursor.lastrowid
+
+    def append_tasks(self, tasks):
+        with self.connection:  # One transaction: all rows or none
+            self.connection.executemany(
+                "INSERT INTO tasks (username, task_name, assigned_to, start_date, due_date, completed) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                ((task["username"], task["task_name"], task["assigned_to"],
+                  format_date(task["start_date"]), format_date(task["due_date"]), task["completed"])
+                 for task in tasks))
+
+    def complete_task(self, task_id):
+        with self.connection:
+            self.connection.execute("UPDATE tasks SET completed = 'Yes' WHERE task_id = ?", (task_id,))
+
+    def set_due_date(self, task_id, due_date):
+        with self.connection:
+            self.connection.execute("UPDATE tasks SET due_date = ? WHERE task_id = ?",
+                                    (format_date(due_date), task_id))
+
+    def compact(self):
+        return 0
+
+    def load_users(self):
+        return dict(self.connection.execute("SELECT username, password FROM users ORDER BY rowid"))
+
+    def users_signature(self):
+        return self.signature()  # Changes whenever another connection commits
+
+    def add_user(self, username, password):
+        with self.connection:
+            self.connection.execute("INSERT INTO users (username, password) VALUES (?, ?)", (username, password))
+
+    def add_users(self, users):
+        with self.connection:
+            self.connection.executemany("INSERT INTO users (username, password) VALUES (?, ?)", users)
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+class ShardedBackend(TextBackend):
+    """
+    Storage backend splitting the tasks into text shards by assignee.
+
+    Each assignee hashes (CRC-32) into one of a fixed number of buckets and
+    every bucket is a shard file of "task_id;username;task_name;..." lines
+    with its own event log, so all tasks of one user live in a single shard.
+    The directory also holds a small manifest.json (format version and bucket
+    count) and ids.bin, one byte per task id naming the task's bucket, which
+    keeps task ids global and stable and finds a task without scanning.
+
+    Like SQLite the backend answers queries itself (indexed = True): a user's
+    own tasks and counters only read that user's shard, while whole-dataset
+    views fan out over all shards and merge them back into id order. Users
+    stay in user.txt.
+    """
+
+    name = "sharded"
+    indexed = True
+    VERSION = 1
+    NO_TASK = 255  # Bucket byte of an id that was skipped, so there is no such task
+
+    def __init__(self, directory=SHARD_DIR, users_path=USERS_FILE):
+        super().__init__(directory, users_path)
+        self.manifest_path = os.path.join(directory, "manifest.json")
+        self.ids_path = os.path.join(directory, "ids.bin")
+        self._buckets = None
+
+    def initialize(self):
+        if not os.path.exists(self.manifest_path):
+            os.makedirs(self.path, exist_ok=True)
+            open(self.ids_path, "ab").close()
+            atomic_write(self.manifest_path, [json.dumps({"version": self.VERSION, "buckets": SHARD_BUCKETS})])
+        if not os.path.exists(self.users_path):
+            open(self.users_path, "w").close()
+
+    @property
+    def buckets(self):
+        """
+        The number of shards, read once from the manifest.
+        """
+        if self._buckets is None:
+            with open(self.manifest_path, "r") as file:
+                manifest = json.load(file)
+            if manifest.get("version") != self.VERSION:
+                raise ValueError(f"Unsupported shard manifest version: {manifest.get('version')}")
+            self._buckets = manifest["buckets"]
+        return self._buckets
+
+    def bucket(self, assignee):
+        """
+        Return the bucket holding the tasks assigned to a user.
+        """
+        return zlib.crc32(assignee.encode()) % self.buckets
+
+    def shard_path(self, bucket):
+        return os.path.join(self.path, f"shard_{bucket:03d}.txt")
+
+    def _watched_files(self):
+        return (self.ids_path,) + tuple(events_path_for(self.shard_path(bucket)) for bucket in range(self.buckets))
+
+    def _bucket_of(self, task_id):
+        if task_id < 1:
+            return None
+        try:
+            with open(self.ids_path, "rb") as file:
+                file.seek(task_id - 1)
+                bucket = file.read(1)
+        except FileNotFoundError:
+            return None
+        if not bucket or bucket[0] == self.NO_TASK:
+            return None
+        return bucket[0]
+
+    @instrumented("storage.read_shard")
+    def _read_shard(self, bucket, task_id=None):
+        """
+        Return the tasks of one shard in id order with its pending events
+        applied, or only the task with the given id.
+        """
+        path = self.shard_path(bucket)
+        events = {}
+        for action, event_task_id, value in load_task_events(events_path_for(path)):
+            events.setdefault(event_task_id, []).append((action, value))
+        prefix = None if task_id is None else f"{task_id};"
+        tasks = []
+        try:
+            with open(path, "r") as file:
+                for line in file:
+                    if not line.strip() or (prefix is not None and not line.startswith(prefix)):
+                        continue
+                    line_id, rest = line.split(";", 1)
+                    task = parse_task_line(rest)
+                    task.task_id = int(line_id)
+                    for action, value in events.get(task.task_id, ()):
+                        apply_task_event(task, action, value)
+                    tasks.append(task)
+                if METRICS.enabled:
+                    METRICS.count(rows=len(tasks), bytes_read=os.fstat(file.fileno()).st_size)
+        except FileNotFoundError:
+            pass
+        return tasks
+
+    def _tasks(self, assigned_to=None):
+        """
+        Iterate over the tasks of one assignee's shard, or over every shard
+        merged back into id order.
+        """
+        if assigned_to is not None:
+            return (task for task in self._read_shard(self.bucket(assigned_to)) if task.assigned_to == assigned_to)
+        shards = (iter(self._read_shard(bucket)) for bucket in range(self.buckets))
+        return heapq.merge(*shards, key=lambda task: task.task_id)
+
+    def load_tasks(self):
+        return list(self._tasks())
+
+    def iter_tasks(self, sort_by=None, **filters):
+        return sort_tasks(filter_tasks(self._tasks(filters.get("assigned_to")), **filters), sort_by)
+
+    def query_tasks(self, assigned_to=None, username=None, completed=None):
+        """
+        Return the tasks matching all given filters; an assignee is looked up
+        in its own shard only.
+        """
+        return [task for task in self._tasks(assigned_to)
+                if (username is None or task.username == username)
+                and (completed is None or task.completed == completed)]
+
+    def _due(self, start, end, assigned_to):
+        for task in self._tasks(assigned_to):
+            if task.completed != "Yes":
+                due_text = task.date_text("due_date")
+                if (start is None or due_text >= start) and (end is None or due_text < end):
+                    yield task
+
+    def query_due(self, start=None, end=None, assigned_to=None):
+        """
+        Return the incomplete tasks due in a range, see TaskStore.incomplete_due().
+        """
+        return sorted(self._due(start, end, assigned_to), key=lambda task: (task.date_text("due_date"), task.task_id))
+
+    def count_due(self, start=None, end=None, assigned_to=None):
+        return sum(1 for _ in self._due(start, end, assigned_to))
+
+    def get_task(self, task_id):
+        bucket = self._bucket_of(task_id)
+        if bucket is None:
+            return None
+        tasks = self._read_shard(bucket, task_id)
+        return tasks[0] if tasks else None
+
+    def get_tasks(self, task_ids):
+        """
+        Return the tasks with the given ids in id order, reading each shard
+        that holds any of them once.
+        """
+        try:
+            with open(self.ids_path, "rb") as file:
+                buckets = file.read()
+        except FileNotFoundError:
+            return []
+        wanted = {}  # Bucket -> ids wanted from its shard
+        for task_id in task_ids:
+            if 1 <= task_id <= len(buckets) and buckets[task_id - 1] != self.NO_TASK:
+                wanted.setdefault(buckets[task_id - 1], set()).add(task_id)
+        tasks = [task for bucket, bucket_ids in wanted.items()
+                 for task in self._read_shard(bucket) if task.task_id in bucket_ids]
+        tasks.sort(key=lambda task: task.task_id)
+        return tasks
+
+    def count_tasks(self):
+        try:
+            with open(self.ids_path, "rb") as file:
+                ids = file.read()
+        except FileNotFoundError:
+            return 0
+        return len(ids) - ids.count(self.NO_TASK)
+
+    def stats(self, today=None, assigned_to=None):
+        return compute_task_stats(self._tasks(assigned_to), today)
+
+    def append_task(self, task):
+        return self.append_tasks([task])[0]
+
+    def append_tasks(self, tasks):
+        """
+        Give each task the next task id and append it to its assignee's shard.
+
+        A task that already has an id beyond the last one keeps it (the
+        skipped ids are marked as unused), which is how migrate_storage()
+        carries ids over unchanged. The ids are written before the shard
+        lines, so an interrupted append leaves unused ids, never two tasks
+        with the same id.
+
+        Returns:
+            list: The ids of the tasks.
+        """
+        with locked(self.manifest_path):
+            next_id = os.path.getsize(self.ids_path) + 1
+            ids, task_ids, lines = bytearray(), [], {}
+            for task in tasks:
+                task_id = task.task_id if task.task_id is not None and task.task_id >= next_id else next_id
+                bucket = self.bucket(task["assigned_to"])
+                ids.extend([self.NO_TASK] * (task_id - next_id))
+                ids.append(bucket)
+                next_id = task_id + 1
+                task_ids.append(task_id)
+                lines.setdefault(bucket, []).append(f"{task_id};{format_task_line(task)}")
+            append_all(self.ids_path, bytes(ids))
+            for bucket, bucket_lines in lines.items():
+                append_all(self.shard_path(bucket), "".join(bucket_lines))
+        return task_ids
+
+    def _append_event(self, task_id, action, value=None):
+        bucket = self._bucket_of(task_id)
+        if bucket is None:
+            raise IndexError(f"No task with id {task_id}")
+        with locked(self.manifest_path):  # The same lock compact() holds
+            append_line(events_path_for(self.shard_path(bucket)), format_task_event(action, task_id, value))
+        self.pending_events += 1
+
+    @instrumented("storage.compact")
+    def compact(self):
+        """
+        Merge each shard's event log into the shard, see compact_tasks().
+        """
+        merged = 0
+        with locked(self.manifest_path):
+            for bucket in range(self.buckets):
+                path = self.shard_path(bucket)
+                events_path = events_path_for(path)
+                count = len(load_task_events(events_path))
+                if not count:
+                    continue
+                atomic_write(path, (f"{task.task_id};{format_task_line(task)}" for task in self._read_shard(bucket)))
+                atomic_write(events_path, [])
+                merged += count
+        self.pending_events = 0
+        return merged
+
+
+BACKENDS = {
+    "text": TextBackend,
+    "binary": BinaryBackend,
+    "sqlite": SQLiteBackend,
+    "sharded": ShardedBackend,
+}
+
+
+def open_backend(storage_format=None):
+    """
+    Return the storage backend for "text", "binary", "sqlite" or "sharded",
+    defaulting to the TASKMANAGER_STORAGE environment variable.
+    """
+    storage_format = storage_format or STORAGE_FORMAT
+    try:
+        return BACKENDS[storage_format]()
+    except KeyError:
+        raise ValueError(f"Unknown storage format: {storage_format}") from None
+
+
+MIGRATIONS = {  # Source format -> formats migrate_storage() can copy it into
+    "text": ("sharded", "sqlite"),
+    "binary": ("text",),
+}
+
+
+def migrate_storage(target_format, source_format="text"):
+    """
+    Copy every task and user from one backend into another, e.g. from the
+    text files into a new SQLite database. Task ids are kept. Users are not
+    copied when both backends share user.txt.
+
+    Only the MIGRATIONS can be run: the binary backend converts tasks.txt by
+    itself the first time it is opened, and going back from binary to text
+    is a plain binary_to_text().
+
+    Returns:
+        tuple: The number of tasks and users copied.
+    """
+    if target_format not in MIGRATIONS.get(source_format, ()):
+        raise ValueError(f"Cannot migrate from {source_format} to {target_format} storage")
+    if source_format == "binary":
+        if os.path.exists(TASKS_FILE) and os.path.getsize(TASKS_FILE):
+            raise ValueError("The text storage is not empty")
+        return binary_to_text(BINARY_TASKS_FILE, TASKS_FILE), 0  # Both keep the users in user.txt
+    source = open_backend(source_format)
+    target = open_backend(target_format)
+    try:
+        target.initialize()
+        shared_users = getattr(target, "users_path", None) == getattr(source, "users_path", "")
+        if target.load_tasks() or (target.load_users() and not shared_users):
+            raise ValueError(f"The {target_format} storage is not empty")
+        tasks = source.load_tasks()
+        users = {} if shared_users else source.load_users()
+        if isinstance(target, SQLiteBackend):
+            # One transaction for the whole copy instead of one per row
+            with target.connection:
+                target.connection.executemany(
+                    "INSERT INTO tasks (task_id, username, task_name, assigned_to, start_date, due_date, completed) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    ((task.task_id, task.username, task.task_name, task.assigned_to,
+                      task.date_text("start_date"), task.date_text("due_date"), task.completed) for task in tasks))
+                target.connection.executemany("INSERT INTO users (username, password) VALUES (?, ?)", users.items())
+        else:
+            target.append_tasks(tasks)
+            target.add_users(users.items())
+        return len(tasks), len(users)
+    finally:
+        source.close()
+        target.close()
+
+
+def insort_ids(task_ids, task_id):
+    """
+    Insert a task id into a sorted array of ids.
+    """
+    task_ids.insert(bisect.bisect_left(task_ids, task_id), task_id)
+
+
+class DueDateIndex:
+    """
+    The incomplete tasks sorted by due date, for all tasks and per assignee.
+
+    Every task that is not completed is kept as a (due date text, task id)
+    entry in sorted lists, so counting the tasks due in a date range takes two
+    bisections and listing them a slice, whatever the size of the history.
+    Completed tasks are not in the index at all.
+    """
+
+    def __init__(self, tasks=()):
+        self.entries = []
+        self.by_assignee = {}
+        if isinstance(tasks, TaskTable):
+            incomplete = tasks.incomplete()
+        else:
+            incomplete = ((task.date_text("due_date"), task.task_id, task.assigned_to)
+                          for task in tasks if task.completed != "Yes")
+        for due_date, task_id, assigned_to in incomplete:
+            entry = (due_date, task_id)
+            self.entries.append(entry)
+            self.by_assignee.setdefault(assigned_to, []).append(entry)
+        self.entries.sort()
+        for entries in self.by_assignee.values():
+            entries.sort()
+
+    def add(self, task):
+        if task.completed != "Yes":
+            entry = (task.date_text("due_date"), task.task_id)
+            bisect.insort(self.entries, entry)
+            bisect.insort(self.by_assignee.setdefault(task.assigned_to, []), entry)
+
+    def remove(self, task):
+        """
+        Remove a task, as it was when it was added.
+        """
+        entry = (task.date_text("due_date"), task.task_id)
+        for entries in (self.entries, self.by_assignee.get(task.assigned_to, [])):
+            position = bisect.bisect_left(entries, entry)
+            if position < len(entries) and entries[position] == entry:
+                del entries[position]
+
+    def _bounds(self, start, end, assigned_to):
+        entries = self.entries if assigned_to is None else self.by_assignee.get(assigned_to, [])
+        low = 0 if start is None else bisect.bisect_left(entries, (start,))
+        high = len(entries) if end is None else bisect.bisect_left(entries, (end,))
+        return entries, low, max(low, high)
+
+    def count(self, start=None, end=None, assigned_to=None):
+        """
+        Count the incomplete tasks due on or after start and before end
+        (YYYY-MM-DD text, either may be None for no limit).
+        """
+        _, low, high = self._bounds(start, end, assigned_to)
+        return high - low
+
+    def task_ids(self, start=None, end=None, assigned_to=None):
+        """
+        Return the ids of the incomplete tasks due in a range, see count(),
+        ordered by due date.
+        """
+        entries, low, high = self._bounds(start, end, assigned_to)
+        return [task_id for _, task_id in entries[low:high]]
+
+
+def tokenize(text):
+    """
+    Split a task name or search query into lowercase words.
+    """
+    return re.findall(r"\w+", text.lower())
+
+
+def parse_search_query(query):
+    """
+    Split a search query into OR-ed groups of AND-ed terms, e.g.
+    "fix server OR deploy*" into [["fix", "server"], ["deploy*"]]. A term
+    ending in "*" matches every word starting with it.
+    """
+    groups = [[]]
+    for part in query.split():
+        if part == "OR":
+            groups.append([])
+            continue
+        words = tokenize(part)
+        if words and part.endswith("*"):
+            words[-1] += "*"
+        groups[-1].extend(words)
+    return [group for group in groups if group]
+
+
+class KeywordIndex:
+    """
+    Inverted index from the words of task names to the ids of the tasks.
+
+    The index is saved next to the tasks file in two parts:
+
+        snapshot  a JSON header line, then every word in sorted order (one per
+                  line), an array of offsets and one array of task ids, so
+                  each word's ids are a slice of that array
+        log       the tasks indexed since, one "task_id;word word" line each
+
+    The snapshot is loaded without building anything per word; ids are
+    sliced out when a word is searched for. Indexing a new task appends one
+    line to the log and keeps its words in memory next to the snapshot; once
+    the log holds KEYWORD_LOG_LIMIT tasks both are merged into a new snapshot.
+
+    Task names never change, so the index only needs to know how many tasks
+    it covers: tasks added by other sessions or imports are indexed when
+    TaskStore.keywords next notices them, see catch_up().
+    """
+
+    VERSION = 1
+
+    def __init__(self, path):
+        self.path = path
+        self.log_path = path + ".log"
+        self.covered = 0  # Tasks 1..covered are indexed
+        self.logged = 0  # Tasks in the log
+        self._clear()
+        self._load()
+
+    def _clear(self):
+        self.words = []  # The snapshot's words, sorted
+        self.positions = {}  # Snapshot word -> its position in words
+        self.offsets = array("Q", [0])  # Task ids of words[i] are task_ids[offsets[i]:offsets[i + 1]]
+        self.task_ids = array("I")
+        self.added = {}  # Word -> ids of the tasks indexed since the snapshot, ascending
+        self._added_words = None  # Sorted keys of added for prefix matching, rebuilt when new words appear
+        self.covered = 0
+
+    @instrumented("storage.read_keywords")
+    def _load(self):
+        try:
+            with open(self.path, "rb") as file:
+                header = json.loads(file.readline())
+                if header.get("version") == self.VERSION and header.get("byteorder") == sys.byteorder:
+                    words = file.read(header["words_bytes"]).decode()
+                    self.words = words.split("\n") if words else []
+                    self.offsets = array("Q")
+                    self.offsets.frombytes(file.read(self.offsets.itemsize * (len(self.words) + 1)))
+                    self.task_ids.frombytes(file.read())
+                    self.positions = {word: position for position, word in enumerate(self.words)}
+                    self.covered = header["covered"]
+        except (FileNotFoundError, ValueError, KeyError):
+            self._clear()
+        try:
+            with open(self.log_path, "r") as file:
+                for line in file:
+                    if not line.endswith("\n"):
+                        break  # The remains of an interrupted append
+                    task_id, words = line.rstrip("\n").split(";", 1)
+                    task_id = int(task_id)
+                    if task_id == self.covered + 1:
+                        self._add(task_id, words.split())
+                        self.logged += 1
+                    elif task_id > self.covered + 1:
+                        break  # A gap; the missing tasks are indexed again by catch_up()
+        except FileNotFoundError:
+            pass
+        if METRICS.enabled:
+            METRICS.count(rows=self.covered)
+
+    def _add(self, task_id, words):
+        for word in words:
+            task_ids = self.added.get(word)
+            if task_ids is None:
+                task_ids = self.added[word] = array("I")
+                self._added_words = None
+            task_ids.append(task_id)
+        self.covered = task_id
+
+    def add(self, task_id, task_name):
+        """
+        Index a new task, provided it is the next one; otherwise the tasks in
+        between are missing and catch_up() has to index them first.
+        """
+        if task_id == self.covered + 1:
+            self.add_many([(task_id, task_name)])
+
+    def add_many(self, tasks):
+        """
+        Index (task_id, task_name) pairs that follow on from the covered tasks
+        and save them: to the log, or as a new snapshot once the log is full.
+        """
+        lines = []
+        for task_id, task_name in tasks:
+            words = sorted(set(tokenize(task_name)))
+            self._add(task_id, words)
+            lines.append(f"{task_id};{' '.join(words)}\n")
+        if not lines:
+            return
+        if self.logged + len(lines) >= KEYWORD_LOG_LIMIT:
+            self.save()
+        else:
+            with locked(self.path):
+                append_all(self.log_path, "".join(lines))
+            self.logged += len(lines)
+
+    def catch_up(self, count, task_names):
+        """
+        Bring the index up to date with a store holding count tasks.
+        param task_names: Function returning (task_id, task_name) pairs for a range of ids.
+        """
+        if count < self.covered:  # The tasks were replaced, start again
+            self._clear()
+            self.save()  # Drops the log, which no longer matches the tasks
+        if count > self.covered:
+            self.add_many(task_names(self.covered + 1, count + 1))
+
+    def _ids(self, word):
+        task_ids = array("I")
+        position = self.positions.get(word)
+        if position is not None:
+            task_ids = self.task_ids[self.offsets[position]:self.offsets[position + 1]]
+        if word in self.added:
+            task_ids.extend(self.added[word])  # Indexed after the snapshot, so the ids stay ascending
+        return task_ids
+
+    @instrumented("storage.write_keywords")
+    def save(self):
+        """
+        Merge the words indexed since the snapshot into a new snapshot and empty the log.
+        """
+        words = sorted(self.positions.keys() | self.added.keys())
+        offsets, task_ids = array("Q", [0]), array("I")
+        for word in words:
+            task_ids.extend(self._ids(word))
+            offsets.append(len(task_ids))
+        words_block = "\n".join(words).encode()
+        header = {"version": self.VERSION, "byteorder": sys.byteorder, "covered": self.covered,
+                  "words_bytes": len(words_block)}
+        with locked(self.path):
+            # Snapshot first: log lines it already covers are skipped when loading
+            atomic_write(self.path, [json.dumps(header).encode() + b"\n", words_block,
+                                     offsets.tobytes(), task_ids.tobytes()], mode="wb")
+            atomic_write(self.log_path, [])
+        self.words, self.offsets, self.task_ids = words, offsets, task_ids
+        self.positions = {word: position for position, word in enumerate(words)}
+        self.added, self._added_words, self.logged = {}, None, 0
+
+    def _term_ids(self, term):
+        """
+        Return the ids of the tasks containing a word, or any word starting
+        with the prefix of a "prefix*" term, in ascending order.
+        """
+        if not term.endswith("*"):
+            return self._ids(term)
+        prefix = term[:-1]
+        if self._added_words is None:
+            self._added_words = sorted(self.added)
+        matched = set()  # Words both in the snapshot and added since are found twice
+        for words in (self.words, self._added_words):
+            for position in range(bisect.bisect_left(words, prefix), len(words)):
+                if not words[position].startswith(prefix):
+                    break
+                matched.add(words[position])
+        postings = [self._ids(word) for word in matched]
+        if len(postings) == 1:
+            return postings[0]
+        return sorted(set().union(*postings))
+
+    def search(self, query):
+        """
+        Return the ids of the tasks matching a query (see parse_search_query()) in ascending order.
+
+        The words of a group are intersected starting from the rarest one,
+        whose ids are looked up in the other words' sorted ids by bisection,
+        so a rare word makes the whole group cheap.
+        """
+        results = []
+        for group in parse_search_query(query):
+            postings = sorted((self._term_ids(term) for term in group), key=len)
+            matches = postings[0]
+            for task_ids in postings[1:]:
+                matches = [task_id for task_id in matches if _sorted_contains(task_ids, task_id)]
+            results.append(matches)
+        if len(results) == 1:
+            return list(results[0])
+        return sorted(set().union(*results))
+
+
+def _sorted_contains(values, value):
+    position = bisect.bisect_left(values, value)
+    return position < len(values) and values[position] == value
+
+
+class TaskStore:
+    """
+    The tasks of a session, shared by all menu actions.
+
+    The store sits on top of a storage backend. For the file based backends
+    the tasks are loaded once into a compact TaskTable and kept in memory
+    together with secondary indexes (lists of task ids) by assignee, by
+    creator and by completion status, each built on first use. Before
+    answering a query the store checks the backend's signature (file
+    modification times and sizes) and only reloads when somebody else
+    changed the files.
+
+    Indexed backends (SQLite, sharded) keep nothing in memory: lookups and
+    overview counters are passed straight through to the backend, which
+    answers a user's own queries from an index or that user's shard.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend if backend is not None else open_backend()
+        self.users = UserRegistry(self.backend)
+        self.overview = None
+        if not self.backend.indexed:
+            self.overview = OverviewCache(overview_path_for(self.backend.path))
+        self.tasks = TaskTable()
+        self._by_assignee = None  # Lists of task ids, built on first use, see by_assignee
+        self._by_creator = None
+        self._by_status = None
+        self._due_index = None  # Built on first use, see due_index
+        self._keywords = None  # Loaded on first search, see keywords
+        self._rollups = None  # Loaded on first trend report, see rollups
+        self._signature = None
+        if not self.backend.indexed:
+            self.reload()
+
+    @property
+    def path(self):
+        return self.backend.path
+
+    @property
+    def pending_events(self):
+        return self.backend.pending_events
+
+    def refresh(self):
+        """
+        Reload the tasks if the backend's files changed since they were last read.
+        """
+        if not self.backend.indexed and self.backend.signature() != self._signature:
+            self.reload()
+
+    @instrumented("store.reload")
+    def reload(self):
+        """
+        Load all tasks from the backend again and rebuild every index.
+        """
+        self._signature = self.backend.signature()
+        self.tasks = self.backend.load_table()
+        self._rebuild_indexes()
+
+    def _rebuild_indexes(self):
+        # Dropped here and rebuilt when next needed, so loading stays cheap
+        self._by_assignee = self._by_creator = self._by_status = None
+        self._due_index = None
+
+    @staticmethod
+    def _group_ids(column, values):
+        """
+        Return a dictionary from each value of a TaskTable column to the ids of
+        the tasks that have it.
+        """
+        ids = {}  # Column value -> task ids, gathered before translating to names
+        for task_id, value in enumerate(column, start=1):
+            task_ids = ids.get(value)
+            if task_ids is None:
+                task_ids = ids[value] = array("I")
+            task_ids.append(task_id)
+        return {values[value]: task_ids for value, task_ids in ids.items()}
+
+    @property
+    def by_assignee(self):
+        """
+        Assignee -> ids of their tasks, built the first time it is needed.
+        """
+        if self._by_assignee is None:
+            self._by_assignee = self._group_ids(self.tasks.assignees, self.tasks.users)
+        return self._by_assignee
+
+    @property
+    def by_creator(self):
+        if self._by_creator is None:
+            self._by_creator = self._group_ids(self.tasks.creators, self.tasks.users)
+        return self._by_creator
+
+    @property
+    def by_status(self):
+        if self._by_status is None:
+            self._by_status = self._group_ids(self.tasks.flags, self.tasks.flag_values)
+        return self._by_status
+
+    def _index(self, task):
+        for index, value in ((self._by_assignee, task.assigned_to), (self._by_creator, task.username),
+                             (self._by_status, task.completed)):
+            if index is not None:  # Indexes not built yet will include the task anyway
+                index.setdefault(value, array("I")).append(task.task_id)
+
+    @property
+    def due_index(self):
+        """
+        The DueDateIndex of the tasks, built the first time it is needed and
+        then kept up to date by add(), complete() and set_due_date().
+        """
+        self.refresh()
+        if self._due_index is None:
+            self._due_index = DueDateIndex(self.tasks)
+        return self._due_index
+
+    @property
+    def keywords(self):
+        """
+        The KeywordIndex of the task names, loaded on first use and brought
+        up to date with tasks added since it was saved.
+        """
+        if self._keywords is None:
+            self._keywords = KeywordIndex(keyword_index_path_for(self.backend.path))
+        self._keywords.catch_up(len(self), self._task_names)
+        return self._keywords
+
+    def _task_names(self, start, end):
+        if self.backend.indexed:
+            return [(task.task_id, task.task_name) for task in self.backend.get_tasks(range(start, end))]
+        return [(row + 1, self.tasks.task_name(row)) for row in range(start - 1, end - 1)]
+
+    @property
+    def rollups(self):
+        """
+        The DailyRollups of the tasks, loaded on first use and brought up to
+        date with the tasks added and completed since they were last updated.
+        """
+        if self._rollups is None:
+            self._rollups = DailyRollups(rollups_path_for(self.backend.path))
+        self._rollups.update(self)
+        return self._rollups
+
+    def created_counts(self, start, end):
+        """
+        Count the tasks with ids from start up to (not including) end by
+        (start date as YYYY-MM-DD, assignee), for DailyRollups.update().
+        """
+        if self.backend.indexed:
+            return Counter((task.date_text("start_date"), task.assigned_to)
+                           for task in self.backend.get_tasks(range(start, end)))
+        self.refresh()
+        table = self.tasks
+        pairs = Counter(zip(table.starts[start - 1:end - 1], table.assignees[start - 1:end - 1]))
+        return {(day_to_text(day) if day else UNDATED, table.users[user_id]): count
+                for (day, user_id), count in pairs.items()}
+
+    def trends(self, start=None, end=None, period="week", assigned_to=None):
+        """
+        Return created, completed and overdue counts per period from the
+        daily rollups, see DailyRollups.trend().
+        """
+        return self.rollups.trend(start, end, period, assigned_to)
+
+    def login(self, username, password):
+        """
+        Check a username and password (the built-in admin's included).
+
+        Returns:
+            str: The username if they match, None otherwise.
+        """
+        if self.users.get(username) == password or (username == "admin" and password == "password"):
+            return username
+        return None
+
+    def search(self, query, assigned_to=None, completed=None):
+        """
+        Return the tasks whose names match a keyword query (see
+        parse_search_query()), in id order.
+        param assigned_to: Only the tasks of this assignee.
+        param completed: Only tasks with this completed flag, "Yes" or "No".
+        """
+        task_ids = self.keywords.search(query)
+        if self.backend.indexed:
+            if assigned_to is None and completed is None:
+                return self.backend.get_tasks(task_ids)
+            # The filters use the backend's indexes (or a single shard)
+            wanted = set(task_ids)
+            return [task for task in self.backend.query_tasks(assigned_to=assigned_to, completed=completed)
+                    if task.task_id in wanted]
+        if assigned_to is None and completed is None:
+            return self.tasks.rows(task_ids)
+        return [task for task in self.tasks.rows(task_ids)
+                if (assigned_to is None or task.assigned_to == assigned_to)
+                and (completed is None or task.completed == completed)]
+
+    def __len__(self):
+        if self.backend.indexed:
+            return self.backend.count_tasks()
+        self.refresh()
+        return len(self.tasks)
+
+    def all(self):
+        """
+        Return every task in id order.
+        """
+        if self.backend.indexed:
+            return self.backend.load_tasks()
+        self.refresh()
+        return self.tasks
+
+    def get(self, task_id):
+        """
+        Return the task with the given id, or None if there is no such task.
+        """
+        if self.backend.indexed:
+            return self.backend.get_task(task_id)
+        self.refresh()
+        if 1 <= task_id <= len(self.tasks):
+            return self.tasks[task_id - 1]
+        return None
+
+    def assigned_to(self, username):
+        """
+        Return the tasks assigned to the given user.
+        """
+        if self.backend.indexed:
+            return self.backend.query_tasks(assigned_to=username)
+        self.refresh()
+        return self.tasks.rows(self.by_assignee.get(username, ()))
+
+    def created_by(self, username):
+        """
+        Return the tasks created by the given user.
+        """
+        if self.backend.indexed:
+            return self.backend.query_tasks(username=username)
+        self.refresh()
+        return self.tasks.rows(self.by_creator.get(username, ()))
+
+    def mine(self, username):
+        """
+        Return the tasks the given user created or is assigned, in id order.
+        """
+        if self.backend.indexed:
+            tasks = {task.task_id: task for task in self.backend.query_tasks(username=username)}
+            tasks.update((task.task_id, task) for task in self.backend.query_tasks(assigned_to=username))
+            return [tasks[task_id] for task_id in sorted(tasks)]
+        self.refresh()
+        task_ids = set(self.by_creator.get(username, ())).union(self.by_assignee.get(username, ()))
+        return self.tasks.rows(sorted(task_ids))
+
+    def with_status(self, completed):
+        """
+        Return the tasks whose completed flag is "Yes" or "No".
+        """
+        if self.backend.indexed:
+            return self.backend.query_tasks(completed=completed)
+        self.refresh()
+        return self.tasks.rows(self.by_status.get(completed, ()))
+
+    def iter_tasks(self, sort_by=None, **filters):
+        """
+        Iterate over the tasks matching the view filters (see row_matches()),
+        optionally sorted. Tasks already in memory are filtered through the
+        indexes and handed out as read-only Task copies (see TaskTable.tasks());
+        a sorted view sorts the matching ids on the columns and decodes each
+        task only as it is handed out. Indexed backends run the query themselves.
+        """
+        if self.backend.indexed:
+            return self.backend.iter_tasks(sort_by=sort_by, **filters)
+        self.refresh()
+        task_ids = None
+        if filters.get("assigned_to") is not None:
+            task_ids = self.by_assignee.get(filters["assigned_to"], ())
+        elif filters.get("completed") is not None:
+            task_ids = self.by_status.get(filters["completed"], ())
+        if sort_by is not None:
+            task_ids = self.tasks.matching_ids(filters, task_ids)
+            task_ids.sort(key=self.tasks.sort_key(sort_by))  # Stable, so ties keep id order
+            return self.tasks.tasks(task_ids)
+        return filter_tasks(self.tasks.tasks(task_ids), **filters)
+
+    def incomplete_due(self, start=None, end=None, assigned_to=None):
+        """
+        Return the incomplete tasks due on or after start and before end
+        (dates, either may be None for no limit), ordered by due date.
+        param assigned_to: Only the tasks of this assignee.
+        """
+        start = None if start is None else format_date(start)
+        end = None if end is None else format_date(end)
+        if self.backend.indexed:
+            return self.backend.query_due(start, end, assigned_to)
+        return self.tasks.rows(self.due_index.task_ids(start, end, assigned_to))
+
+    def count_incomplete_due(self, start=None, end=None, assigned_to=None):
+        """
+        Count the tasks incomplete_due() would return.
+        """
+        start = None if start is None else format_date(start)
+        end = None if end is None else format_date(end)
+        if self.backend.indexed:
+            return self.backend.count_due(start, end, assigned_to)
+        return self.due_index.count(start, end, assigned_to)
+
+    def stats(self, today=None):
+        """
+        Return the TaskStats of all tasks.
+        """
+        if self.backend.indexed:
+            return self.backend.stats(today)
+        self.refresh()
+        return self.tasks.stats(today)
+
+    def overview_stats(self, today=None):
+        """
+        Return the TaskStats of all tasks from the incrementally maintained
+        overview counters, see OverviewCache.
+        """
+        if self.overview is None:
+            return self.stats(today)
+        return self.overview.stats(self, today)
+
+    def report_key(self, *extra):
+        """
+        Return a key that changes whenever the overview counters change.
+        """
+        if self.overview is None:
+            return None  # Indexed backends recompute reports every time
+        return self.overview.report_key(*extra)
+
+    def report_is_fresh(self, report_path, key):
+        """
+        Check whether a report file is up to date with the overview counters.
+        """
+        return self.overview is not None and self.overview.is_fresh(report_path, key)
+
+    def mark_report_fresh(self, report_path, key):
+        if self.overview is not None:
+            self.overview.mark_fresh(report_path, key)
+
+    def _apply_overview_delta(self, before_signature, change):
+        if self.overview is not None:
+            self.overview.apply(before_signature, self._signature, change)
+
+    def user_stats(self, username, today=None):
+        """
+        Return the counters of the tasks assigned to one user, see TaskStats.user().
+        """
+        if self.backend.indexed:
+            return self.backend.stats(today, assigned_to=username).user(username)
+        self.refresh()
+        return self.tasks.stats(today, self.by_assignee.get(username, ())).user(username)
+
+    def add(self, task):
+        """
+        Store a new task and add it to the in-memory indexes.
+        param task: A Task, or a dictionary with the same keys.
+        """
+        if not isinstance(task, Task):
+            task = Task.from_dict(task)
+        if self.backend.indexed:
+            task.task_id = self.backend.append_task(task)
+            if self._keywords is not None:
+                self._keywords.add(task.task_id, task.task_name)
+            return task
+        # Under the backend's lock, so no other session can append between
+        # catching up with the files and this append: the new task's id is
+        # the next row of the table
+        with locked(self.backend.path):
+            self.refresh()
+            before_signature = self._signature
+            self.backend.append_task(task)
+            task = self.tasks[self.tasks.append_task(task) - 1]
+            self._signature = self.backend.signature()
+        self._index(task)
+        if self._due_index is not None:
+            self._due_index.add(task)
+        if self._keywords is not None:
+            self._keywords.add(task.task_id, task.task_name)
+        self._apply_overview_delta(before_signature, lambda stats: stats.add(task))
+        return task
+
+    @contextmanager
+    def _updating(self):
+        """
+        Hold the backend's lock around a change to an existing task, so the
+        signature taken afterwards covers this change only and never hides
+        one made by another session (see add()).
+        """
+        if self.backend.indexed:
+            yield
+            return
+        with locked(self.backend.path):
+            self.refresh()
+            yield
+            self._signature = self.backend.signature()
+
+    def complete(self, task_id):
+        """
+        Mark a task as complete.
+        """
+        with self._updating():
+            task = self.get(task_id)
+            if task is None:
+                raise IndexError(f"No task with id {task_id}")
+            before_signature = self._signature
+            before = Task.from_dict(task.to_dict())  # The task as the counters know it
+            with counting_completion(rollups_path_for(self.backend.path), task):
+                self.backend.complete_task(task_id)
+            if task.completed != "Yes":
+                if not self.backend.indexed:
+                    if self._by_status is not None:
+                        self._by_status[task.completed].remove(task_id)
+                        insort_ids(self._by_status.setdefault("Yes", array("I")), task_id)
+                    if self._due_index is not None:
+                        self._due_index.remove(task)
+                task.completed = "Yes"
+        self._apply_overview_delta(before_signature, lambda stats: stats.mark_completed(before))
+        return task
+
+    def set_due_date(self, task_id, due_date):
+        """
+        Change the due date of a task.
+        param due_date: The new due date as a datetime.
+        """
+        with self._updating():
+            task = self.get(task_id)
+            if task is None:
+                raise IndexError(f"No task with id {task_id}")
+            before_signature = self._signature
+            before = Task.from_dict(task.to_dict())
+            self.backend.set_due_date(task_id, due_date)
+            task.due_date = due_date
+            if self._due_index is not None and not self.backend.indexed:
+                self._due_index.remove(before)
+                self._due_index.add(task)
+        self._apply_overview_delta(before_signature, lambda stats: stats.change_due_date(before, due_date))
+        return task
+
+    def compact(self):
+        """
+        Merge pending updates into the main tasks file, see compact_tasks().
+        """
+        before_signature = self.backend.signature()
+        merged = self.backend.compact()
+        if not self.backend.indexed:
+            self.reload()
+            # Compaction moves data between files without changing it
+            self._apply_overview_delta(before_signature, lambda stats: None)
+        return merged
+
+
+class TaskStats:
+    """
+    Task counters for all tasks and for every assignee.
+
+    All three overview reports read their numbers from this one object, so the
+    definition of "completed" and "overdue" is the same everywhere: a task is
+    completed when its flag is "Yes" and overdue when it is not completed and
+    its due date is before today.
+    """
+
+    def __init__(self, today=None):
+        if today is None:
+            today = datetime.date.today()
+        self.today = today
+        # YYYY-MM-DD text sorts like the dates it encodes, so due dates can be
+        # compared without decoding them.
+        self._today_text = today.strftime("%Y-%m-%d")
+        self.total = 0
+        self.completed = 0
+        self.overdue = 0
+        self.per_user = {}  # assignee -> [total, completed, overdue]
+
+    @property
+    def incomplete(self):
+        return self.total - self.completed
+
+    def add(self, task):
+        """
+        Count one task.
+        """
+        counts = self.per_user.get(task.assigned_to)
+        if counts is None:
+            counts = self.per_user[task.assigned_to] = [0, 0, 0]
+        self.total += 1
+        counts[0] += 1
+        if task.completed == "Yes":
+            self.completed += 1
+            counts[1] += 1
+        elif task.date_text("due_date") < self._today_text:
+            self.overdue += 1
+            counts[2] += 1
+
+    def add_counts(self, username, total, completed, overdue):
+        """
+        Add counters that were computed elsewhere (e.g. by a SQL query) for one assignee.
+        """
+        counts = self.per_user.setdefault(username, [0, 0, 0])
+        counts[0] += total
+        counts[1] += completed
+        counts[2] += overdue
+        self.total += total
+        self.completed += completed
+        self.overdue += overdue
+
+    def _is_overdue(self, task, due_text=None):
+        if due_text is None:
+            due_text = task.date_text("due_date")
+        return task.completed != "Yes" and due_text < self._today_text
+
+    def mark_completed(self, task):
+        """
+        Update the counters for a task that is about to be marked complete.
+        """
+        if task.completed == "Yes":
+            return
+        counts = self.per_user.setdefault(task.assigned_to, [0, 0, 0])
+        self.completed += 1
+        counts[1] += 1
+        if self._is_overdue(task):
+            self.overdue -= 1
+            counts[2] -= 1
+
+    def change_due_date(self, task, new_due_date):
+        """
+        Update the counters for a task whose due date is about to change.
+        """
+        change = self._is_overdue(task, format_date(new_due_date)) - self._is_overdue(task)
+        if change:
+            self.overdue += change
+            self.per_user.setdefault(task.assigned_to, [0, 0, 0])[2] += change
+
+    def advance(self, today, tasks):
+        """
+        Move the counters forward to a later day.
+        param tasks: Incomplete tasks, of which those due on or after the old
+            day and before the new one become overdue.
+        """
+        old_text = self._today_text
+        self.today = today
+        self._today_text = today.strftime("%Y-%m-%d")
+        for task in tasks:
+            if task.completed != "Yes" and old_text <= task.date_text("due_date") < self._today_text:
+                self.overdue += 1
+                self.per_user.setdefault(task.assigned_to, [0, 0, 0])[2] += 1
+
+    def to_dict(self):
+        return {
+            "today": self._today_text,
+            "total": self.total,
+            "completed": self.completed,
+            "overdue": self.overdue,
+            "per_user": self.per_user
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls(parse_date(data["today"]).date())
+        stats.total = data["total"]
+        stats.completed = data["completed"]
+        stats.overdue = data["overdue"]
+        stats.per_user = data["per_user"]
+        return stats
+
+    def user(self, username):
+        """
+        Return the counters of one assignee as a dictionary.
+        """
+        total, completed, overdue = self.per_user.get(username, (0, 0, 0))
+        return {
+            "total": total,
+            "completed": completed,
+            "incomplete": total - completed,
+            "overdue": overdue
+        }
+
+
+@instrumented("stats.scan")
+def compute_task_stats(tasks, today=None):
+    """
+    Compute global and per-assignee counters in a single pass over the tasks.
+
+    Args:
+        tasks (iterable): Task records.
+        today (datetime.date): The day overdue is measured against, defaults to today.
+
+    Returns:
+        TaskStats: The counters.
+    """
+    stats = TaskStats(today)
+    add = stats.add
+    for task in tasks:
+        add(task)
+    if METRICS.enabled:
+        METRICS.count(rows=stats.total)
+    return stats
+
+
+def split_file(path, chunk_size):
+    """
+    Split a file into (start, end) byte ranges of about chunk_size bytes that
+    each begin at the start of a line.
+    """
+    size = os.path.getsize(path)
+    ranges = []
+    with open(path, "rb") as file:
+        start = 0
+        while start < size:
+            file.seek(min(start + chunk_size, size))
+            file.readline()  # Move on to the end of the line the boundary fell into
+            end = min(file.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def count_task_chunk(path, start, end, today_text):
+    """
+    Count the tasks in one byte range of a text tasks file.
+
+    This is the job parallel_task_stats() runs in each worker process. Lines
+    are split and counted directly, without building Task records, using the
+    same rules as TaskStats.add().
+
+    Returns:
+        dict: assignee -> [total, completed, overdue], in order of first appearance.
+
+    Raises:
+        ValueError: If a line is malformed.
+    """
+    with open(path, "rb") as file:
+        file.seek(start)
+        data = file.read(end - start)
+    per_user = {}
+    # Decoded like open(path, "r") would, so lines are split the same way as in read_tasks_file()
+    for line in io.TextIOWrapper(io.BytesIO(data)):
+        if not line.strip():
+            continue
+        parts = line.strip().split(";")
+        if len(parts) < 6:
+            raise ValueError(f"Malformed task line: {line.strip()}")
+        counts = per_user.get(parts[2])
+        if counts is None:
+            counts = per_user[parts[2]] = [0, 0, 0]
+        counts[0] += 1
+        if parts[5] == "Yes":
+            counts[1] += 1
+        elif parts[4] < today_text:
+            counts[2] += 1
+    return per_user
+
+
+@instrumented("stats.parallel_scan")
+def parallel_task_stats(path, today=None, workers=None):
+    """
+    Count a text tasks file in parallel.
+
+    The file is split into byte ranges aligned on line starts, each range is
+    counted by count_task_chunk() in a process pool and the partial counters
+    are merged in file order, which gives exactly the counters
+    compute_task_stats() computes from the same file. Files smaller than one
+    chunk are counted in this process.
+
+    The event log is not applied; callers only use this when it is empty.
+
+    Args:
+        path (str): The text tasks file.
+        today (datetime.date): The day overdue is measured against, defaults to today.
+        workers (int): Worker processes, defaults to the number of CPUs.
+
+    Returns:
+        TaskStats: The counters.
+
+    Raises:
+        ValueError: If the file has a malformed line.
+    """
+    stats = TaskStats(today)
+    today_text = format_date(stats.today)
+    workers = workers or os.cpu_count() or 1
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    # A few chunks per worker, so a slow chunk does not hold up the whole run
+    chunk_size = max(REPORT_CHUNK_SIZE, -(-size // (workers * 4)))
+    ranges = split_file(path, chunk_size)
+    if workers == 1 or len(ranges) <= 1:
+        partials = [count_task_chunk(path, start, end, today_text) for start, end in ranges]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as pool:
+            partials = list(pool.map(count_task_chunk, *zip(*[(path, start, end, today_text)
+                                                                for start, end in ranges])))
+    for per_user in partials:
+        for username, (total, completed, overdue) in per_user.items():
+            stats.add_counts(username, total, completed, overdue)
+    if METRICS.enabled:
+        METRICS.count(rows=stats.total, bytes_read=size)
+    return stats
+
+
+class OverviewCache:
+    """
+    Overview counters kept on disk and maintained incrementally.
+
+    The file holds a TaskStats snapshot together with the backend signature
+    it belongs to. Adding, completing or re-dating a task applies a small delta
+    to the snapshot instead of recounting, and a new day only recounts the
+    tasks that became overdue since the last refresh. If the signature no
+    longer matches (the data was changed by something that did not update the
+    counters) the counters are rebuilt with one full pass.
+
+    The cache also remembers which counters each report file was written
+    from, so display_statistics() can tell a stale report from a fresh one.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _save(self, state):
+        atomic_write(self.path, [json.dumps(state)])
+
+    def stats(self, store, today=None):
+        """
+        Return up-to-date TaskStats for the store.
+        """
+        if today is None:
+            today = datetime.date.today()
+        state = self._load()
+        signature = signature_to_json(store.backend.signature())
+        if state is None or state["signature"] != signature or state["stats"]["today"] > format_date(today):
+            stats = store.stats(today)
+            self.replace(signature, stats)
+            return stats
+        stats = TaskStats.from_dict(state["stats"])
+        if stats.today < today:
+            stats.advance(today, store.incomplete_due(stats.today, today))  # Only what became overdue
+            state["stats"] = stats.to_dict()
+            state["generation"] += 1
+            self._save(state)
+        return stats
+
+    def replace(self, signature, stats):
+        """
+        Store counters that were computed from scratch for the data with the
+        given backend signature. Every report becomes stale.
+        """
+        state = self._load()
+        generation = state["generation"] + 1 if state else 1
+        self._save({"signature": signature_to_json(signature), "generation": generation,
+                    "stats": stats.to_dict(), "reports": {}})
+
+    def apply(self, before_signature, after_signature, change):
+        """
+        Apply a delta to the stored counters.
+        param change: Called with the TaskStats to update.
+        Counters that do not belong to before_signature are left alone; they
+        are stale and will be rebuilt on the next read anyway.
+        """
+        state = self._load()
+        if state is None or state["signature"] != signature_to_json(before_signature):
+            return
+        stats = TaskStats.from_dict(state["stats"])
+        change(stats)
+        state["stats"] = stats.to_dict()
+        state["signature"] = signature_to_json(after_signature)
+        state["generation"] += 1
+        self._save(state)
+
+    def report_key(self, *extra):
+        """
+        Return the key identifying the current counters (plus any extra inputs
+        of a report, such as the user list).
+        """
+        state = self._load()
+        return [state["generation"] if state else None, *extra]
+
+    def is_fresh(self, report_path, key):
+        """
+        Check whether a report file was written from the counters identified by key.
+        """
+        state = self._load()
+        if state is None or not os.path.exists(report_path):
+            return False
+        return state["reports"].get(report_path) == [key, os.stat(report_path).st_mtime_ns]
+
+    def mark_fresh(self, report_path, key):
+        """
+        Remember that a report file was just written from the counters identified by key.
+        """
+        state = self._load()
+        if state is not None:
+            state["reports"][report_path] = [key, os.stat(report_path).st_mtime_ns]
+            self._save(state)
+
+
+UNDATED = "-"  # Day of rollup counters that have no date, see DailyRollups
+TREND_PERIODS = {  # Period of a trend report -> function from YYYY-MM-DD to the period's label
+    "day": lambda day: day,
+    "week": lambda day: "%d-W%02d" % parse_date(day).isocalendar()[:2],
+    "month": lambda day: day[:7],
+}
+
+
+class DailyRollups:
+    """
+    Per-day, per-assignee task counters for trend reports, kept in an
+    append-only file next to the tasks file. Each line adds to the counters
+    of one day and assignee:
+
+        2024-05-01;alice;3;1;0      created, completed, overdue at the end of the day
+        2024-05-01;;0;0;0           marks 2024-05-01 as closed
+
+    Created counts come from the tasks' start dates, so the whole history is
+    known; update() counts the tasks added since it last ran, by any session,
+    command or import. The tasks file does not record when a task was
+    completed, so completions are counted on the day they happen (see
+    counting_completion()) or, if something else completed them, on the day
+    update() finds them; completions from before the rollups existed are
+    counted under the day "-". Once a day is over update() closes it by
+    appending the overdue tasks of every assignee as of that day's end.
+
+    The totals of all assignees per day are saved in a small JSON file
+    together with how much of the log they cover, so loading only reads the
+    lines appended since. Trend reports add up these counters and never look
+    at the tasks; a single assignee's trend reads that user's lines from the log.
+    """
+
+    VERSION = 1
+
+    def __init__(self, path):
+        self.path = path
+        self.totals_path = path + ".totals"
+        self._load_totals()
+        self.refresh()
+
+    def _clear(self):
+        self.days = {}  # Day -> [created, completed, overdue] of all assignees
+        self.created = 0  # Tasks 1..created are counted
+        self.completed = {}  # Assignee -> completions counted
+        self.first_closed = None  # Days from first_closed to closed have their overdue counts
+        self.closed = None
+        self._offset = 0  # Bytes of the log read so far
+        self._inode = None
+
+    def _load_totals(self):
+        self._clear()
+        try:
+            with open(self.totals_path, "r") as file:
+                state = json.load(file)
+            if state.get("version") == self.VERSION:
+                self.days, self.created, self.completed = state["days"], state["created"], state["completed"]
+                self.first_closed, self.closed = state["first_closed"], state["closed"]
+                self._offset, self._inode = state["offset"], state["inode"]
+        except (FileNotFoundError, ValueError, KeyError):
+            self._clear()
+        self._saved_offset = self._offset
+
+    def _save_totals(self):
+        state = {"version": self.VERSION, "days": self.days, "created": self.created,
+                 "completed": self.completed, "first_closed": self.first_closed, "closed": self.closed,
+                 "offset": self._offset, "inode": self._inode}
+        atomic_write(self.totals_path, [json.dumps(state)])
+        self._saved_offset = self._offset
+
+    @instrumented("rollups.read")
+    def refresh(self):
+        """
+        Read the lines appended since the log was last read, by this session or any other.
+        """
+        try:
+            with open(self.path, "rb") as file:
+                status = os.fstat(file.fileno())
+                if status.st_ino != self._inode or status.st_size < self._offset:
+                    self._clear()  # Rebuilt by update(), read it again
+                    self._inode = status.st_ino
+                file.seek(self._offset)
+                data = file.read()
+        except FileNotFoundError:
+            self._clear()
+            return
+        data = data[:data.rfind(b"\n") + 1]  # A line without its newline is still being appended
+        self._offset += len(data)
+        days, completed_by_user = self.days, self.completed
+        for line in data.decode().splitlines():
+            try:
+                day, username, created, completed, overdue = line.split(";")
+                created, completed, overdue = int(created), int(completed), int(overdue)
+            except ValueError:
+                logging.error("Skipping malformed line in %s: %r", self.path, line)
+                continue
+            totals = days.get(day)
+            if totals is None:
+                totals = days[day] = [0, 0, 0]
+            if not username:  # A day closed
+                if self.first_closed is None or day < self.first_closed:
+                    self.first_closed = day
+                if self.closed is None or day > self.closed:
+                    self.closed = day
+                continue
+            totals[0] += created
+            totals[1] += completed
+            totals[2] += overdue
+            self.created += created
+            if completed:
+                completed_by_user[username] = completed_by_user.get(username, 0) + completed
+        if METRICS.enabled:
+            METRICS.count(bytes_read=len(data))
+
+    def is_closed(self, day):
+        return self.first_closed is not None and self.first_closed <= day <= self.closed
+
+    @instrumented("rollups.update")
+    def update(self, store, today=None):
+        """
+        Bring the counters up to date with a store: count the tasks added and
+        completed since they were last updated, and close the days that are over.
+        """
+        if today is None:
+            today = datetime.date.today()
+        with locked(self.path):
+            self.refresh()
+            count = len(store)
+            if count < self.created:  # The tasks were replaced, start again
+                atomic_write(self.path, [])
+                self.refresh()
+            started = self._offset > 0
+            lines = [f"{day};{username};{created};0;0\n"
+                     for (day, username), created in sorted(store.created_counts(self.created + 1, count + 1).items())]
+            # Completions nobody counted as they happened
+            completed_day = format_date(today) if started else UNDATED
+            for username, (_, completed, _) in sorted(store.overview_stats(today).per_user.items()):
+                missing = completed - self.completed.get(username, 0)
+                if missing > 0:
+                    lines.append(f"{completed_day};{username};0;{missing};0\n")
+            lines.extend(self._close_days(store, today))
+            if lines:
+                append_all(self.path, "".join(lines))
+                self.refresh()
+            if self._offset != self._saved_offset:
+                self._save_totals()
+
+    def _close_days(self, store, today):
+        """
+        Return the lines closing every day after the last closed one up to
+        yesterday (only yesterday the first time). A day's overdue tasks are
+        the tasks incomplete now that were due on or before it, so a day that
+        no session closed on time misses the tasks completed since.
+        """
+        yesterday = today - datetime.timedelta(days=1)
+        day = yesterday if self.closed is None else parse_date(self.closed).date() + datetime.timedelta(days=1)
+        if day > yesterday:
+            return []
+        overdue = {}  # Assignee -> incomplete tasks due on or before the day being closed
+        tasks = store.incomplete_due(end=today)  # Ordered by due date
+        position, lines = 0, []
+        while day <= yesterday:
+            day_text = format_date(day)
+            while position < len(tasks) and tasks[position].date_text("due_date") <= day_text:
+                username = tasks[position].assigned_to
+                overdue[username] = overdue.get(username, 0) + 1
+                position += 1
+            lines.extend(f"{day_text};{username};0;0;{count}\n" for username, count in sorted(overdue.items()))
+            lines.append(f"{day_text};;0;0;0\n")
+            day += datetime.timedelta(days=1)
+        return lines
+
+    def _user_days(self, username):
+        """
+        Add up the lines of one assignee by day, read from the log.
+        """
+        with open(self.path, "rb") as file:
+            data = file.read(self._offset)
+        pattern = rb"^([^;\n]*);" + re.escape(username.encode()) + rb";(\d+);(\d+);(\d+)$"
+        days = {}
+        for day, created, completed, overdue in re.findall(pattern, data, re.MULTILINE):
+            counters = days.setdefault(day.decode(), [0, 0, 0])
+            counters[0] += int(created)
+            counters[1] += int(completed)
+            counters[2] += int(overdue)
+        return days
+
+    def trend(self, start=None, end=None, period="week", assigned_to=None):
+        """
+        Add up the counters by day, ISO week or month.
+        param start, end: First and last day to include as YYYY-MM-DD text, either may be None.
+        param assigned_to: Only the counters of this assignee.
+
+        Returns:
+            list: (period, created, completed, overdue) tuples in date order,
+                where overdue is the count at the end of the period's last
+                closed day, or None if none of its days is closed yet.
+        """
+        label = TREND_PERIODS[period]
+        days = self.days if assigned_to is None else self._user_days(assigned_to)
+        periods = {}  # Period -> [created, completed, overdue]
+        for day in sorted(self.days):
+            if day == UNDATED or (start is not None and day < start) or (end is not None and day > end):
+                continue
+            counters, closed = days.get(day), self.is_closed(day)
+            if counters is None and not closed:
+                continue
+            created, completed, overdue = counters or (0, 0, 0)
+            row = periods.setdefault(label(day), [0, 0, None])
+            row[0] += created
+            row[1] += completed
+            if closed:
+                row[2] = overdue
+        return [(name, *row) for name, row in periods.items()]
+
+
+@contextmanager
+def counting_completion(path, task, today=None):
+    """
+    Count a task being marked complete in the block in the daily rollups at
+    path, see DailyRollups. Nothing is counted for a task that is already
+    complete or while there are no rollups; their first update() counts
+    every earlier completion. The rollups stay locked throughout, so update()
+    never sees the task completed without the line that counts it.
+    """
+    if task.completed == "Yes" or not os.path.exists(path):
+        yield
+        return
+    with locked(path):
+        yield
+        append_line(path, f"{format_date(today or datetime.date.today())};{task.assigned_to};0;1;0\n")
+
+
+def signature_to_json(signature):
+    """
+    Turn a backend signature into the form it has after a JSON round trip.
+    """
+    return json.loads(json.dumps(signature))
+
+
+def users_checksum(users):
+    """
+    Return a checksum of the registered usernames, used to tell whether the
+    user overview has to be regenerated.
+    """
+    return zlib.crc32("\n".join(users).encode())
+
+
+def read_import_rows(path):
+    """
+    Read rows to import from a CSV file (with a header row) or a JSONL file
+    (one JSON object per line), picked by the file extension.
+
+    Yields:
+        tuple: The row number and the row as a dictionary.
+    """
+    import csv
+    with open(path, "r", newline="") as file:
+        if path.lower().endswith(".jsonl"):
+            for row_number, line in enumerate(file, start=1):
+                if line.strip():
+                    try:
+                        yield row_number, json.loads(line)
+                    except ValueError as e:
+                        yield row_number, {"_error": f"invalid JSON: {e}"}
+        else:
+            for row_number, row in enumerate(csv.DictReader(file), start=2):  # Row 1 is the header
+                yield row_number, row
+
+
+def validate_import_batch(batch, users, default_creator, today):
     """
-    Load tasks from the tasks file and return them as a list of dictionaries.
+    Check a batch of import rows and turn the valid ones into tasks.
 
     Returns:
-        list: A list of dictionaries containing task information.
+        tuple: The list of Task records and a list of (row number, error) pairs.
     """
-    tasks = []
+    tasks, errors = [], []
+    for row_number, row in batch:
+        if not isinstance(row, dict) or "_error" in row:
+            errors.append((row_number, row.get("_error", "not an object") if isinstance(row, dict) else "not an object"))
+            continue
+        fields = {key: str(row.get(key) or "").strip() for key in ("username", "task_name", "assigned_to",
+                                                                      "start_date", "due_date", "completed")}
+        creator = fields["username"] or default_creator
+        completed = fields["completed"] or "No"
+        start_date = fields["start_date"] or today
+        problem = None
+        if not fields["task_name"]:
+            problem = "task_name is empty"
+        elif any(";" in value or "\n" in value for value in (creator, fields["task_name"], fields["assigned_to"])):
+            problem = "fields may not contain ';' or line breaks"
+        elif fields["assigned_to"] not in users:
+            problem = f"unknown assignee {fields['assigned_to']!r}"
+        elif completed not in ("Yes", "No"):
+            problem = "completed must be Yes or No"
+        else:
+            try:
+                parse_date(fields["due_date"])  # Memoized, so repeated dates cost a dict lookup
+                parse_date(start_date)
+            except ValueError:
+                problem = "dates must be YYYY-MM-DD"
+        if problem:
+            errors.append((row_number, problem))
+        else:
+            tasks.append(Task(creator, fields["task_name"], fields["assigned_to"], start_date,
+                              fields["due_date"], completed))
+    return tasks, errors
+
+
+@instrumented("bulk.import")
+def import_tasks(path, backend=None, default_creator="admin", strict=False):
+    """
+    Bulk-import tasks from a CSV or JSONL file.
+
+    Rows need task_name, assigned_to and due_date; username (the creator),
+    start_date and completed are optional. Rows are validated in batches of
+    IMPORT_BATCH_SIZE against a user list loaded once, then all valid tasks are
+    appended with a single write and fsync (or one SQLite transaction). If the
+    write fails nothing is appended.
+
+    param strict: Import nothing if any row is invalid.
+    Returns:
+        dict: imported (int), errors (list of (row number, message)) and seconds (float).
+    """
+    started = time.perf_counter()
+    if backend is None:
+        backend = open_backend()
+    users = set(load_users(backend))
+    today = datetime.date.today().strftime("%Y-%m-%d")
+    tasks, errors = [], []
+    rows = read_import_rows(path)
+    while True:
+        batch = list(islice(rows, IMPORT_BATCH_SIZE))
+        if not batch:
+            break
+        batch_tasks, batch_errors = validate_import_batch(batch, users, default_creator, today)
+        tasks.extend(batch_tasks)
+        errors.extend(batch_errors)
+    if tasks and not (strict and errors):
+        backend.append_tasks(tasks)
+    else:
+        tasks = []
+    return {"imported": len(tasks), "errors": errors, "seconds": time.perf_counter() - started}
+
 
+@instrumented("bulk.export_tasks")
+def export_tasks(path, backend=None):
+    """
+    Stream all tasks to a CSV or JSONL file (picked by the extension).
+
+    The export is written to a temporary file first and renamed into place,
+    so an interrupted run never leaves a partial file behind.
+
+    Returns:
+        dict: exported (int) and seconds (float).
+    """
+    started = time.perf_counter()
+    if backend is None:
+        backend = open_backend()
+    columns = ("task_id", "username", "task_name", "assigned_to", "start_date", "due_date", "completed")
+    rows = ((task.task_id, task.username, task.task_name, task.assigned_to, task.date_text("start_date"),
+             task.date_text("due_date"), task.completed) for task in backend.iter_tasks())
+    exported = _write_export(path, columns, rows)
+    return {"exported": exported, "seconds": time.perf_counter() - started}
+
+
+@instrumented("bulk.export_users")
+def export_users(path, backend=None):
+    """
+    Write all users to a CSV or JSONL file, see export_tasks().
+    """
+    started = time.perf_counter()
+    if backend is None:
+        backend = open_backend()
+    exported = _write_export(path, ("username", "password"), load_users(backend).items())
+    return {"exported": exported, "seconds": time.perf_counter() - started}
+
+
+def _write_export(path, columns, rows):
+    import csv
+    import tempfile
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    count = 0
     try:
-        with open("tasks.txt", "r") as file:
-            for line in file:
-                if line.strip():  # Checks if the line is not empty
-                    task_data = line.strip().split(";")
-                    logging.debug("Task data read from file: %s", task_data)
-                    task = {
-                        "username": task_data[0],
-                        "task_name": task_data[1],
-                        "assigned_to": task_data[2],
-                        "start_date": datetime.datetime.strptime(task_data[3], "%Y-%m-%d"),
-                        "due_date": datetime.datetime.strptime(task_data[4], "%Y-%m-%d"),
-                        "completed": task_data[5]
-                    }
-                    tasks.append(task)
-    except FileNotFoundError:
-        logging.error("Tasks file not found.")
-    except Exception as e:
-        logging.error("Error loading tasks: %s", e)
+        with os.fdopen(fd, "w", newline="", buffering=1 << 20) as file:
+            if path.lower().endswith(".jsonl"):
+                for row in rows:
+                    file.write(json.dumps(dict(zip(columns, row))) + "\n")
+                    count += 1
+            else:
+                writer = csv.writer(file)
+                writer.writerow(columns)
+                for row in rows:
+                    writer.writerow(row)
+                    count += 1
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    return count
+
+
+def report_throughput(action, count, seconds, errors=()):
+    """
+    Print how many rows a bulk command handled, how fast, and any row errors.
+    """
+    rate = count / seconds if seconds > 0 else float("inf")
+    print(f"{action} {count} rows in {seconds:.2f}s ({rate:,.0f} rows/s).")
+    for row_number, message in errors:
+        print(f"Row {row_number}: {message}")
+    if errors:
+        print(f"{len(errors)} row(s) rejected.")
 
-    return tasks
 
-def load_users():
+def load_users(backend=None):
+    """
+    Load users from the storage backend (the configured one by default).
+
+    Returns:
+        dict: A dictionary containing usernames as keys and passwords as values.
+    """
+    if backend is None:
+        backend = open_backend()
+    return backend.load_users()
+
+
+@instrumented("storage.read_users")
+def read_users_file(path=USERS_FILE):
     """
     Load users from the user file and return them as a dictionary of usernames and passwords.
     
@@ -42,7 +3736,7 @@ def load_users():
     """
     users = {}
     try:
-        with open("user.txt", "r") as user_file:
+        with open(path, "r") as user_file:
             for line in user_file:
                 # Skip empty lines
                 if not line.strip():
@@ -55,6 +3749,8 @@ def load_users():
                     users[username] = password
                 else:
                     print(f"Ignoring line: {line.strip()}. Expected format: username;password")
+            if METRICS.enabled:
+                METRICS.count(rows=len(users), bytes_read=os.fstat(user_file.fileno()).st_size)
     except FileNotFoundError:
         print("User file not found.")
     except Exception as e:
@@ -62,46 +3758,194 @@ def load_users():
     return users
 
 
-def authenticate_user(users):
+class UserRegistry:
+    """
+    The users of a session, loaded once and kept up to date.
+
+    The users are read from the backend on first use and afterwards only when
+    the backend's users_signature() shows that another session changed them.
+    Users registered through the registry are added to the loaded users
+    directly, so registering never re-reads the user file and new users can
+    log in straight away.
+
+    The registry can be used like the dictionary load_users() returns.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend if backend is not None else open_backend()
+        self._users = {}
+        self._signature = None
+        self._loaded = False
+
+    def all(self):
+        """
+        Return the users as a dictionary of usernames and passwords.
+        """
+        signature = self.backend.users_signature()
+        if not self._loaded or signature != self._signature:
+            self._users = self.backend.load_users()
+            self._signature = signature
+            self._loaded = True
+        return self._users
+
+    def __contains__(self, username):
+        return username in self.all()
+
+    def __getitem__(self, username):
+        return self.all()[username]
+
+    def __iter__(self):
+        return iter(self.all())
+
+    def __len__(self):
+        return len(self.all())
+
+    def get(self, username, default=None):
+        return self.all().get(username, default)
+
+    def items(self):
+        return self.all().items()
+
+    def add(self, username, password):
+        """
+        Register one user.
+
+        Raises:
+            ValueError: If the user cannot be registered, see validate_user().
+        """
+        error = validate_user(username, password, self.all())
+        if error:
+            raise ValueError(error)
+        self._store([(username, password)])
+
+    def add_many(self, users):
+        """
+        Register many users with a single append.
+
+        Every (username, password) pair is checked against the existing users
+        and the pairs before it in one pass; only valid pairs are stored.
+
+        Returns:
+            tuple: The registered pairs and a list of (position, username,
+            message) for the rejected ones.
+        """
+        existing = self.all()
+        added, errors, seen = [], [], set()
+        for position, (username, password) in enumerate(users, start=1):
+            error = validate_user(username, password, existing)
+            if error is None and username in seen:
+                error = "Username appears more than once."
+            if error:
+                errors.append((position, username, error))
+                continue
+            seen.add(username)
+            added.append((username, password))
+        if added:
+            self._store(added)
+        return added, errors
+
+    def _store(self, users):
+        # Only trust the in-memory users afterwards if nobody else changed
+        # the users since they were loaded
+        unchanged = self.backend.users_signature() == self._signature
+        if len(users) == 1:
+            self.backend.add_user(*users[0])
+        else:
+            self.backend.add_users(users)
+        self._users.update(users)
+        if unchanged:
+            self._signature = self.backend.users_signature()
+        else:
+            self._loaded = False
+
+
+def validate_user(username, password, users):
+    """
+    Check a new username and password against the existing users.
+
+    Returns:
+        str: Why the user cannot be registered, or None if it can.
+    """
+    if username == '' or password == '':
+        return "Username and password cannot be empty."
+    if any(character in value for value in (username, password) for character in ";\n\r"):
+        return "Username and password cannot contain ';' or line breaks."
+    if username in users:
+        return "Username already exists."
+    return None
+
+
+@instrumented("bulk.register_users")
+def register_users(path, users=None):
+    """
+    Register every "username;password" line of a file (the format of user.txt)
+    with one duplicate check and one append, see UserRegistry.add_many().
+
+    Returns:
+        dict: "registered" (count), "errors" (list of (line, message)) and "seconds".
+    """
+    start = time.perf_counter()
+    if users is None:
+        users = UserRegistry()
+    pairs, line_numbers = [], []
+    with open(path, "r") as file:
+        for line_number, line in enumerate(file, start=1):
+            if line.strip():
+                username, _, password = line.strip().partition(";")
+                pairs.append((username, password))
+                line_numbers.append(line_number)
+    added, errors = users.add_many(pairs)
+    return {
+        "registered": len(added),
+        "errors": [(line_numbers[position - 1], f"{username}: {message}") for position, username, message in errors],
+        "seconds": time.perf_counter() - start,
+    }
+
+
+def authenticate_user(users, login=None):
     """
     Authenticate users by prompting for username and password.
 
     Args:
-        users (dict): A dictionary containing usernames and passwords.
+        users (UserRegistry): The registered users (a plain dictionary works too).
+        login (callable): Checks a username and password instead, returning
+            the username or None (TaskStore.login, or RemoteStore.login whose
+            users come without passwords).
 
     Returns:
         str: The authenticated username if successful, None otherwise.
     """
     username = input("Enter username: ")
     password = input("Enter password: ")
-    if username in users and users[username] == password:
+    if login is not None:
+        if login(username, password) is not None:
+            return username
+    elif username in users and users[username] == password:
         return username
     elif username == 'admin' and password == 'password':  # Adding condition for admin login
         return 'admin'
-    else:
-        print("Invalid username or password.")
-        return None
+    print("Invalid username or password.")
+    return None
 
 
-def generate_files():
+def generate_files(storage_format=None):
     """
-    Checks if task and user files exist and create them if not.
+    Checks if the task and user storage exists and create it if not.
+    param storage_format: "text" (tasks.txt), "binary" (tasks.bin), "sqlite"
+        (tasks.db) or "sharded" (tasks_shards/), defaults to the
+        TASKMANAGER_STORAGE environment variable.
+    Returns the opened backend.
     """
-    if not os.path.exists("tasks.txt"):
-        with open("tasks.txt", "w") as tasks_file:
-            # Write initial content if needed
-            pass
-
-    if not os.path.exists("user.txt"):
-        with open("user.txt", "w") as user_file:
-            # Write initial content if needed
-            pass
+    backend = open_backend(storage_format)
+    backend.initialize()
+    return backend
 
 
-def reg_user(current_user):
+def reg_user(current_user, users=None):
     """
     Register a new user by providing a username and password.
     param current_user: The username of the current user. Only 'admin' can register new users.
+    param users: The session's UserRegistry; the configured storage is opened if omitted.
     """
     if current_user != 'admin':  # Check if the current user is not admin
         print("Only admin can register new users.")
@@ -111,26 +3955,28 @@ def reg_user(current_user):
         username = input("Enter username: ").strip()
         password = input("Enter password: ").strip()
 
-        if username == '' or password == '':
-            print("Username and password cannot be empty. Please try again.")
+        if users is None:
+            users = UserRegistry()
+        error = validate_user(username, password, users)  # Checked against the loaded users
+        if error:
+            print(f"{error} Please try again.")
             continue
 
-        users = load_users()  # Loading existing users
-        if username in users:
-            print("Username already exists. Please try a different username.")
-            continue
-
-        # If the username is unique, add the user to the file
-        with open("user.txt", "a") as user_file:
-            user_file.write(f"{username};{password}\n")
+        # If the username is unique, add the user to the storage
+        users.add(username, password)
         print("User registered successfully.")
         break
 
 
-def add_task(logged_in_user):
+def add_task(logged_in_user, store=None):
     """
     Add a new task to the tasks file.
+    param logged_in_user: The username of the current user.
+    param store: The session's TaskStore; a fresh one is loaded if omitted.
     """
+    if store is None:
+        store = TaskStore()
+
     task_name = input("Enter task name: ")
     
     if logged_in_user == "admin":
@@ -141,72 +3987,166 @@ def add_task(logged_in_user):
     due_date = input("Enter due date for the task (YYYY-MM-DD): ")
     
     try:
-        datetime.datetime.strptime(due_date, "%Y-%m-%d")  # Validate due date format
-        with open("tasks.txt", "a") as tasks_file:
-            tasks_file.write(f"{logged_in_user};{task_name};{assigned_to};{due_date};{datetime.datetime.now().strftime('%Y-%m-%d')};No\n")
+        parsed_due_date = datetime.datetime.strptime(due_date, "%Y-%m-%d")  # Validate due date format
+        today = datetime.datetime.now().strftime("%Y-%m-%d")
+        store.add({
+            "username": logged_in_user,
+            "task_name": task_name,
+            "assigned_to": assigned_to,
+            "start_date": datetime.datetime.strptime(today, "%Y-%m-%d"),
+            "due_date": parsed_due_date,
+            "completed": "No"
+        })
         print("Task added successfully.")
 
     except ValueError:
         print("Invalid due date format. Please use YYYY-MM-DD.")
 
-def view_all():
+def view_all(store=None, page_size=VIEW_PAGE_SIZE, sort_by=None, paged=True, **filters):
     """
     Function to display all tasks.
-    Loads tasks from the file and prints each task in a user-friendly format.
+    Streams the tasks (from the session's store, or straight from storage when no
+    store is given) and prints them page by page in a user-friendly format.
+    param store: The session's TaskStore; tasks are streamed from the backend if omitted.
+    param page_size: Tasks per page.
+    param sort_by: "due_date", "assigned_to" or "completed"; file order if omitted.
+    param paged: Whether to wait for the user between pages.
+    param filters: assigned_to, completed ("Yes"/"No"), due_from, due_to (YYYY-MM-DD).
     """
-    tasks = load_tasks()
-    if not tasks:
+    source = store if store is not None else open_backend()
+    tasks = source.iter_tasks(sort_by=sort_by, **filters)
+    if not render_task_pages(tasks, page_size, prompt=paged):
         print("No tasks found.")
-    else:
-        # Determining the maximum length of the task name for formatting
-        max_task_name_length = max(len(task["task_name"]) for task in tasks)
 
-        # Print header
-        print("Task ID\tTask Name".ljust(max_task_name_length + 10), "Assigned To".ljust(20), "Due Date".ljust(12), "Date Added".ljust(12), "Completed")
-        
-        for index, task in enumerate(tasks, start=1):
-            task_id = f"Task-{index}"
-            task_name = task["task_name"]
-            assigned_to = task["assigned_to"]
-            due_date = task["due_date"].strftime("%Y-%m-%d")
-            date_added = task["start_date"].strftime("%Y-%m-%d")
-            completed = task["completed"]
-            
+
+def render_task_pages(tasks, page_size=VIEW_PAGE_SIZE, out=None, prompt=True):
+    """
+    Write tasks as a table, one page at a time.
+
+    Only one page is held in memory. Column widths are sized per page and every
+    page is written with a single call. With prompt set, the user can press
+    Enter between pages to continue or q to stop.
+
+    Returns:
+        int: The number of tasks written.
+    """
+    out = out or sys.stdout
+    tasks = iter(tasks)
+    written = 0
+    page = list(islice(tasks, page_size))
+    while page:
+        # Every field is read once per task (rows of a TaskTable decode them on access)
+        page = [(f"Task-{task.task_id}", task.task_name, task.assigned_to, task.date_text("due_date"),
+                 task.date_text("start_date"), task.completed) for task in page]
+        # Determining the maximum length of the task name on this page for formatting
+        max_task_name_length = max(len(task_name) for _, task_name, *_ in page)
+        lines = [" ".join(["Task ID\tTask Name".ljust(max_task_name_length + 10), "Assigned To".ljust(20),
+                           "Due Date".ljust(12), "Date Added".ljust(12), "Completed"])]
+        for task_id, task_name, assigned_to, due_date, start_date, completed in page:
             # Formatting the task details
-            formatted_task = f"{task_id.ljust(8)}{task_name.ljust(max_task_name_length + 5)}{assigned_to.ljust(20)}{due_date.ljust(12)}{date_added.ljust(12)}{completed}"
-            
-            print(formatted_task)
+            lines.append(f"{task_id.ljust(8)}{task_name.ljust(max_task_name_length + 5)}"
+                         f"{assigned_to.ljust(20)}{due_date.ljust(12)}"
+                         f"{start_date.ljust(12)}{completed}")
+        lines.append("")
+        out.write("\n".join(lines))
+        out.flush()
+        written += len(page)
+
+        page = list(islice(tasks, page_size))
+        if page and prompt and input("Press Enter for the next page or q to stop: ").strip().lower() == 'q':
+            break
+    return written
+
+
+def view_filtered(store=None):
+    """
+    Ask for view filters and a sort order, then display the matching tasks.
+    param store: The session's TaskStore.
+    """
+    filters = {
+        "assigned_to": input("Assigned to (blank for anyone): ").strip() or None,
+        "completed": {"y": "Yes", "n": "No"}.get(input("Completed? (y/n, blank for both): ").strip().lower()),
+        "due_from": input("Due on or after (YYYY-MM-DD, blank for any): ").strip() or None,
+        "due_to": input("Due on or before (YYYY-MM-DD, blank for any): ").strip() or None,
+    }
+    sort_by = input("Sort by (due_date/assigned_to/completed, blank for task id): ").strip() or None
+    if sort_by is not None and sort_by not in SORT_KEYS:
+        print("Invalid sort order.")
+        return
+    view_all(store, sort_by=sort_by, **filters)
+
+
+def search_tasks(store=None):
+    """
+    Ask for a keyword query and optional filters, then display the tasks
+    whose names match, found through the keyword index (see KeywordIndex).
+    param store: The session's TaskStore; a fresh one is loaded if omitted.
+    """
+    if store is None:
+        store = TaskStore()
+    query = input("Search task names (words must all match; OR between alternatives, * for prefixes): ").strip()
+    if not parse_search_query(query):
+        print("Please enter at least one word.")
+        return
+    assigned_to = input("Assigned to (blank for anyone): ").strip() or None
+    completed = {"y": "Yes", "n": "No"}.get(input("Completed? (y/n, blank for both): ").strip().lower())
+    if not render_task_pages(store.search(query, assigned_to, completed)):
+        print("No tasks found.")
+
 
-def view_mine(username):
+def view_deadlines(username, store=None):
     """
-    Function to display tasks assigned to the current user.
+    Show how many tasks are overdue and list the tasks due in the next few
+    days, both answered from the due date index (see DueDateIndex).
+    param username: The current user; admin can look at everyone's deadlines.
+    param store: The session's TaskStore; a fresh one is loaded if omitted.
+    """
+    if store is None:
+        store = TaskStore()
+
+    days = input("Show tasks due in the next how many days? (default 7): ").strip()
+    try:
+        days = int(days) if days else 7
+        if days < 0:
+            raise ValueError(days)
+    except ValueError:
+        print("Invalid number of days.")
+        return
+    assigned_to = username
+    if username == "admin":
+        assigned_to = input("Assigned to (blank for everyone): ").strip() or None
+
+    today = datetime.date.today()
+    overdue = store.count_incomplete_due(end=today, assigned_to=assigned_to)
+    upcoming = store.incomplete_due(today, today + datetime.timedelta(days=days + 1), assigned_to)
+    print(f"\nOverdue tasks: {overdue}")
+    print(f"Tasks due in the next {days} day(s): {len(upcoming)}")
+    render_task_pages(upcoming)
+
+
+def view_mine(username, store=None):
+    """
+    Function to display the tasks the current user created or is assigned.
     param username: The username of the current user.
+    param store: The session's TaskStore; a fresh one is loaded if omitted.
     """
-    with open("tasks.txt", "r") as file:
-        tasks = file.readlines()
+    if store is None:
+        store = TaskStore()
 
     print("\nYour Tasks:")
-    tasks_assigned_to_user = []  # Store tasks assigned to the current user
-    
-    for index, task in enumerate(tasks, start=1):
-        task_details = task.strip().split(";")
-        
-        # Checks if the task is assigned to the current user
-        if task_details[0] == username or task_details[2] == username:
-            tasks_assigned_to_user.append((index, task_details))  # Store task index and details
-        else:
-            print(f"Task {index} is assigned to {task_details[2]}, not to {username}")
+    # Only the user's own tasks are read, looked up through the creator and assignee indexes
+    tasks_assigned_to_user = [(task["task_id"], task) for task in store.mine(username)]
 
     if not tasks_assigned_to_user:
         print("You have no tasks assigned.")
     else:
-        for index, task_details in tasks_assigned_to_user:
+        for index, task in tasks_assigned_to_user:
             print(f"{index}. Task details:")
-            print(f"   - Assigned to: {task_details[2]}")  # Ensure the correct index is used for assigned user's username
-            print(f"   - Description: {task_details[1]}")
-            print(f"   - Start Date: {task_details[3]}")
-            print(f"   - Due Date: {task_details[4]}")
-            print(f"   - Completed: {task_details[5]}")
+            print(f"   - Assigned to: {task['assigned_to']}")
+            print(f"   - Description: {task['task_name']}")
+            print(f"   - Start Date: {task['start_date'].strftime('%Y-%m-%d')}")
+            print(f"   - Due Date: {task['due_date'].strftime('%Y-%m-%d')}")
+            print(f"   - Completed: {task['completed']}")
                       
         task_index = input("\nEnter the number of the task to edit or mark as complete (-1 to return): ").strip()
 
@@ -215,27 +4155,28 @@ def view_mine(username):
             if task_index == -1:
                 return
 
-            task_index -= 1
-            task_details = tasks_assigned_to_user[task_index][1]  # Retrieve task details
-            if task_details[-1] == "Yes":
+            # The numbers shown above are task ids, so look the task up by id
+            # rather than by its position in the filtered list
+            task = dict(tasks_assigned_to_user).get(task_index)
+            if task is None:
+                raise IndexError(task_index)
+            task_id = task["task_id"]
+            if task["completed"] == "Yes":
                 print("This task has already been completed and cannot be edited.")
                 return
 
             edit_choice = input("Do you want to mark this task as complete (Y/N) or edit (E)? ").strip().lower()
             if edit_choice == 'y':
-                task_details[-1] = "Yes"
-                tasks_assigned_to_user[task_index] = (index, task_details)  # Update task details
-                tasks[task_index] = ";".join(task_details) + "\n"  # Update tasks list
-                with open("tasks.txt", "w") as file:
-                    file.writelines(tasks)
+                store.complete(task_id)
                 print("Task marked as complete.")
             elif edit_choice == 'e':
                 new_due_date = input("Enter the new due date for the task (format: YYYY-MM-DD): ").strip()
-                task_details[3] = new_due_date
-                tasks_assigned_to_user[task_index] = (index, task_details)  # Update task details
-                tasks[task_index] = ";".join(task_details) + "\n"  # Update tasks list
-                with open("tasks.txt", "w") as file:
-                    file.writelines(tasks)
+                try:
+                    parsed_due_date = datetime.datetime.strptime(new_due_date, "%Y-%m-%d")
+                except ValueError:
+                    print("Invalid due date format. Please use YYYY-MM-DD.")
+                    return
+                store.set_due_date(task_id, parsed_due_date)
                 print("Task edited successfully.")
             else:
                 print("Invalid choice.")
@@ -245,24 +4186,36 @@ def view_mine(username):
 
 
 
-def generate_task_overview(username):
+def generate_task_overview(username, store=None):
     """
     Function to generate an overview of tasks.
     param username: The username of the current user.
+    param store: The session's TaskStore; a fresh one is loaded if omitted.
     """
-    tasks = load_tasks()
-
     if username != "admin":
         print("You don't have permission to generate task overview.")
         return
 
-    total_tasks = len(tasks)
-    completed_tasks = sum(1 for task in tasks if task["completed"] == "Yes")
-    uncompleted_tasks = total_tasks - completed_tasks
+    if store is None:
+        store = TaskStore()
+    stats = store.overview_stats()
+    report_key = store.report_key()
+
+    write_task_overview(stats)
+    store.mark_report_fresh(TASK_OVERVIEW_FILE, report_key)
+
+    print("Task overview generated and saved successfully.")
+
+    
 
-    # Calculate overdue tasks
-    today = datetime.datetime.now().date()
-    overdue_tasks = sum(1 for task in tasks if task["due_date"].date() < today and task["completed"] == "No")
+def write_task_overview(stats, path=TASK_OVERVIEW_FILE):
+    """
+    Write the task overview report from TaskStats.
+    """
+    total_tasks = stats.total
+    completed_tasks = stats.completed
+    uncompleted_tasks = stats.incomplete
+    overdue_tasks = stats.overdue
 
     # Calculate percentages
     if total_tasks != 0:
@@ -273,7 +4226,7 @@ def generate_task_overview(username):
         percentage_completed = percentage_uncompleted = percentage_overdue = 0
 
     # Write overview to file
-    with open("task_overview.txt", "w") as file:
+    with open(path, "w") as file:
         file.write("Task Overview:\n")
         file.write(f"Total tasks: {total_tasks}\n")
         file.write(f"Completed tasks: {completed_tasks}\n")
@@ -283,35 +4236,21 @@ def generate_task_overview(username):
         file.write(f"Percentage of uncompleted tasks: {percentage_uncompleted:.2f}%\n")
         file.write(f"Percentage of overdue tasks: {percentage_overdue:.2f}%\n")
 
-    print("Task overview generated and saved successfully.")
-
-    
 
-def generate_user_overview(username):
+def write_user_overview(stats, users, path=USER_OVERVIEW_FILE):
     """
-    Function to generate an overview of users.
-    param username: The username of the current user.
+    Write the user overview report from TaskStats and the registered users.
     """
-
-    if username != "admin":
-        print("You are not authorized to access this function.")
-        return
-
-    tasks = load_tasks()
-    users = load_users()
     total_users = len(users)
-    total_tasks = len(tasks)
-    user_tasks = {username: sum(1 for task in tasks if task["assigned_to"] == username) for username in users}
-    user_completed_tasks = {username: sum(1 for task in tasks if task["assigned_to"] == username and task["completed"] == "Yes") for username in users}
-    user_incomplete_tasks = {username: user_tasks[username] - user_completed_tasks.get(username, 0) for username in users}
-    user_overdue_tasks = {username: sum(1 for task in tasks if task["assigned_to"] == username and task["due_date"] < datetime.datetime.now() and task["completed"] == "No") for username in users}
+    total_tasks = stats.total
 
-    with open("user_overview.txt", "w") as file:  # Open file for writing
+    with open(path, "w") as file:  # Open file for writing
         file.write("User Overview:\n")
         file.write(f"Total users: {total_users}\n")
         file.write(f"Total tasks: {total_tasks}\n")
         for username in users:     # Iterating through username in users
-            total_user_tasks = user_tasks.get(username, 0)
+            user_stats = stats.user(username)
+            total_user_tasks = user_stats["total"]
             if total_user_tasks == 0:
                 file.write(f"User: {username}\n")
                 file.write("No tasks assigned to this user.\n")
@@ -319,29 +4258,91 @@ def generate_user_overview(username):
             file.write(f"User: {username}\n")
             file.write(f"Total tasks assigned: {total_user_tasks}\n")
             file.write(f"Percentage of total tasks assigned: {(total_user_tasks / total_tasks) * 100:.2f}%\n")
-            file.write(f"Percentage of completed tasks: {(user_completed_tasks.get(username, 0) / total_user_tasks) * 100:.2f}%\n")
-            file.write(f"Percentage of incomplete tasks: {(user_incomplete_tasks.get(username, 0) / total_user_tasks) * 100:.2f}%\n")
-            file.write(f"Percentage of overdue tasks: {(user_overdue_tasks.get(username, 0) / total_user_tasks) * 100:.2f}%\n")
+            file.write(f"Percentage of completed tasks: {(user_stats['completed'] / total_user_tasks) * 100:.2f}%\n")
+            file.write(f"Percentage of incomplete tasks: {(user_stats['incomplete'] / total_user_tasks) * 100:.2f}%\n")
+            file.write(f"Percentage of overdue tasks: {(user_stats['overdue'] / total_user_tasks) * 100:.2f}%\n")
+
+
+
+def generate_user_overview(username, store=None):
+    """
+    Function to generate an overview of users.
+    param username: The username of the current user.
+    param store: The session's TaskStore; a fresh one is loaded if omitted.
+    """
+
+    if username != "admin":
+        print("You are not authorized to access this function.")
+        return
+
+    if store is None:
+        store = TaskStore()
+    stats = store.overview_stats()
+    users = store.users.all()
+    report_key = store.report_key(users_checksum(users))
+    write_user_overview(stats, users)
+    store.mark_report_fresh(USER_OVERVIEW_FILE, report_key)
 
     print("User overview generated and saved successfully.")
 
 
 
-def generate_reports(username, tasks):
+def generate_reports(username, store=None, workers=None):
     """
     Generate task overview, user overview, and statistics reports.
+    param username: The username of the current user.
+    param store: The session's TaskStore, shared by all three reports. Without
+        one (a one-off report run) the text tasks file is counted in parallel
+        instead of being loaded, see generate_reports_in_parallel().
+    param workers: Worker processes for the parallel count, defaults to the number of CPUs.
     """
-    
-    tasks = load_tasks()
+    if store is None and username == "admin":
+        backend = open_backend()
+        try:
+            if generate_reports_in_parallel(backend, workers):
+                print("Task overview generated and saved successfully.")
+                print("User overview generated and saved successfully.")
+                print_reports(is_admin=True)
+                return
+        except ValueError as e:  # A malformed line; the serial path skips what it cannot read
+            logging.error("Counting tasks in parallel failed, counting serially: %s", e)
+        store = TaskStore(backend)
 
-    generate_task_overview(username)
-    generate_user_overview(username)
+    generate_task_overview(username, store)
+    generate_user_overview(username, store)
     
-    display_statistics(username, is_admin=True)  # Passing the username and is_admin flag to display_statistics
+    display_statistics(username, is_admin=True, store=store)  # Passing the username and is_admin flag to display_statistics
+
+
+def generate_reports_in_parallel(backend, workers=None, today=None):
+    """
+    Write both overview reports straight from the tasks file, without loading it.
+
+    The counters come from parallel_task_stats(), are written with the same
+    functions as in a session (so the reports are byte-for-byte the same) and
+    are saved as the overview counters, so the next session starts with them.
+    Only the text backend with an empty event log can be counted this way.
+
+    Returns:
+        bool: False if the backend cannot be counted in parallel.
+    """
+    if backend.name != "text" or load_task_events(backend.events_path):
+        return False
+    signature = backend.signature()
+    stats = parallel_task_stats(backend.path, today, workers)
+    users = UserRegistry(backend).all()
+    write_task_overview(stats)
+    write_user_overview(stats, users)
+    if backend.signature() == signature:  # Only keep the counters if nobody wrote meanwhile
+        cache = OverviewCache(overview_path_for(backend.path))
+        cache.replace(signature, stats)
+        cache.mark_fresh(TASK_OVERVIEW_FILE, cache.report_key())
+        cache.mark_fresh(USER_OVERVIEW_FILE, cache.report_key(users_checksum(users)))
+    return True
 
 
 
-def display_statistics(username, is_admin):
+def display_statistics(username, is_admin, store=None):
     """
     Display statistics related to tasks and users.
 
@@ -351,6 +4352,7 @@ def display_statistics(username, is_admin):
     Parameters:
     - username (str): The username of the current user.
     - is_admin (bool): A boolean flag indicating whether the user is an admin or not.
+    - store (TaskStore): The session's task store, used if a report has to be generated.
 
     Returns:
     - None
@@ -358,34 +4360,90 @@ def display_statistics(username, is_admin):
     If the user is an admin, both task overview and user overview are displayed.
     If the user is not an admin, only task overview is displayed.
 
-    This function reads the task overview and user overview from text files if they exist.
-    If the files don't exist, it generates new reports before displaying the statistics.
+    This function reads the task overview and user overview from text files if they are
+    up to date. If a file is missing or was written before the latest change to the tasks
+    (or, for the user overview, the users), it is regenerated from the incrementally
+    maintained overview counters before displaying the statistics.
 
     """
-    if not os.path.exists("task_overview.txt"):
-        generate_task_overview(username)
+    if store is None:
+        store = TaskStore()
+
+    if not store.report_is_fresh(TASK_OVERVIEW_FILE, store.report_key()):
+        generate_task_overview(username, store)
 
     if is_admin:
         # Read and display statistics for both tasks and users
-        if not os.path.exists("user_overview.txt"):
-            generate_user_overview(username)
+        users_key = store.report_key(users_checksum(store.users.all()))
+        if not store.report_is_fresh(USER_OVERVIEW_FILE, users_key):
+            generate_user_overview(username, store)
+
+    print_reports(is_admin)
+
 
-        with open("task_overview.txt", "r") as file:
+def print_reports(is_admin):
+    """
+    Print the task overview report, and for admins the user overview report.
+    """
+    if is_admin:
+        with open(TASK_OVERVIEW_FILE, "r") as file:
             task_overview = file.read()
             print("Task Overview:")
             print(task_overview)
 
-        with open("user_overview.txt", "r") as file:
+        with open(USER_OVERVIEW_FILE, "r") as file:
             user_overview = file.read()
             print("\nUser Overview:")
             print(user_overview)
     else:
         # Read and display statistics for tasks
-        with open("task_overview.txt", "r") as file:
+        with open(TASK_OVERVIEW_FILE, "r") as file:
             task_overview = file.read()
             print("Task Overview:")
             print(task_overview)
 
+def view_trends(username, store=None):
+    """
+    Ask for a period and date range and print the task trends of all users or one.
+    param username: The username of the current user.
+    param store: The session's TaskStore; a fresh one is loaded if omitted.
+    """
+    if username != "admin":
+        print("You don't have permission to view task trends.")
+        return
+
+    if store is None:
+        store = TaskStore()
+    period = input("Period (day, week or month) [week]: ").strip().lower() or "week"
+    if period not in TREND_PERIODS:
+        print("Invalid period. Please enter day, week or month.")
+        return
+    dates = []
+    for prompt in ("From (YYYY-MM-DD, blank for the beginning): ", "To (YYYY-MM-DD, blank for the end): "):
+        text = input(prompt).strip()
+        if text:
+            try:
+                parse_date(text)
+            except ValueError:
+                print("Invalid date format. Please use YYYY-MM-DD.")
+                return
+        dates.append(text or None)
+    assigned_to = input("Assignee (blank for everyone): ").strip() or None
+    print_trends(store.trends(*dates, period, assigned_to))
+
+
+def print_trends(rows, out=None):
+    """
+    Print (period, created, completed, overdue) rows as a table.
+    """
+    if not rows:
+        print("No tasks in this date range.", file=out)
+        return
+    print(f"{'Period':<12} {'Created':>9} {'Completed':>10} {'Overdue':>9}", file=out)
+    for period, created, completed, overdue in rows:
+        print(f"{period:<12} {created:>9} {completed:>10} {'-' if overdue is None else overdue:>9}", file=out)
+
+
 def login(users):
     """
     Function to authenticate users.
@@ -405,27 +4463,26 @@ def login(users):
 
 
 
-def display_user_task_overview(username):
+def display_user_task_overview(username, store=None):
     """
     Generate and display task overview for the specific user.
     param username: The username of the user for whom the task overview is generated.
+    param store: The session's TaskStore; a fresh one is loaded if omitted.
     """
-    tasks = load_tasks()  # Loading existing tasks
-    user_tasks = [task for task in tasks if task["assigned_to"] == username]  # Filter tasks for the specific user
+    if store is None:
+        store = TaskStore()
+    user_stats = store.user_stats(username)  # Counters of the tasks assigned to this user
 
-    if not user_tasks:
+    if not user_stats["total"]:
         print("No tasks found for this user.")
         return
 
-    completed_tasks = sum(1 for task in user_tasks if task["completed"] == "Yes")
-    uncompleted_tasks = len(user_tasks) - completed_tasks
-
-    # Calculating overdue tasks
-    today = datetime.datetime.now().date()
-    overdue_tasks = sum(1 for task in user_tasks if task["due_date"].date() < today and task["completed"] == "No")
+    completed_tasks = user_stats["completed"]
+    uncompleted_tasks = user_stats["incomplete"]
+    overdue_tasks = user_stats["overdue"]
 
     # Calculating percentages
-    total_tasks = len(user_tasks)
+    total_tasks = user_stats["total"]
     percentage_completed = (completed_tasks / total_tasks) * 100 if total_tasks != 0 else 0
     percentage_uncompleted = (uncompleted_tasks / total_tasks) * 100 if total_tasks != 0 else 0
     percentage_overdue = (overdue_tasks / total_tasks) * 100 if total_tasks != 0 else 0
@@ -441,11 +4498,49 @@ def display_user_task_overview(username):
     print(f"Percentage of overdue tasks: {percentage_overdue:.2f}%")
 
 
-def user_menu(username, tasks):
+def show_metrics():
+    """
+    Print the timings and counters recorded in this session, slowest first.
+    If metrics are off, offer to switch them on for the rest of the session.
+    """
+    if not METRICS.enabled:
+        print("Metrics are off. Set TASKMANAGER_METRICS to a file name to record them to that file.")
+        if input("Record metrics for the rest of this session (Y/N)? ").strip().lower() == "y":
+            METRICS.enable()
+            print("Metrics are on.")
+        return
+    if not METRICS.summary:
+        print("No actions recorded yet.")
+        return
+
+    print(f"\n{'Operation':<26}{'Calls':>7}{'Total s':>10}{'Avg ms':>10}{'Max ms':>10}"
+          f"{'Rows':>12}{'MB read':>10}{'MB written':>12}")
+    ordered = sorted(METRICS.summary.items(), key=lambda item: item[1][1], reverse=True)
+    for name, (calls, seconds, longest, rows, bytes_read, bytes_written) in ordered:
+        print(f"{name:<26}{calls:>7}{seconds:>10.3f}{seconds / calls * 1000:>10.1f}{longest * 1000:>10.1f}"
+              f"{rows:>12}{bytes_read / 1e6:>10.2f}{bytes_written / 1e6:>12.2f}")
+
+
+# Span names of the menu choices, see Metrics
+USER_MENU_ACTIONS = {
+    "a": "add_task",
+    "va": "view_all",
+    "vm": "view_mine",
+    "vf": "view_filtered",
+    "st": "search_tasks",
+    "ud": "view_deadlines",
+    "ds": "display_statistics",
+    "r": "reg_user",
+}
+ADMIN_MENU_ACTIONS = dict(USER_MENU_ACTIONS, gr="generate_reports", tr="view_trends", ct="compact",
+                          m="show_metrics")
+
+
+def user_menu(username, store):
     """
     Function to display the user menu.
     param username: The username of the current user.
-    param tasks: List of tasks.
+    param store: The session's TaskStore.
     """
 
     while True:
@@ -454,34 +4549,44 @@ def user_menu(username, tasks):
         print("a. Add Task") 
         print("va. View All Tasks")
         print("vm. View My Tasks")
+        print("vf. View Filtered Tasks")
+        print("st. Search Tasks")
+        print("ud. Upcoming Deadlines")
         print("ds. Display Statistics")
         print("e. Exit")
         choice = input("Enter your choice: ").lower()
+        if choice == 'e':  # Exit
+            return
 
-        if choice == 'a':  # Add Task
-            add_task(username)
-        elif choice == 'va':  # View All Tasks
-            view_all()
-        elif choice == 'vm':  # View My Tasks
-            view_mine(username)
-        elif choice == 'ds':  # Display Statistics
-            if username == 'admin':
-                display_statistics(username, tasks)
+        with METRICS.span("menu." + USER_MENU_ACTIONS.get(choice, "invalid")):  # Timed, see Metrics
+            if choice == 'a':  # Add Task
+                add_task(username, store)
+            elif choice == 'va':  # View All Tasks
+                view_all(store)
+            elif choice == 'vm':  # View My Tasks
+                view_mine(username, store)
+            elif choice == 'vf':  # View Filtered Tasks
+                view_filtered(store)
+            elif choice == 'st':  # Search Tasks
+                search_tasks(store)
+            elif choice == 'ud':  # Upcoming Deadlines
+                view_deadlines(username, store)
+            elif choice == 'ds':  # Display Statistics
+                if username == 'admin':
+                    display_statistics(username, True, store)
+                else:
+                    display_user_task_overview(username, store)
+            elif choice == 'r':
+                print("Sorry, only admin can register new users.")
             else:
-                display_user_task_overview(username)
-        elif choice == 'r':
-            print("Sorry, only admin can register new users.")
-        elif choice == 'e':  # Exit
-            return
-        else:
-            print("Invalid choice. Please try again.")
+                print("Invalid choice. Please try again.")
 
-def admin_menu(username,users,tasks):
+def admin_menu(username,users,store):
     """
     Function to display the admin menu.
     param username: The username of the current user.
-    param users: List of all users.
-    param tasks: List of tasks.
+    param users: The session's UserRegistry.
+    param store: The session's TaskStore.
     """                                         
     while True:
         print("\nAdmin Menu:")
@@ -489,59 +4594,307 @@ def admin_menu(username,users,tasks):
         print("r. Register User") 
         print("va. View All Tasks")
         print("vm. View My Tasks")
+        print("vf. View Filtered Tasks")
+        print("st. Search Tasks")
+        print("ud. Upcoming Deadlines")
         print("gr. Generate Reports")
+        print("tr. Task Trends")
         print("ds. Display Statistics")
+        print("ct. Compact Task File")
+        print("m. Show Metrics")
         print("e. Exit")
         choice = input("Enter your choice: ").lower()
+        if choice == 'e':  # Exit
+            return
 
-        if choice == 'a':  # Add Task
-            add_task(username)  # Passing the logged-in username
-        elif choice == 'r':  # Register User
-            if username == 'admin':  # Check if the user is admin
-                reg_user(username)  # Passing the username to register user function
+        with METRICS.span("menu." + ADMIN_MENU_ACTIONS.get(choice, "invalid")):  # Timed, see Metrics
+            if choice == 'a':  # Add Task
+                add_task(username, store)  # Passing the logged-in username
+            elif choice == 'r':  # Register User
+                if username == 'admin':  # Check if the user is admin
+                    reg_user(username, users)  # Passing the username to register user function
+                else:
+                    print("Only admin can register new users.")  # Inform the user that only admin can register users    
+            elif choice == 'va':  # View All Tasks
+                view_all(store)
+            elif choice == 'vm':  # View My Tasks
+                view_mine(username, store)
+            elif choice == 'vf':  # View Filtered Tasks
+                view_filtered(store)
+            elif choice == 'st':  # Search Tasks
+                search_tasks(store)
+            elif choice == 'ud':  # Upcoming Deadlines
+                view_deadlines(username, store)
+            elif choice == 'gr':  # Generate Reports
+                generate_reports(username, store)
+            elif choice == 'tr':  # Created, completed and overdue tasks over time
+                view_trends(username, store)
+            elif choice == 'ds':  # Display Statistics
+                display_statistics(username, True, store)
+            elif choice == 'ct':  # Merge pending task updates into tasks.txt
+                try:
+                    merged = store.compact()
+                    print(f"Merged {merged} task update(s) into {store.path}.")
+                except ValueError as e:
+                    print(f"Could not compact the tasks file, it was left unchanged: {e}")
+            elif choice == 'm':  # Timings of this session's actions
+                show_metrics()
             else:
-                print("Only admin can register new users.")  # Inform the user that only admin can register users    
-        elif choice == 'va':  # View All Tasks
-            view_all()
-        elif choice == 'vm':  # View My Tasks
-            view_mine(username)
-        elif choice == 'gr':  # Generate Reports
-            generate_reports(username,tasks)
-        elif choice == 'ds':  # Display Statistics
-            display_statistics(username, tasks)  
-        elif choice == 'e':  # Exit
-            return
-        else:
-            print("Invalid choice. Please try again.")
-def main():
+                print("Invalid choice. Please try again.")
+def compact_if_needed(store):
+    """
+    Merge the event log into the tasks file once it holds COMPACT_AFTER_EVENTS
+    events, so startup stays fast.
+    """
+    if store.pending_events >= COMPACT_AFTER_EVENTS:
+        try:
+            store.compact()
+        except ValueError as e:
+            logging.error("Skipping compaction, the tasks file was left unchanged: %s", e)
+
+
+def main(store=None):
     """
     Main function to run the task manager program.
+    param store: The store to work on; the local storage is opened if omitted
+        (taskserver.RemoteStore passes a store served by a task server).
     """
-    users = load_users()  # Loading existing users
-    tasks = load_tasks()  # Loading existing tasks
+    if store is None:
+        backend = generate_files()  # Making sure the storage for the selected format exists
+        store = TaskStore(backend)  # Loading existing tasks once for the whole session
+        compact_if_needed(store)  # A task server compacts its own store
+    users = store.users  # Loaded on first use and kept up to date, see UserRegistry
 
     while True:
         print("\nMain Menu:")
         print("l. Login")
         print("e. Exit")
         choice = input("Enter your choice: ").strip().lower()  # Ensures uniformity in input handling
-        print("DEBUG: User input:", choice)  # Debug print statement
 
         if choice == 'l':  # Login
-            username = authenticate_user(users)
+            username = authenticate_user(users, store.login)
             if username:
                 global current_user  # Using the global variable
                 current_user = username  # Updating the global variable
                 print(f"Welcome, {username}!")
                 # Present extended menu if logged in successfully
                 if username == 'admin':
-                    admin_menu(username, users, tasks)  # Calling admin menu with the necessary arguments
+                    admin_menu(username, users, store)  # Calling admin menu with the necessary arguments
                 else:
-                    user_menu(username, tasks)  # Calling user menu with the necessary arguments
+                    user_menu(username, store)  # Calling user menu with the necessary arguments
         
         elif choice == 'e':  # Exit
             exit()
         else:
             print("Invalid choice. Please try again.")
+def date_argument(text):
+    """
+    Check a YYYY-MM-DD command line argument and return it unchanged.
+    """
+    try:
+        parse_date(text)
+    except ValueError:
+        import argparse
+        raise argparse.ArgumentTypeError(f"invalid date {text!r}, use YYYY-MM-DD") from None
+    return text
+
+
+def add_task_command(assigned_to, task_name, due_date, creator="admin"):
+    """
+    Add one task and print its id ("taskmanager.py add"), so scripts can
+    pass it on to "complete". The task goes through TaskStore.add(), which
+    learns the id from storage (a text store loads from its table snapshot).
+    The task is checked like an imported row, see validate_import_batch().
+
+    Returns:
+        int: The process exit code.
+    """
+    backend = generate_files()
+    today = datetime.date.today().strftime("%Y-%m-%d")
+    row = {"username": creator, "task_name": task_name, "assigned_to": assigned_to, "due_date": due_date}
+    tasks, errors = validate_import_batch([(1, row)], set(load_users(backend)), creator, today)
+    if errors:
+        print(f"Invalid task: {errors[0][1]}", file=sys.stderr)
+        return 1
+    task = TaskStore(backend).add(tasks[0])
+    print(f"Task {task.task_id} added successfully.")
+    return 0
+
+
+def complete_task_command(task_id):
+    """
+    Mark one task as complete, reading only that task ("taskmanager.py complete").
+
+    Returns:
+        int: The process exit code; 1 if there is no such task.
+    """
+    backend = generate_files()
+    task = backend.get_task(task_id)
+    if task is None:
+        print(f"No task with id {task_id}.", file=sys.stderr)
+        return 1
+    if task.completed == "Yes":
+        print(f"Task {task_id} is already complete.")
+        return 0
+    with counting_completion(rollups_path_for(backend.path), task):
+        backend.complete_task(task_id)
+    print(f"Task {task_id} marked as complete.")
+    return 0
+
+
+def cli(argv=None):
+    """
+    Run a one-shot command from the command line, or the interactive menus
+    when no command is given.
+
+        python taskmanager.py [--metrics metrics.jsonl] [command]
+        python taskmanager.py add alice "Write report" --due 2024-06-01
+        python taskmanager.py complete 12
+        python taskmanager.py list [--assignee alice] [--completed no] [--sort due_date]
+        python taskmanager.py list --search "report OR invoice*" [--assignee alice]
+        python taskmanager.py import tasks.csv [--strict]
+        python taskmanager.py export tasks out.jsonl
+        python taskmanager.py export users users.csv
+        python taskmanager.py register new_users.txt
+        python taskmanager.py report [--workers N]
+        python taskmanager.py trends [--period month] [--from 2024-01-01] [--to 2024-06-30] [--assignee alice]
+        python taskmanager.py migrate sqlite|sharded
+        python taskmanager.py migrate text --from binary
+        python taskmanager.py serve [--socket PATH]
+        python taskmanager.py connect [--socket PATH]
+
+    Commands read only what they need: complete never loads the other tasks,
+    add only loads them from the table snapshot to learn the new id, list
+    streams its matches from storage (a search goes through the keyword
+    index, see KeywordIndex) and trends reads the daily rollups (see
+    DailyRollups). Modules only some commands use are imported on first
+    use, and "python -m taskmanager"
+    starts faster than running the file because Python then reuses the
+    compiled module instead of compiling it on every run.
+
+    Returns the process exit code: 0 on success, 1 if the command failed and
+    2 for invalid arguments.
+    """
+    import argparse
+    parser = argparse.ArgumentParser(prog="taskmanager.py", description="Task manager")
+    parser.add_argument("--metrics", metavar="PATH", help="append timings of every action to this JSONL file")
+    commands = parser.add_subparsers(dest="command")
+
+    add_parser = commands.add_parser("add", help="add a task")
+    add_parser.add_argument("assigned_to", metavar="assignee")
+    add_parser.add_argument("task_name", metavar="name")
+    add_parser.add_argument("--due", required=True, type=date_argument, help="due date, YYYY-MM-DD")
+    add_parser.add_argument("--creator", default="admin", help="user creating the task")
+
+    complete_parser = commands.add_parser("complete", help="mark a task as complete")
+    complete_parser.add_argument("task_id", type=int)
+
+    list_parser = commands.add_parser("list", help="print the tasks matching the filters")
+    list_parser.add_argument("--assignee")
+    list_parser.add_argument("--completed", type=str.capitalize, choices=["Yes", "No"])
+    list_parser.add_argument("--due-from", type=date_argument, help="due on or after, YYYY-MM-DD")
+    list_parser.add_argument("--due-to", type=date_argument, help="due on or before, YYYY-MM-DD")
+    list_parser.add_argument("--sort", choices=sorted(SORT_KEYS))
+    list_parser.add_argument("--search", metavar="QUERY", help='task name words, e.g. "fix server OR deploy*"')
+
+    import_parser = commands.add_parser("import", help="bulk-import tasks from CSV or JSONL")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--strict", action="store_true", help="import nothing if any row is invalid")
+    import_parser.add_argument("--creator", default="admin", help="creator for rows without a username")
+
+    export_parser = commands.add_parser("export", help="export tasks or users to CSV or JSONL")
+    export_parser.add_argument("what", choices=["tasks", "users"])
+    export_parser.add_argument("path")
+
+    register_parser = commands.add_parser("register", help="register every username;password line of a file")
+    register_parser.add_argument("path")
+
+    report_parser = commands.add_parser("report", help="write and print the task and user overview reports")
+    report_parser.add_argument("--workers", type=int, help="processes counting the tasks file (default: CPUs)")
+
+    trends_parser = commands.add_parser("trends", help="print created, completed and overdue tasks over time")
+    trends_parser.add_argument("--period", choices=list(TREND_PERIODS), default="week")
+    trends_parser.add_argument("--from", dest="start", type=date_argument, help="first day, YYYY-MM-DD")
+    trends_parser.add_argument("--to", dest="end", type=date_argument, help="last day, YYYY-MM-DD")
+    trends_parser.add_argument("--assignee")
+
+    migrate_parser = commands.add_parser("migrate", help="copy the text files into another storage format")
+    migrate_parser.add_argument("storage_format", choices=sorted({target for targets in MIGRATIONS.values()
+                                                                  for target in targets}))
+    migrate_parser.add_argument("--from", dest="source_format", choices=sorted(MIGRATIONS), default="text",
+                                help="storage to copy from (default: text)")
+
+    serve_parser = commands.add_parser("serve", help="serve the task store to other sessions over a Unix socket")
+    serve_parser.add_argument("--socket", default=SERVER_SOCKET)
+
+    connect_parser = commands.add_parser("connect", help="run the menus against a task server")
+    connect_parser.add_argument("--socket", default=SERVER_SOCKET)
+
+    args = parser.parse_args(argv)
+    if args.metrics:
+        METRICS.enable(args.metrics)
+    if args.command is None:
+        main()
+        return 0
+    try:
+        return run_command(args)
+    except (OSError, ValueError) as e:
+        print(f"taskmanager.py {args.command}: {e}", file=sys.stderr)
+        return 1
+
+
+def run_command(args):
+    """
+    Run the command parsed by cli() and return its exit code.
+    """
+    if args.command == "add":
+        return add_task_command(args.assigned_to, args.task_name, args.due, args.creator)
+    if args.command == "complete":
+        return complete_task_command(args.task_id)
+    if args.command == "list":
+        if args.search is None:
+            view_all(sort_by=args.sort, paged=False, assigned_to=args.assignee, completed=args.completed,
+                     due_from=args.due_from, due_to=args.due_to)
+            return 0
+        tasks = TaskStore(generate_files()).search(args.search, args.assignee, args.completed)
+        tasks = sort_tasks(filter_tasks(tasks, due_from=args.due_from, due_to=args.due_to), args.sort)
+        if not render_task_pages(tasks, prompt=False):
+            print("No tasks found.")
+        return 0
+    if args.command == "import":
+        result = import_tasks(args.path, default_creator=args.creator, strict=args.strict)
+        report_throughput("Imported", result["imported"], result["seconds"], result["errors"])
+        return 1 if result["errors"] else 0
+    if args.command == "export":
+        export = export_tasks if args.what == "tasks" else export_users
+        result = export(args.path)
+        report_throughput("Exported", result["exported"], result["seconds"])
+        return 0
+    if args.command == "register":
+        result = register_users(args.path, UserRegistry(generate_files()))
+        report_throughput("Registered", result["registered"], result["seconds"], result["errors"])
+        return 1 if result["errors"] else 0
+    if args.command == "report":
+        generate_reports("admin", workers=args.workers)
+        return 0
+    if args.command == "trends":
+        print_trends(TaskStore(generate_files()).trends(args.start, args.end, args.period, args.assignee))
+        return 0
+    if args.command == "migrate":
+        task_count, user_count = migrate_storage(args.storage_format, args.source_format)
+        print(f"Migrated {task_count} tasks and {user_count} users to {args.storage_format} storage.")
+        return 0
+    if args.command == "serve":
+        import taskserver
+        taskserver.run_server(args.socket)
+        return 0
+    if args.command == "connect":
+        import taskserver
+        main(taskserver.RemoteStore(args.socket))
+        return 0
+
+
 if __name__ == "__main__":
-     main()
\ No newline at end of file
+    # Let modules that "import taskmanager" (taskserver) share this instance
+    sys.modules.setdefault("taskmanager", sys.modules[__name__])
+    sys.exit(cli())
\ No newline at end of file
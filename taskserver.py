@@ -0,0 +1,428 @@
+"""
+Local task server: one process owns the task store and many sessions use it.
+
+Start the server with "python taskmanager.py serve" and run the usual menus
+against it with "python taskmanager.py connect". Sessions talk to the server
+over a Unix socket using one JSON object per line:
+
+    request:  {"op": "complete", "args": {"task_id": 12}}
+    response: {"ok": true, "result": [...]}  or  {"ok": false, "error": "..."}
+
+Tasks travel as lists in Task.FIELDS order with the dates as YYYY-MM-DD text.
+"""
+import asyncio
+import itertools
+import json
+import os
+import socket
+
+import taskmanager
+from taskmanager import Task, TaskStats, TaskStore, UserRegistry, SERVER_SOCKET
+
+# Operations that change data; they are queued and applied one at a time by
+# the server's single writer.
+WRITE_OPS = {"add_task", "complete", "set_due_date", "compact", "add_user", "add_users"}
+# Operations a session may run before it has logged in
+PUBLIC_OPS = {"info", "login"}
+# Operations of the admin menu, refused to every other user
+ADMIN_OPS = {"add_user", "add_users", "compact", "stats", "overview_stats", "trends",
+             "report_key", "report_is_fresh", "mark_report_fresh"}
+CURSOR_BATCH_SIZE = 1000  # Tasks fetched per round trip when streaming a view
+
+
+def task_to_row(task):
+    """
+    Turn a Task into the list sent over the socket.
+    """
+    if task is None:
+        return None
+    return [task.username, task.task_name, task.assigned_to, task.date_text("start_date"),
+            task.date_text("due_date"), task.completed, task.task_id]
+
+
+def row_to_task(row):
+    """
+    Turn a list received over the socket back into a Task.
+    """
+    return None if row is None else Task(*row)
+
+
+def _day(text):
+    return None if text is None else taskmanager.parse_date(text).date()
+
+
+def _absolute(report_path):
+    # The server runs in its own directory, so a relative path would name another file
+    if not os.path.isabs(report_path):
+        raise ValueError(f"Report path {report_path!r} must be absolute")
+    return report_path
+
+
+class Session:
+    """
+    The state the server keeps for one connection.
+    """
+
+    def __init__(self):
+        self.username = None  # Set by a successful login
+        self.cursors = {}  # Open views: cursor id -> task iterator
+
+
+class TaskServer:
+    """
+    Serves one TaskStore to any number of sessions over a Unix socket.
+
+    All sessions share the tasks the server parsed once. Reads are answered
+    straight from the store; writes are put on a queue and applied in order by
+    a single writer task, so sessions can no longer overwrite each other's
+    changes.
+
+    Each connection has to log in before anything but "info" is answered,
+    and only the admin may run the ADMIN_OPS.
+    """
+
+    def __init__(self, store, socket_path=SERVER_SOCKET):
+        self.store = store
+        self.socket_path = socket_path
+        self.server = None
+        self._writes = None
+        self._writer = None
+        self._cursor_ids = itertools.count(1)
+
+    async def start(self):
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)  # Left behind by a server that did not shut down cleanly
+        self._writes = asyncio.Queue()
+        self._writer = asyncio.create_task(self._write_loop())
+        self.server = await asyncio.start_unix_server(self._handle, path=self.socket_path)
+
+    async def serve_forever(self):
+        await self.start()
+        try:
+            await self.server.serve_forever()
+        finally:
+            await self.close()
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+            self.server = None
+        if self._writer is not None:
+            self._writer.cancel()
+            self._writer = None
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+
+    async def _handle(self, reader, writer):
+        session = Session()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                    result = await self._dispatch(request["op"], request.get("args", {}), session)
+                    response = {"ok": True, "result": result}
+                except Exception as e:
+                    response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def _dispatch(self, op, args, session):
+        handler = getattr(self, f"op_{op}", None)
+        if handler is None:
+            raise ValueError(f"Unknown operation {op!r}")
+        if session.username is None and op not in PUBLIC_OPS:
+            raise PermissionError("Log in first")
+        if op in ADMIN_OPS and session.username != "admin":
+            raise PermissionError(f"Only admin can run {op!r}")
+        if op in WRITE_OPS:
+            future = asyncio.get_running_loop().create_future()
+            await self._writes.put((handler, session, args, future))
+            return await future
+        return handler(session, **args)
+
+    async def _write_loop(self):
+        while True:
+            handler, session, args, future = await self._writes.get()
+            try:
+                future.set_result(handler(session, **args))
+            except Exception as e:
+                future.set_exception(e)
+
+    # Reads
+
+    def op_info(self, session):
+        return {"path": self.store.path, "pending_events": self.store.pending_events, "count": len(self.store)}
+
+    def op_users(self, session):
+        return list(self.store.users.all())  # Usernames only, passwords never leave the server
+
+    def op_users_signature(self, session):
+        return self.store.backend.users_signature()
+
+    def op_login(self, session, username, password):
+        session.username = self.store.login(username, password)
+        return session.username
+
+    def op_get(self, session, task_id):
+        return task_to_row(self.store.get(task_id))
+
+    def op_all(self, session):
+        return [task_to_row(task) for task in self.store.all()]
+
+    def op_assigned_to(self, session, username):
+        return [task_to_row(task) for task in self.store.assigned_to(username)]
+
+    def op_created_by(self, session, username):
+        return [task_to_row(task) for task in self.store.created_by(username)]
+
+    def op_mine(self, session, username):
+        return [task_to_row(task) for task in self.store.mine(username)]
+
+    def op_with_status(self, session, completed):
+        return [task_to_row(task) for task in self.store.with_status(completed)]
+
+    def op_open_cursor(self, session, sort_by=None, filters=None):
+        cursor_id = next(self._cursor_ids)
+        session.cursors[cursor_id] = self.store.iter_tasks(sort_by=sort_by, **(filters or {}))
+        return cursor_id
+
+    def op_fetch(self, session, cursor_id, count=CURSOR_BATCH_SIZE):
+        rows = [task_to_row(task) for task in itertools.islice(session.cursors[cursor_id], count)]
+        if len(rows) < count:
+            del session.cursors[cursor_id]
+        return rows
+
+    def op_close_cursor(self, session, cursor_id):
+        session.cursors.pop(cursor_id, None)
+
+    def op_search(self, session, query, assigned_to=None, completed=None):
+        return [task_to_row(task) for task in self.store.search(query, assigned_to, completed)]
+
+    def op_incomplete_due(self, session, start=None, end=None, assigned_to=None):
+        return [task_to_row(task) for task in self.store.incomplete_due(_day(start), _day(end), assigned_to)]
+
+    def op_count_incomplete_due(self, session, start=None, end=None, assigned_to=None):
+        return self.store.count_incomplete_due(_day(start), _day(end), assigned_to)
+
+    def op_stats(self, session, today=None):
+        return self.store.stats(_day(today)).to_dict()
+
+    def op_overview_stats(self, session, today=None):
+        return self.store.overview_stats(_day(today)).to_dict()
+
+    def op_user_stats(self, session, username, today=None):
+        return self.store.user_stats(username, _day(today))
+
+    def op_trends(self, session, start=None, end=None, period="week", assigned_to=None):
+        return self.store.trends(start, end, period, assigned_to)
+
+    def op_report_key(self, session, extra=()):
+        return self.store.report_key(*extra)
+
+    def op_report_is_fresh(self, session, report_path, key):
+        return self.store.report_is_fresh(_absolute(report_path), key)
+
+    def op_mark_report_fresh(self, session, report_path, key):
+        self.store.mark_report_fresh(_absolute(report_path), key)
+
+    # Writes, applied one at a time by the writer task
+
+    def op_add_task(self, session, task):
+        return task_to_row(self.store.add(row_to_task(task)))
+
+    def op_complete(self, session, task_id):
+        return task_to_row(self.store.complete(task_id))
+
+    def op_set_due_date(self, session, task_id, due_date):
+        return task_to_row(self.store.set_due_date(task_id, taskmanager.parse_date(due_date)))
+
+    def op_compact(self, session):
+        return self.store.compact()
+
+    def op_add_user(self, session, username, password):
+        self.store.users.add(username, password)
+
+    def op_add_users(self, session, users):
+        self.store.users.add_many(users)
+
+
+def run_server(socket_path=SERVER_SOCKET, store=None):
+    """
+    Load the store and serve it until interrupted.
+    """
+    if store is None:
+        store = TaskStore(taskmanager.generate_files())
+    taskmanager.compact_if_needed(store)
+    print(f"Serving {store.path} on {socket_path}. Press Ctrl+C to stop.")
+    try:
+        asyncio.run(TaskServer(store, socket_path).serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+class RemoteStore:
+    """
+    A TaskStore look-alike that forwards every call to a task server.
+
+    The menu functions in taskmanager only use the store's methods, so passing
+    a RemoteStore to taskmanager.main() runs the usual menus against the server.
+    """
+
+    def __init__(self, socket_path=SERVER_SOCKET):
+        self.socket_path = socket_path
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._socket.connect(socket_path)
+        self._file = self._socket.makefile("rwb")
+        self.backend = RemoteBackend(self)
+        self.users = UserRegistry(self.backend)
+
+    def close(self):
+        self._file.close()
+        self._socket.close()
+
+    def call(self, op, **args):
+        """
+        Send one request and return its result, raising RuntimeError if the
+        server reports an error.
+        """
+        self._file.write(json.dumps({"op": op, "args": args}).encode() + b"\n")
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("The task server closed the connection")
+        response = json.loads(line)
+        if not response["ok"]:
+            raise RuntimeError(response["error"])
+        return response["result"]
+
+    @property
+    def path(self):
+        return self.call("info")["path"]
+
+    @property
+    def pending_events(self):
+        return self.call("info")["pending_events"]
+
+    def __len__(self):
+        return self.call("info")["count"]
+
+    def login(self, username, password):
+        """
+        Have the server check a username and password, see TaskStore.login().
+        """
+        return self.call("login", username=username, password=password)
+
+    def all(self):
+        return [row_to_task(row) for row in self.call("all")]
+
+    def get(self, task_id):
+        return row_to_task(self.call("get", task_id=task_id))
+
+    def assigned_to(self, username):
+        return [row_to_task(row) for row in self.call("assigned_to", username=username)]
+
+    def created_by(self, username):
+        return [row_to_task(row) for row in self.call("created_by", username=username)]
+
+    def mine(self, username):
+        return [row_to_task(row) for row in self.call("mine", username=username)]
+
+    def with_status(self, completed):
+        return [row_to_task(row) for row in self.call("with_status", completed=completed)]
+
+    def iter_tasks(self, sort_by=None, **filters):
+        """
+        Stream a view from the server in batches of CURSOR_BATCH_SIZE tasks.
+        """
+        cursor_id = self.call("open_cursor", sort_by=sort_by, filters=filters)
+        try:
+            while True:
+                rows = self.call("fetch", cursor_id=cursor_id, count=CURSOR_BATCH_SIZE)
+                for row in rows:
+                    yield row_to_task(row)
+                if len(rows) < CURSOR_BATCH_SIZE:
+                    cursor_id = None
+                    return
+        finally:
+            if cursor_id is not None:
+                self.call("close_cursor", cursor_id=cursor_id)
+
+    def search(self, query, assigned_to=None, completed=None):
+        return [row_to_task(row) for row in self.call("search", query=query, assigned_to=assigned_to,
+                                                      completed=completed)]
+
+    def incomplete_due(self, start=None, end=None, assigned_to=None):
+        rows = self.call("incomplete_due", start=_text(start), end=_text(end), assigned_to=assigned_to)
+        return [row_to_task(row) for row in rows]
+
+    def count_incomplete_due(self, start=None, end=None, assigned_to=None):
+        return self.call("count_incomplete_due", start=_text(start), end=_text(end), assigned_to=assigned_to)
+
+    def stats(self, today=None):
+        return TaskStats.from_dict(self.call("stats", today=_text(today)))
+
+    def overview_stats(self, today=None):
+        return TaskStats.from_dict(self.call("overview_stats", today=_text(today)))
+
+    def user_stats(self, username, today=None):
+        return self.call("user_stats", username=username, today=_text(today))
+
+    def trends(self, start=None, end=None, period="week", assigned_to=None):
+        return [tuple(row) for row in self.call("trends", start=start, end=end, period=period,
+                                                assigned_to=assigned_to)]
+
+    def report_key(self, *extra):
+        return self.call("report_key", extra=list(extra))
+
+    def report_is_fresh(self, report_path, key):
+        return self.call("report_is_fresh", report_path=os.path.abspath(report_path), key=key)
+
+    def mark_report_fresh(self, report_path, key):
+        self.call("mark_report_fresh", report_path=os.path.abspath(report_path), key=key)
+
+    def add(self, task):
+        if not isinstance(task, Task):
+            task = Task.from_dict(task)
+        return row_to_task(self.call("add_task", task=task_to_row(task)))
+
+    def complete(self, task_id):
+        return row_to_task(self.call("complete", task_id=task_id))
+
+    def set_due_date(self, task_id, due_date):
+        return row_to_task(self.call("set_due_date", task_id=task_id, due_date=taskmanager.format_date(due_date)))
+
+    def compact(self):
+        return self.call("compact")
+
+
+class RemoteBackend:
+    """
+    The users part of the backend interface, used by the RemoteStore's UserRegistry.
+    The server only sends usernames, so the registry's passwords are all None
+    and logging in goes through RemoteStore.login().
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def load_users(self):
+        return dict.fromkeys(self.store.call("users"))
+
+    def users_signature(self):
+        return self.store.call("users_signature")
+
+    def add_user(self, username, password):
+        self.store.call("add_user", username=username, password=password)
+
+    def add_users(self, users):
+        self.store.call("add_users", users=[list(user) for user in users])
+
+
+def _text(day):
+    return None if day is None else day.strftime("%Y-%m-%d")
@@ -0,0 +1,839 @@
+"""
+Tests for the task manager storage.
+
+    python -m pytest -q
+"""
+import asyncio
+import builtins
+import contextlib
+import datetime
+import io
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+import taskmanager
+import taskserver
+
+
+def task_line(number, assigned_to="alice", completed="No"):
+    return f"admin;Task {number};{assigned_to};2024-01-01;2024-02-01;{completed}\n"
+
+
+class TempDirTestCase(unittest.TestCase):
+    def setUp(self):
+        self._temp_dir = tempfile.TemporaryDirectory()
+        self.dir = self._temp_dir.name
+        self.tasks_path = os.path.join(self.dir, "tasks.txt")
+        self.users_path = os.path.join(self.dir, "user.txt")
+        with open(self.users_path, "w") as file:
+            file.write("alice;pw\nbob;pw\n")
+
+    def tearDown(self):
+        self._temp_dir.cleanup()
+
+    def write_tasks(self, lines):
+        with open(self.tasks_path, "w") as file:
+            file.writelines(lines)
+
+    def read_tasks(self):
+        with open(self.tasks_path, "r") as file:
+            return file.readlines()
+
+
+class CompactTasksTest(TempDirTestCase):
+    def test_merges_events(self):
+        self.write_tasks([task_line(number) for number in range(1, 4)])
+        backend = taskmanager.TextBackend(self.tasks_path, self.users_path)
+        backend.complete_task(2)
+        self.assertEqual(taskmanager.compact_tasks(self.tasks_path), 1)
+        self.assertEqual(self.read_tasks(), [task_line(1), task_line(2, completed="Yes"), task_line(3)])
+        self.assertEqual(taskmanager.load_task_events(taskmanager.events_path_for(self.tasks_path)), [])
+
+    def test_malformed_line_leaves_files_unchanged(self):
+        lines = [task_line(number) for number in range(1, 20001)]
+        lines[5] = "not a task line\n"
+        self.write_tasks(lines)
+        backend = taskmanager.TextBackend(self.tasks_path, self.users_path)
+        backend.complete_task(10)
+        with self.assertRaisesRegex(ValueError, "line 6"):
+            taskmanager.compact_tasks(self.tasks_path)
+        self.assertEqual(self.read_tasks(), lines)
+        self.assertEqual(len(taskmanager.load_task_events(taskmanager.events_path_for(self.tasks_path))), 1)
+
+
+class TextBackendScanTest(TempDirTestCase):
+    def test_filters_and_applies_events(self):
+        self.write_tasks([task_line(1), "\n", task_line(2, "bob"), task_line(3)])
+        backend = taskmanager.TextBackend(self.tasks_path, self.users_path)
+        backend.complete_task(3)
+        tasks = list(backend.iter_tasks(assigned_to="alice"))
+        self.assertEqual([(task.task_id, task.completed) for task in tasks], [(1, "No"), (3, "Yes")])
+
+    def test_malformed_line_names_the_line(self):
+        self.write_tasks([task_line(1), "\n", "admin;Short line\n", task_line(2)])
+        backend = taskmanager.TextBackend(self.tasks_path, self.users_path)
+        with self.assertRaisesRegex(ValueError, "line 3: expected 6 fields, found 2"):
+            list(backend.iter_tasks())
+
+
+class AtomicWriteTest(TempDirTestCase):
+    def test_keeps_permissions_of_replaced_file(self):
+        self.write_tasks([task_line(1)])
+        os.chmod(self.tasks_path, 0o644)
+        taskmanager.atomic_write(self.tasks_path, [task_line(2)])
+        self.assertEqual(os.stat(self.tasks_path).st_mode & 0o777, 0o644)
+        self.assertEqual(self.read_tasks(), [task_line(2)])
+
+    def test_new_file_follows_umask(self):
+        umask = os.umask(0o022)
+        try:
+            taskmanager.atomic_write(self.tasks_path, [task_line(1)])
+        finally:
+            os.umask(umask)
+        self.assertEqual(os.stat(self.tasks_path).st_mode & 0o777, 0o644)
+
+
+class TaskStoreAddTest(TempDirTestCase):
+    def new_task(self, name):
+        return taskmanager.Task("admin", name, "alice", "2024-01-01", "2024-02-01", "No")
+
+    def open_store(self):
+        return taskmanager.TaskStore(taskmanager.TextBackend(self.tasks_path, self.users_path))
+
+    def test_ids_stay_in_step_with_other_sessions(self):
+        self.write_tasks([task_line(1)])
+        store, other_store = self.open_store(), self.open_store()
+        other = threading.Thread(target=other_store.add, args=(self.new_task("Other"),))
+        append_task = store.backend.append_task
+
+        def append_while_other_session_adds(task):
+            other.start()
+            other.join(0.2)  # Waits for the lock until this append is done
+            return append_task(task)
+
+        store.backend.append_task = append_while_other_session_adds
+        added = store.add(self.new_task("Mine"))
+        other.join()
+        store.backend.append_task = append_task
+        self.assertEqual(added.task_id, 2)
+        self.assertEqual(store.add(self.new_task("Later")).task_id, 4)
+        self.assertEqual([task.task_name for task in store.all()], ["Task 1", "Mine", "Other", "Later"])
+        store.complete(4)
+        self.assertEqual(self.read_tasks()[3], "admin;Later;alice;2024-01-01;2024-02-01;No\n")
+        self.assertEqual(taskmanager.TextBackend(self.tasks_path, self.users_path).get_task(4).completed, "Yes")
+
+    def test_sorted_view_matches_sorting_the_tasks(self):
+        self.write_tasks([f"admin;Task {number};{'alice' if number % 3 else 'bob'};2024-01-01;"
+                          f"2024-02-{number % 5 + 1:02d};{'Yes' if number % 4 == 0 else 'No'}\n"
+                          for number in range(1, 41)])
+        store = self.open_store()
+        for sort_by, key in taskmanager.SORT_KEYS.items():
+            for filters in ({}, {"completed": "No"}, {"assigned_to": "bob", "due_from": "2024-02-03"}):
+                expected = sorted(taskmanager.filter_tasks(store.tasks.tasks(), **filters), key=key)
+                self.assertEqual([task.task_id for task in store.iter_tasks(sort_by=sort_by, **filters)],
+                                 [task.task_id for task in expected])
+
+
+class TaskTableTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.originals = [
+            taskmanager.Task("admin", "Plain", "alice", "2024-01-01", "2024-02-01", "No", 1),
+            taskmanager.Task("bob", "Ünïcode ✓", "bob", "2024-01-02", "2024-01-15", "Yes", 2),
+            taskmanager.Task("admin", "Bad due", "alice", "2024-01-03", "soon", "No", 3),
+            taskmanager.Task("alice", "Bad start", "carol", "2024-13-01", "2024-03-01", "No", 4),
+            taskmanager.Task("admin", "Odd flag", "bob", "2024-01-05", "2024-01-20", "Maybe", 5),
+            taskmanager.Task("admin", "Late", "carol", "2024-01-06", "2023-12-31", "No", 6),
+        ]
+        self.table = taskmanager.TaskTable(self.originals)
+
+    def fields(self, tasks):
+        return [(task.task_id, task.username, task.task_name, task.assigned_to, task.date_text("start_date"),
+                 task.date_text("due_date"), task.completed) for task in tasks]
+
+    def test_rows_and_copies_match_the_tasks(self):
+        self.assertEqual(self.fields(self.table.tasks()), self.fields(self.originals))
+        self.assertEqual(self.fields(self.table), self.fields(self.originals))
+        self.assertEqual(self.fields(self.table.tasks([5, 3])), self.fields([self.originals[4], self.originals[2]]))
+        self.assertEqual(self.table.bad_dates, {(2, "due_date"): "soon", (3, "start_date"): "2024-13-01"})
+
+    def test_filters_sorting_and_counters_match_the_task_functions(self):
+        for filters in ({}, {"assigned_to": "alice"}, {"completed": "No"}, {"completed": "Maybe"},
+                        {"due_from": "2024-01-15", "due_to": "2024-02-01"}, {"due_from": "2024-03-01"},
+                        {"assigned_to": "carol", "completed": "No", "due_to": "2024-01-01"}):
+            with self.subTest(**filters):
+                expected = [task.task_id for task in taskmanager.filter_tasks(self.originals, **filters)]
+                self.assertEqual(self.table.matching_ids(filters), expected)
+                self.assertEqual(self.table.matching_ids(filters, [6, 5, 4, 3]),
+                                 [task_id for task_id in [6, 5, 4, 3] if task_id in expected])
+        for sort_by, key in taskmanager.SORT_KEYS.items():
+            self.assertEqual([self.table.sort_key(sort_by)(task.task_id) for task in self.originals],
+                             [key(task) for task in self.originals])
+        today = datetime.date(2024, 1, 18)
+        self.assertEqual(self.table.stats(today).to_dict(),
+                         taskmanager.compute_task_stats(self.originals, today).to_dict())
+        self.assertEqual(sorted(self.table.incomplete()),
+                         sorted((task.date_text("due_date"), task.task_id, task.assigned_to)
+                                for task in self.originals if task.completed != "Yes"))
+
+    def test_changes_through_rows(self):
+        self.table[0].task_name = "Renamed"
+        self.table[2].due_date = datetime.datetime(2024, 4, 1)  # Replaces the bad date
+        self.table[1].start_date = "never"
+        self.table[4].completed = "Yes"
+        self.assertEqual(self.table.renamed, {0: "Renamed"})
+        self.assertEqual(self.table.bad_dates, {(1, "start_date"): "never", (3, "start_date"): "2024-13-01"})
+        self.assertEqual([task.task_name for task in self.table.tasks([1, 2])], ["Renamed", "Ünïcode ✓"])
+        self.assertEqual(self.table.task_name(1), "Ünïcode ✓")  # The rename does not shift the other names
+        self.assertEqual(self.table.matching_ids({"due_from": "2024-04-01"}), [3])
+        self.assertEqual(self.table[4].completed, "Yes")
+
+        self.write_tasks([taskmanager.format_task_line(task) for task in self.originals])
+        snapshot_path = taskmanager.snapshot_path_for(self.tasks_path)
+        taskmanager.save_table_snapshot(snapshot_path, self.tasks_path, self.table,
+                                        os.path.getsize(self.tasks_path))
+        loaded, _ = taskmanager.load_table_snapshot(snapshot_path, self.tasks_path)
+        self.assertEqual(self.fields(loaded.tasks()), self.fields(self.table.tasks()))
+        self.assertEqual((loaded.renamed, loaded.bad_dates), (self.table.renamed, self.table.bad_dates))
+
+
+class TableSnapshotTest(TempDirTestCase):
+    def load(self):
+        return taskmanager.read_tasks_table(self.tasks_path, taskmanager.snapshot_path_for(self.tasks_path))
+
+    def test_appended_tasks_are_parsed_after_the_snapshot(self):
+        self.write_tasks([task_line(number) for number in range(1, 2001)])
+        self.load()
+        with open(self.tasks_path, "a") as file:
+            file.write(task_line(2001, "bob"))
+        table, offset = taskmanager.load_table_snapshot(taskmanager.snapshot_path_for(self.tasks_path),
+                                                        self.tasks_path)
+        self.assertEqual(len(table), 2000)
+        self.assertEqual(offset, os.path.getsize(self.tasks_path) - len(task_line(2001, "bob")))
+        table = self.load()
+        self.assertEqual(len(table), 2001)
+        self.assertEqual(table[2000].assigned_to, "bob")
+
+    def test_same_size_edit_rebuilds_the_table(self):
+        lines = [task_line(number) for number in range(1, 20001)]
+        self.write_tasks(lines)
+        self.load()
+        lines[10000] = lines[10000].replace(";No", ";Nx")
+        self.write_tasks(lines)
+        os.utime(self.tasks_path, ns=(0, os.stat(self.tasks_path).st_mtime_ns + 1))
+        self.assertEqual(taskmanager.load_table_snapshot(taskmanager.snapshot_path_for(self.tasks_path),
+                                                         self.tasks_path), (None, 0))
+        self.assertEqual(self.load()[10000].completed, "Nx")
+
+
+class BinaryTaskFileTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.binary_path = os.path.join(self.dir, "tasks.bin")
+
+    def new_task(self, task_name, assigned_to="alice"):
+        return {"username": "admin", "task_name": task_name, "assigned_to": assigned_to,
+                "start_date": datetime.datetime(2024, 1, 1), "due_date": datetime.datetime(2024, 2, 1),
+                "completed": "No"}
+
+    def open_binary(self):
+        binary = taskmanager.BinaryTaskFile(self.binary_path)
+        self.addCleanup(binary.close)
+        return binary
+
+    def test_round_trip_through_text(self):
+        lines = [task_line(1), task_line(2, "bob", "Yes"), task_line(3)]
+        self.write_tasks(lines)
+        self.assertEqual(taskmanager.text_to_binary(self.tasks_path, self.binary_path), 3)
+        self.assertEqual([task.task_id for task in self.open_binary()], [1, 2, 3])
+        os.remove(self.tasks_path)
+        self.assertEqual(taskmanager.binary_to_text(self.binary_path, self.tasks_path), 3)
+        self.assertEqual(self.read_tasks(), lines)
+
+    def test_conversion_keeps_the_file_permissions(self):
+        self.write_tasks([task_line(1)])
+        taskmanager.text_to_binary(self.tasks_path, self.binary_path)
+        os.chmod(self.binary_path, 0o640)
+        taskmanager.text_to_binary(self.tasks_path, self.binary_path)
+        self.assertEqual(os.stat(self.binary_path).st_mode & 0o777, 0o640)
+
+    def test_updates_in_place(self):
+        self.write_tasks([task_line(1), task_line(2)])
+        taskmanager.text_to_binary(self.tasks_path, self.binary_path)
+        size = os.path.getsize(self.binary_path)
+        binary = self.open_binary()
+        binary.set_completed(2)
+        binary.set_due_date(1, datetime.datetime(2024, 3, 1))
+        self.assertEqual(os.path.getsize(self.binary_path), size)
+        reopened = self.open_binary()
+        self.assertEqual(reopened.read(2).completed, "Yes")
+        self.assertEqual(reopened.read(1).date_text("due_date"), "2024-03-01")
+        self.assertEqual(reopened.read(1).completed, "No")
+
+    def test_appends_store_each_string_once(self):
+        taskmanager.BinaryTaskFile.create(self.binary_path).close()
+        binary = self.open_binary()
+        self.assertEqual(binary.append_many([self.new_task("Report"), self.new_task("Review", "bob")]), 2)
+        self.assertEqual(binary.append(self.new_task("Report", "bob")), 3)
+        with open(binary.strings_path, "r") as file:
+            self.assertEqual(file.read(), "admin\nReport\nalice\nReview\nbob\n")
+        self.assertEqual([(task.task_name, task.assigned_to) for task in self.open_binary()],
+                         [("Report", "alice"), ("Review", "bob"), ("Report", "bob")])
+
+    def test_two_writers_share_the_string_table(self):
+        taskmanager.BinaryTaskFile.create(self.binary_path).close()
+        first, second = self.open_binary(), self.open_binary()
+        first.append(self.new_task("Report"))
+        second.append(self.new_task("Review", "bob"))
+        first.append(self.new_task("Plan", "bob"))
+        expected = [("Report", "alice"), ("Review", "bob"), ("Plan", "bob")]
+        for binary in (first, second, self.open_binary()):
+            binary.open()
+            self.assertEqual([(task.task_name, task.assigned_to) for task in binary], expected)
+        self.assertEqual(len(first.strings), len(set(first.strings)))
+
+    def test_replaced_string_table_is_read_again(self):
+        self.write_tasks([task_line(1)])
+        taskmanager.text_to_binary(self.tasks_path, self.binary_path)
+        binary = self.open_binary()
+        self.write_tasks([task_line(1, "bob")])
+        taskmanager.text_to_binary(self.tasks_path, self.binary_path)
+        binary.open()
+        self.assertEqual(binary.read(1).assigned_to, "bob")
+
+
+class DailyRollupsTest(TempDirTestCase):
+    def overdue(self, store, day):
+        return sum(1 for task in store.all() if task.completed == "No" and task.date_text("due_date") <= day)
+
+    def test_counters_match_a_recount_of_the_tasks(self):
+        self.write_tasks([f"admin;Task {number};{'alice' if number % 2 else 'bob'};2024-03-0{number % 2 + 1};"
+                          f"2024-03-0{number % 4 + 1};{'Yes' if number == 3 else 'No'}\n" for number in range(1, 9)])
+        store = taskmanager.TaskStore(taskmanager.TextBackend(self.tasks_path, self.users_path))
+        path = taskmanager.rollups_path_for(self.tasks_path)
+        rollups = taskmanager.DailyRollups(path)
+        rollups.update(store, datetime.date(2024, 3, 2))
+        overdue_on_first = self.overdue(store, "2024-03-01")
+        for name in ("Later", "Last"):
+            store.add(taskmanager.Task("admin", name, "alice", "2024-03-02", "2024-03-03", "No"))
+        with taskmanager.counting_completion(path, store.get(1), today=datetime.date(2024, 3, 2)):
+            store.backend.complete_task(1)
+        store.backend.complete_task(9)  # Not counted as it happens, update() finds it
+        store.refresh()
+        rollups.update(store, datetime.date(2024, 3, 4))
+
+        tasks = store.all()
+        created = {}
+        for task in tasks:
+            created[task.date_text("start_date")] = created.get(task.date_text("start_date"), 0) + 1
+        self.assertEqual({day: counters[0] for day, counters in rollups.days.items() if counters[0]}, created)
+        self.assertEqual(sum(counters[1] for counters in rollups.days.values()),
+                         sum(1 for task in tasks if task.completed == "Yes"))
+        self.assertEqual(rollups.days[taskmanager.UNDATED][1], 1)
+        self.assertEqual(rollups.days["2024-03-02"][1], 1)
+        self.assertEqual(rollups.days["2024-03-04"][1], 1)
+        self.assertEqual(rollups.days["2024-03-01"][2], overdue_on_first)
+        for day in ("2024-03-02", "2024-03-03"):
+            self.assertTrue(rollups.is_closed(day))
+            self.assertEqual(rollups.days[day][2], self.overdue(store, day))
+        self.assertFalse(rollups.is_closed("2024-03-04"))
+        self.assertEqual(taskmanager.DailyRollups(path).days, rollups.days)
+        os.remove(rollups.totals_path)
+        self.assertEqual(taskmanager.DailyRollups(path).days, rollups.days)
+
+
+class ParallelTaskStatsTest(TempDirTestCase):
+    def reports(self, stats):
+        task_path, user_path = os.path.join(self.dir, "task.out"), os.path.join(self.dir, "user.out")
+        taskmanager.write_task_overview(stats, task_path)
+        taskmanager.write_user_overview(stats, ["alice", "bob", "zoë", "nobody"], user_path)
+        with open(task_path, "rb") as task_file, open(user_path, "rb") as user_file:
+            return task_file.read(), user_file.read()
+
+    def test_reports_match_the_serial_count(self):
+        today = datetime.date(2024, 3, 1)
+        lines = []
+        for number in range(1, 301):
+            assigned_to = ("alice", "bob", "zoë")[number % 3]
+            lines.append(f"admin;Task {number} {'é' * (number % 7)};{assigned_to};2024-01-01;"
+                         f"2024-0{number % 5 + 1}-01;{'Yes' if number % 4 == 0 else 'No'}\n")
+            if number % 17 == 0:
+                lines.append("\n" if number % 2 else "   \n")
+        lines.append("admin;Last line;bob;2024-01-01;2024-01-02;No")  # No newline at the end
+        self.write_tasks(lines)
+        serial = taskmanager.compute_task_stats(taskmanager.read_tasks_file(self.tasks_path), today)
+        original_chunk_size = taskmanager.REPORT_CHUNK_SIZE
+        self.addCleanup(setattr, taskmanager, "REPORT_CHUNK_SIZE", original_chunk_size)
+        for chunk_size, workers in ((37, 1), (37, 3), (4096, 2), (original_chunk_size, 2)):
+            with self.subTest(chunk_size=chunk_size, workers=workers):
+                taskmanager.REPORT_CHUNK_SIZE = chunk_size
+                stats = taskmanager.parallel_task_stats(self.tasks_path, today, workers)
+                self.assertEqual(stats.to_dict(), serial.to_dict())
+                self.assertEqual(self.reports(stats), self.reports(serial))
+
+    def test_malformed_line_is_an_error(self):
+        self.write_tasks([task_line(1), "admin;Short\n", task_line(3)])
+        with self.assertRaises(ValueError):
+            taskmanager.parallel_task_stats(self.tasks_path, datetime.date(2024, 3, 1), 1)
+
+
+class KeywordIndexTest(TempDirTestCase):
+    QUERIES = ["fix", "fix server", "server fix", "fix OR deploy", "dep*", "deploy* OR fix server",
+               "se* fix", "missing", "fix missing OR db", "FIX Server", "x*", ""]
+
+    def setUp(self):
+        super().setUp()
+        words = ["fix", "server", "deploy", "deployment", "db", "docs", "serve"]
+        self.write_tasks([f"admin;{words[number % 7]} {words[number * 3 % 5]}-{number % 4};"
+                          f"{'alice' if number % 2 else 'bob'};2024-01-01;2024-02-01;No\n" for number in range(1, 41)])
+        original_limit = taskmanager.KEYWORD_LOG_LIMIT
+        self.addCleanup(setattr, taskmanager, "KEYWORD_LOG_LIMIT", original_limit)
+        taskmanager.KEYWORD_LOG_LIMIT = 5  # Merge the log into the snapshot every few tasks
+
+    def open_store(self):
+        return taskmanager.TaskStore(taskmanager.TextBackend(self.tasks_path, self.users_path))
+
+    def brute_force(self, store, query, **filters):
+        def matches(term, words):
+            return any(word.startswith(term[:-1]) if term.endswith("*") else word == term for word in words)
+
+        groups = taskmanager.parse_search_query(query)
+        return [task.task_id for task in taskmanager.filter_tasks(store.tasks.tasks(), **filters)
+                if any(all(matches(term, taskmanager.tokenize(task.task_name)) for term in group)
+                       for group in groups)]
+
+    def check(self, store):
+        for query in self.QUERIES:
+            for filters in ({}, {"assigned_to": "alice"}, {"completed": "Yes"}):
+                with self.subTest(query=query, **filters):
+                    self.assertEqual([task.task_id for task in store.search(query, **filters)],
+                                     self.brute_force(store, query, **filters))
+
+    def test_search_matches_a_brute_force_filter(self):
+        store = self.open_store()
+        self.check(store)
+        for number in range(6):
+            store.add(taskmanager.Task("admin", f"deploy extra{number} fix", "alice", "2024-01-01", "2024-02-01",
+                                       "No"))
+        other = self.open_store()
+        other.add(taskmanager.Task("admin", "Fix the new server", "bob", "2024-01-01", "2024-02-01", "No"))
+        store.complete(3)
+        store.set_due_date(4, datetime.datetime(2024, 5, 1))
+        self.check(store)
+        self.check(self.open_store())  # Loaded from the saved snapshot and log
+
+
+class OverviewCacheTest(TempDirTestCase):
+    def test_incremental_counters_equal_a_full_recount(self):
+        self.write_tasks([f"admin;Task {number};{('alice', 'bob')[number % 2]};2024-01-01;"
+                          f"2024-03-{number % 20 + 1:02d};{'Yes' if number % 5 == 0 else 'No'}\n"
+                          for number in range(1, 31)])
+        store = taskmanager.TaskStore(taskmanager.TextBackend(self.tasks_path, self.users_path))
+        today = datetime.date(2024, 3, 10)
+        store.overview_stats(today)  # Counted once from scratch
+        recounts = []
+        full_count = store.stats
+        store.stats = lambda today=None: recounts.append(today) or full_count(today)
+
+        def check(day=today):
+            self.assertEqual(store.overview_stats(day).to_dict(),
+                             taskmanager.compute_task_stats(store.all(), day).to_dict())
+
+        store.add(taskmanager.Task("admin", "Overdue", "carol", "2024-01-01", "2024-03-01", "No"))
+        store.add(taskmanager.Task("admin", "Later", "alice", "2024-01-01", "2024-04-01", "No"))
+        check()
+        store.complete(1)  # Overdue
+        store.complete(19)  # Not due yet
+        store.complete(5)  # Already complete
+        check()
+        store.set_due_date(2, datetime.datetime(2024, 4, 2))  # No longer overdue
+        store.set_due_date(12, datetime.datetime(2024, 3, 2))  # Now overdue
+        store.set_due_date(31, datetime.datetime(2024, 3, 20))
+        check()
+        check(datetime.date(2024, 3, 25))  # A later day only counts what became overdue since
+        self.assertEqual(recounts, [])
+
+
+class MetricsTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.metrics_path = os.path.join(self.dir, "metrics.jsonl")
+        taskmanager.METRICS.enable(self.metrics_path)
+        self.addCleanup(taskmanager.METRICS.summary.clear)
+        self.addCleanup(taskmanager.METRICS.disable)
+
+    def records(self):
+        with open(self.metrics_path, "r") as file:
+            return {record["op"]: record for record in map(json.loads, file)}
+
+    def test_spans_of_one_store_operation(self):
+        self.write_tasks([task_line(1), task_line(2), task_line(3)])
+        store = taskmanager.TaskStore(taskmanager.TextBackend(self.tasks_path, self.users_path))
+        with taskmanager.METRICS.span("menu.complete"):
+            store.complete(2)
+        records = self.records()
+        self.assertLessEqual({"store.reload", "storage.read_tasks", "storage.read_events", "storage.append",
+                              "menu.complete"}, records.keys())
+        self.assertEqual(records["storage.read_tasks"]["parent"], "store.reload")
+        self.assertEqual(records["storage.read_tasks"]["rows"], 3)
+        self.assertEqual(records["storage.read_tasks"]["bytes_read"], os.path.getsize(self.tasks_path))
+        self.assertEqual(records["store.reload"]["rows"], 3)  # Includes its nested spans
+        self.assertEqual((records["storage.append"]["parent"], records["storage.append"]["bytes_written"]),
+                         ("menu.complete", len("complete;2\n")))
+        self.assertEqual(records["menu.complete"]["bytes_written"], len("complete;2\n"))
+        self.assertIsNone(records["menu.complete"]["parent"])
+        calls, _, _, rows, _, bytes_written = taskmanager.METRICS.summary["menu.complete"]
+        self.assertEqual((calls, rows, bytes_written), (1, 0, len("complete;2\n")))
+
+
+class WorkingDirTestCase(TempDirTestCase):
+    """
+    Runs each test inside its temporary directory, where the backends find
+    their files under their default names.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self._original_dir = os.getcwd()
+        os.chdir(self.dir)
+
+    def tearDown(self):
+        os.chdir(self._original_dir)
+        super().tearDown()
+
+    def run_cli(self, *args):
+        """
+        Run the command line and return its exit code, stdout and stderr.
+        """
+        out, err = io.StringIO(), io.StringIO()
+        with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+            code = taskmanager.cli(list(args))
+        return code, out.getvalue(), err.getvalue()
+
+
+class ViewMineTest(WorkingDirTestCase):
+    def test_lists_created_and_assigned_tasks_on_every_backend(self):
+        self.write_tasks([task_line(1), "alice;Delegated;bob;2024-01-01;2024-02-01;No\n", task_line(3, "bob"),
+                          "bob;Handed over;alice;2024-01-01;2024-02-01;Yes\n"])
+        for storage_format in ("text", "binary", "sqlite", "sharded"):
+            with self.subTest(storage_format=storage_format):
+                if storage_format in taskmanager.MIGRATIONS["text"]:
+                    taskmanager.migrate_storage(storage_format)
+                backend = taskmanager.open_backend(storage_format)
+                backend.initialize()
+                self.addCleanup(backend.close)
+                store = taskmanager.TaskStore(backend)
+                self.assertEqual([task.task_id for task in store.mine("alice")], [1, 2, 4])
+                self.assertEqual([task.task_id for task in store.mine("bob")], [2, 3, 4])
+                out = io.StringIO()
+                original_input = builtins.input
+                builtins.input = lambda prompt="": "-1"
+                try:
+                    with contextlib.redirect_stdout(out):
+                        taskmanager.view_mine("alice", store)
+                finally:
+                    builtins.input = original_input
+                self.assertEqual([line.split(".")[0] for line in out.getvalue().splitlines()
+                                  if line.endswith("Task details:")], ["1", "2", "4"])
+
+
+class DueDateIndexTest(WorkingDirTestCase):
+    RANGES = [(None, None), (None, datetime.date(2024, 3, 10)), (datetime.date(2024, 3, 5), datetime.date(2024, 3, 12)),
+              (datetime.date(2024, 3, 12), None), (datetime.date(2024, 3, 12), datetime.date(2024, 3, 5)),
+              (datetime.date(2024, 5, 1), None)]
+
+    def expected(self, store, start, end, assigned_to):
+        tasks = [task for task in store.all() if task.completed == "No"
+                 and (start is None or task.date_text("due_date") >= taskmanager.format_date(start))
+                 and (end is None or task.date_text("due_date") < taskmanager.format_date(end))
+                 and (assigned_to is None or task.assigned_to == assigned_to)]
+        return sorted((task.date_text("due_date"), task.task_id) for task in tasks)
+
+    def check(self, store):
+        for start, end in self.RANGES:
+            for assigned_to in (None, "alice", "nobody"):
+                with self.subTest(start=start, end=end, assigned_to=assigned_to):
+                    expected = self.expected(store, start, end, assigned_to)
+                    self.assertEqual([(task.date_text("due_date"), task.task_id)
+                                      for task in store.incomplete_due(start, end, assigned_to)], expected)
+                    self.assertEqual(store.count_incomplete_due(start, end, assigned_to), len(expected))
+
+    def test_overdue_and_due_ranges_on_every_backend(self):
+        self.write_tasks([f"admin;Task {number};{('alice', 'bob', 'carol')[number % 3]};2024-01-01;"
+                          f"2024-03-{number * 7 % 15 + 1:02d};{'Yes' if number % 4 == 0 else 'No'}\n"
+                          for number in range(1, 41)])
+        for storage_format in ("text", "sqlite", "sharded"):
+            with self.subTest(storage_format=storage_format):
+                if storage_format != "text":
+                    taskmanager.migrate_storage(storage_format)
+                backend = taskmanager.open_backend(storage_format)
+                self.addCleanup(backend.close)
+                store = taskmanager.TaskStore(backend)
+                self.check(store)
+                store.complete(1)
+                store.complete(4)  # Already complete
+                store.set_due_date(2, datetime.datetime(2024, 3, 10))  # Onto a range bound
+                store.set_due_date(8, datetime.datetime(2024, 6, 1))  # A completed task
+                store.add(taskmanager.Task("admin", "New", "alice", "2024-01-01", "2024-03-05", "No"))
+                self.check(store)
+
+
+class ImportExportTest(WorkingDirTestCase):
+    BAD_ROWS = [
+        ('{"task_name": "Fine", "assigned_to": "bob", "due_date": "2024-02-01"}', None),
+        ('{"task_name": "Broken", ', "invalid JSON"),
+        ('["not", "an", "object"]', "not an object"),
+        ('{"task_name": "Who", "assigned_to": "nobody", "due_date": "2024-02-01"}', "unknown assignee 'nobody'"),
+        ('{"task_name": "When", "assigned_to": "bob", "due_date": "01/02/2024"}', "dates must be YYYY-MM-DD"),
+        ('{"task_name": "Maybe", "assigned_to": "bob", "due_date": "2024-02-01", "completed": "Maybe"}',
+         "completed must be Yes or No"),
+        ('{"task_name": "", "assigned_to": "bob", "due_date": "2024-02-01"}', "task_name is empty"),
+        ('{"task_name": "a;b", "assigned_to": "bob", "due_date": "2024-02-01"}',
+         "fields may not contain ';' or line breaks"),
+    ]
+
+    def read(self, path):
+        with open(path, "r") as file:
+            return file.read()
+
+    def test_round_trip(self):
+        lines = [task_line(1), "bob;Quotes \"and\", commas;alice;2024-01-02;2024-03-01;Yes\n", task_line(3, "bob")]
+        self.write_tasks(lines)
+        for extension in ("csv", "jsonl"):
+            with self.subTest(extension=extension):
+                export_path = os.path.join(self.dir, f"tasks.{extension}")
+                self.assertEqual(taskmanager.export_tasks(export_path)["exported"], 3)
+                copy_path = os.path.join(self.dir, f"copy.{extension}")
+                copy = taskmanager.TextBackend(os.path.join(self.dir, f"copy_{extension}.txt"))
+                copy.initialize()
+                result = taskmanager.import_tasks(export_path, copy)
+                self.assertEqual((result["imported"], result["errors"]), (3, []))
+                with open(copy.path, "r") as file:
+                    self.assertEqual(file.readlines(), lines)
+                taskmanager.export_tasks(copy_path, copy)
+                self.assertEqual(self.read(copy_path), self.read(export_path))
+
+    def test_rejected_rows_are_reported(self):
+        self.write_tasks([task_line(1)])
+        import_path = os.path.join(self.dir, "import.jsonl")
+        with open(import_path, "w") as file:
+            file.write("\n".join(row for row, _ in self.BAD_ROWS) + "\n\n")
+        result = taskmanager.import_tasks(import_path)
+        self.assertEqual(result["imported"], 1)
+        self.assertEqual([row_number for row_number, _ in result["errors"]], list(range(2, len(self.BAD_ROWS) + 1)))
+        for (_, message), (_, expected) in zip(result["errors"], self.BAD_ROWS[1:]):
+            self.assertTrue(message.startswith(expected), message)
+        self.assertEqual(self.read_tasks()[1].split(";")[:3], ["admin", "Fine", "bob"])
+
+    def test_strict_import_adds_nothing(self):
+        self.write_tasks([task_line(1)])
+        import_path = os.path.join(self.dir, "import.csv")
+        with open(import_path, "w") as file:
+            file.write("task_name,assigned_to,due_date\nFine,bob,2024-02-01\nWho,nobody,2024-02-01\n")
+        code, out, _ = self.run_cli("import", "--strict", import_path)
+        self.assertEqual(code, 1)
+        self.assertIn("Row 3: unknown assignee 'nobody'", out)
+        self.assertEqual(self.read_tasks(), [task_line(1)])
+        code, _, _ = self.run_cli("import", import_path)
+        self.assertEqual(code, 1)
+        self.assertEqual(len(self.read_tasks()), 2)
+
+
+class UserRegistryTest(WorkingDirTestCase):
+    def test_bulk_registration_on_every_backend(self):
+        register_path = os.path.join(self.dir, "register.txt")
+        with open(register_path, "w") as file:
+            file.write("carol;pw1\nalice;other\n\ndave;\ncarol;pw2\nerin;pw;3\nfrank\ngina;pw4\n")
+        for storage_format in ("text", "sqlite"):
+            with self.subTest(storage_format=storage_format):
+                if storage_format == "sqlite":
+                    with open(self.users_path, "w") as file:
+                        file.write("alice;pw\nbob;pw\n")  # Undo the text registrations before copying
+                    taskmanager.migrate_storage("sqlite")
+                backend = taskmanager.open_backend(storage_format)
+                self.addCleanup(backend.close)
+                users = taskmanager.UserRegistry(backend)
+                result = taskmanager.register_users(register_path, users)
+                self.assertEqual(result["registered"], 2)
+                self.assertEqual(result["errors"], [
+                    (2, "alice: Username already exists."),
+                    (4, "dave: Username and password cannot be empty."),
+                    (5, "carol: Username appears more than once."),
+                    (6, "erin: Username and password cannot contain ';' or line breaks."),
+                    (7, "frank: Username and password cannot be empty."),
+                ])
+                self.assertEqual(users.all(), {"alice": "pw", "bob": "pw", "carol": "pw1", "gina": "pw4"})
+                next_session = taskmanager.open_backend(storage_format)
+                self.addCleanup(next_session.close)
+                self.assertEqual(taskmanager.UserRegistry(next_session).all(), users.all())
+
+    def test_single_registration_and_other_sessions(self):
+        users = taskmanager.UserRegistry(taskmanager.TextBackend(self.tasks_path, self.users_path))
+        self.assertIn("alice", users)
+        for username, password in (("alice", "pw"), ("", "pw"), ("x", ""), ("a;b", "pw"), ("c", "p\nq")):
+            with self.assertRaises(ValueError):
+                users.add(username, password)
+        other = taskmanager.UserRegistry(taskmanager.TextBackend(self.tasks_path, self.users_path))
+        other.add("carol", "pw")
+        self.assertEqual(users.get("carol"), "pw")  # Noticed through users_signature()
+        users.add("dave", "pw")
+        self.assertEqual(list(other), ["alice", "bob", "carol", "dave"])
+        with open(self.users_path, "r") as file:
+            self.assertEqual(file.read(), "alice;pw\nbob;pw\ncarol;pw\ndave;pw\n")
+
+
+class MigrateStorageTest(WorkingDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.write_tasks([task_line(1), task_line(2, "bob", "Yes"), task_line(3)])
+
+    def check_migration(self, storage_format):
+        self.assertEqual(taskmanager.cli(["migrate", storage_format]), 0)
+        backend = taskmanager.open_backend(storage_format)
+        try:
+            tasks = backend.load_tasks()
+            self.assertEqual([(task.task_id, task.task_name, task.assigned_to, task.completed) for task in tasks],
+                             [(1, "Task 1", "alice", "No"), (2, "Task 2", "bob", "Yes"), (3, "Task 3", "alice", "No")])
+            self.assertEqual(backend.load_users(), {"alice": "pw", "bob": "pw"})
+        finally:
+            backend.close()
+        self.assertEqual(taskmanager.cli(["migrate", storage_format]), 1)  # Refuses to copy twice
+
+    def test_migrate_sqlite(self):
+        self.check_migration("sqlite")
+
+    def test_migrate_sharded(self):
+        self.check_migration("sharded")
+
+    def test_migrate_binary_back_to_text(self):
+        lines = self.read_tasks()
+        backend = taskmanager.open_backend("binary")
+        backend.initialize()  # Converts tasks.txt
+        backend.complete_task(3)
+        backend.close()
+        self.assertEqual(taskmanager.cli(["migrate", "text", "--from", "binary"]), 1)  # tasks.txt is not empty
+        os.remove(self.tasks_path)
+        self.assertEqual(taskmanager.cli(["migrate", "text", "--from", "binary"]), 0)
+        self.assertEqual(self.read_tasks(), lines[:2] + [task_line(3, completed="Yes")])
+
+    def test_only_working_migrations_are_offered(self):
+        with self.assertRaises(SystemExit):
+            taskmanager.cli(["migrate", "binary"])
+        for target_format in ("text", "binary"):
+            with self.assertRaises(ValueError):
+                taskmanager.migrate_storage(target_format)
+
+
+class CommandLineTest(WorkingDirTestCase):
+    def test_add_then_complete_by_printed_id(self):
+        self.write_tasks([task_line(1)])
+        code, out, _ = self.run_cli("add", "bob", "Write report", "--due", "2030-01-01")
+        self.assertEqual((code, out), (0, "Task 2 added successfully.\n"))
+        task_id = out.split()[1]
+        self.assertEqual(self.run_cli("complete", task_id)[:2], (0, "Task 2 marked as complete.\n"))
+        self.assertEqual(self.run_cli("complete", task_id)[:2], (0, "Task 2 is already complete.\n"))
+        code, out, _ = self.run_cli("list", "--assignee", "bob", "--completed", "yes")
+        self.assertEqual(code, 0)
+        self.assertIn("Write report", out)
+        self.assertNotIn("Task 1", out)
+
+    def test_add_rejects_unknown_assignee(self):
+        self.write_tasks([])
+        code, _, err = self.run_cli("add", "nobody", "Write report", "--due", "2030-01-01")
+        self.assertEqual(code, 1)
+        self.assertIn("Invalid task", err)
+
+    def test_complete_unknown_id(self):
+        self.write_tasks([task_line(1)])
+        self.assertEqual(self.run_cli("complete", "5"), (1, "", "No task with id 5.\n"))
+
+    def test_malformed_file_is_a_one_line_error(self):
+        self.write_tasks([task_line(1), "admin;Short line\n"])
+        for command in (["list"], ["export", "tasks", os.path.join(self.dir, "out.csv")]):
+            code, _, err = self.run_cli(*command)
+            self.assertEqual(code, 1)
+            self.assertEqual(err, f"taskmanager.py {command[0]}: {taskmanager.TASKS_FILE} line 2: "
+                                  f"expected 6 fields, found 2\n")
+
+
+class TaskServerTest(TempDirTestCase):
+    def setUp(self):
+        super().setUp()
+        self.write_tasks([task_line(1)])
+        store = taskmanager.TaskStore(taskmanager.TextBackend(self.tasks_path, self.users_path))
+        socket_path = os.path.join(self.dir, "taskmanager.sock")
+        self.server = taskserver.TaskServer(store, socket_path)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever)
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self.server.start(), self.loop).result(5)
+        self.remote = taskserver.RemoteStore(socket_path)
+
+    def tearDown(self):
+        self.remote.close()
+        asyncio.run_coroutine_threadsafe(self.server.close(), self.loop).result(5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+        super().tearDown()
+
+    def test_passwords_stay_on_the_server(self):
+        self.assertEqual(self.remote.login("alice", "pw"), "alice")
+        self.assertEqual(self.remote.users.all(), {"alice": None, "bob": None})
+        self.assertIsNone(self.remote.login("alice", "wrong"))
+        self.assertEqual(self.remote.login("admin", "password"), "admin")
+
+    def test_sessions_log_in_before_anything_else(self):
+        self.assertEqual(len(self.remote), 1)  # "info" is answered before login
+        with self.assertRaisesRegex(RuntimeError, "PermissionError: Log in first"):
+            self.remote.all()
+        self.remote.login("alice", "pw")
+        self.assertEqual([task.task_id for task in self.remote.all()], [1])
+        self.assertIsNone(self.remote.login("alice", "wrong"))
+        with self.assertRaisesRegex(RuntimeError, "Log in first"):
+            self.remote.get(1)
+
+    def test_admin_operations_are_refused_to_other_users(self):
+        self.remote.login("alice", "pw")
+        for call in (lambda: self.remote.users.add("carol", "pw"), self.remote.compact, self.remote.stats,
+                     lambda: self.remote.mark_report_fresh("task_overview.txt", 1)):
+            with self.assertRaisesRegex(RuntimeError, "PermissionError: Only admin"):
+                call()
+        self.assertEqual(self.remote.complete(1).completed, "Yes")
+        self.remote.login("admin", "password")
+        self.remote.users.add("carol", "pw")
+        self.assertIn("carol", self.remote.users.all())
+
+    def test_reports_are_named_by_absolute_path(self):
+        self.remote.login("admin", "password")
+        self.remote.overview_stats()  # Saves the counters the report keys refer to
+        report_path = os.path.join(self.dir, "task_overview.txt")
+        with open(report_path, "w") as file:
+            file.write("report\n")
+        key = self.remote.report_key()
+        with self.assertRaisesRegex(RuntimeError, "must be absolute"):
+            self.remote.call("mark_report_fresh", report_path="task_overview.txt", key=key)
+        original_dir = os.getcwd()
+        os.chdir(self.dir)
+        try:
+            self.remote.mark_report_fresh("task_overview.txt", key)  # Sent as an absolute path
+            self.assertTrue(self.remote.report_is_fresh("task_overview.txt", key))
+        finally:
+            os.chdir(original_dir)
+        self.assertTrue(self.remote.report_is_fresh(report_path, key))
+
+    def test_connected_session_logs_in_through_the_server(self):
+        answers = iter(["alice", "pw"])
+        original_input, builtins.input = builtins.input, lambda prompt="": next(answers)
+        try:
+            self.assertEqual(taskmanager.authenticate_user(self.remote.users, self.remote.login), "alice")
+        finally:
+            builtins.input = original_input
+        self.assertEqual([task.task_id for task in self.remote.mine("alice")], [1])
+
+
+if __name__ == "__main__":
+    unittest.main()
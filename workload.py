@@ -0,0 +1,101 @@
+"""
+Synthetic workload generator for the task manager.
+
+Writes a realistic tasks.txt and user.txt of a given size into a directory:
+
+    python workload.py --tasks 100000 --users 1000 --output bench_data/100k
+
+Assignees follow a Zipf-like distribution (a few users own most tasks), task
+names are drawn from a small vocabulary, start dates spread over the last two
+years and older tasks are more likely to be completed.
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+from itertools import accumulate
+
+WORDS = ("review", "update", "fix", "write", "test", "deploy", "plan", "design", "report", "migrate",
+         "budget", "invoice", "client", "server", "docs", "meeting", "release", "audit", "backup", "survey")
+CHUNK_SIZE = 100000  # Tasks generated and written per batch
+
+
+def generate_workload(directory, tasks, users, skew=1.1, seed=0):
+    """
+    Generate tasks.txt and user.txt in directory.
+
+    Args:
+        directory (str): Where to write the files (created if missing).
+        tasks (int): Number of tasks.
+        users (int): Number of users.
+        skew (float): Zipf exponent of the assignee distribution; 0 is uniform.
+        seed (int): Random seed, so the same arguments give the same files.
+
+    Returns:
+        dict: The parameters, also saved as workload.json next to the files.
+    """
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    usernames = [f"user{index}" for index in range(users)]
+    cum_weights = list(accumulate(1 / (rank ** skew) for rank in range(1, users + 1)))
+    today = datetime.date.today().toordinal()
+    dates = {}  # day number -> YYYY-MM-DD, there are only a few hundred distinct days
+
+    def date_text(day):
+        if day not in dates:
+            dates[day] = datetime.date.fromordinal(day).strftime("%Y-%m-%d")
+        return dates[day]
+
+    with open(os.path.join(directory, "user.txt"), "w") as user_file:
+        user_file.writelines(f"{username};pw{index}\n" for index, username in enumerate(usernames))
+
+    with open(os.path.join(directory, "tasks.txt"), "w", buffering=1 << 20) as tasks_file:
+        for start in range(0, tasks, CHUNK_SIZE):
+            count = min(CHUNK_SIZE, tasks - start)
+            assignees = rng.choices(usernames, cum_weights=cum_weights, k=count)
+            lines = []
+            for assignee in assignees:
+                start_day = today - rng.randrange(730)
+                due_day = start_day + rng.randrange(1, 90)
+                age = (today - start_day) / 730
+                completed = "Yes" if rng.random() < 0.2 + 0.7 * age else "No"
+                creator = "admin" if rng.random() < 0.7 else assignee
+                name = f"{rng.choice(WORDS).capitalize()} {rng.choice(WORDS)} {rng.randrange(1000)}"
+                lines.append(f"{creator};{name};{assignee};{date_text(start_day)};{date_text(due_day)};{completed}\n")
+            tasks_file.writelines(lines)
+
+    parameters = {"tasks": tasks, "users": users, "skew": skew, "seed": seed}
+    with open(os.path.join(directory, "workload.json"), "w") as meta_file:
+        json.dump(parameters, meta_file)
+    return parameters
+
+
+def ensure_workload(directory, tasks, users, skew=1.1, seed=0):
+    """
+    Generate the workload unless directory already holds one with the same parameters.
+    """
+    try:
+        with open(os.path.join(directory, "workload.json"), "r") as meta_file:
+            if json.load(meta_file) == {"tasks": tasks, "users": users, "skew": skew, "seed": seed}:
+                return directory
+    except (FileNotFoundError, ValueError):
+        pass
+    generate_workload(directory, tasks, users, skew, seed)
+    return directory
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic task manager workload")
+    parser.add_argument("--tasks", type=int, default=100000, help="number of tasks (1k to 10M)")
+    parser.add_argument("--users", type=int, default=1000, help="number of users (10 to 100k)")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of the assignee distribution")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="bench_data")
+    args = parser.parse_args(argv)
+    generate_workload(args.output, args.tasks, args.users, args.skew, args.seed)
+    print(f"Wrote {args.tasks} tasks and {args.users} users to {args.output}.")
+
+
+if __name__ == "__main__":
+    main()